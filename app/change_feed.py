@@ -0,0 +1,209 @@
+import os
+import json
+import select
+import asyncio
+import logging
+import threading
+import psycopg2
+from datetime import datetime
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_db_url
+from utils.task_cache import record_task_change
+
+CHANNEL = "task_changes"
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("CHANGE_FEED_QUEUE_SIZE", "256"))
+LISTEN_POLL_SECONDS = 5.0
+NOTIFY_STATEMENT = text("SELECT pg_notify(:channel, :payload)")
+
+_subscribers = set()
+_listener_thread = None
+_stop_event = threading.Event()
+
+
+def task_payload(op: str, task, previous: dict = None) -> str:
+    """Build the NOTIFY payload for a changed task (Task row or insert dict)."""
+    get = task.get if isinstance(task, dict) else lambda key: getattr(task, key, None)
+    due_date = get("due_date")
+    payload = {
+        "op": op,
+        "id": str(get("id")),
+        "status": get("status"),
+        "priority": get("priority"),
+        "due_date": due_date.isoformat() if isinstance(due_date, datetime) else due_date,
+        "recurrence": get("recurrence"),
+    }
+    if previous:
+        payload["previous"] = previous
+    return json.dumps(payload)
+
+
+def notify_task_change(db: Session, op: str, task, previous: dict = None):
+    """
+    Queue a change event in the current transaction.
+
+    Postgres delivers it to listeners only when the transaction commits, so
+    call this before db.commit(). The task's cache entries are invalidated
+    by the commit_and_invalidate that follows.
+    """
+    record_task_change(db, task, previous)
+    db.execute(NOTIFY_STATEMENT, {"channel": CHANNEL, "payload": task_payload(op, task, previous)})
+
+
+def notify_task_changes(db: Session, op: str, tasks: list):
+    """Queue change events for many tasks with a single executemany."""
+    for task in tasks:
+        record_task_change(db, task)
+    if tasks:
+        db.execute(NOTIFY_STATEMENT, [{"channel": CHANNEL, "payload": task_payload(op, task)} for task in tasks])
+
+
+async def notify_task_change_async(db: AsyncSession, op: str, task, previous: dict = None):
+    """Async counterpart of notify_task_change."""
+    record_task_change(db, task, previous)
+    await db.execute(NOTIFY_STATEMENT, {"channel": CHANNEL, "payload": task_payload(op, task, previous)})
+
+
+async def notify_task_changes_async(db: AsyncSession, op: str, tasks: list):
+    """Async counterpart of notify_task_changes."""
+    for task in tasks:
+        record_task_change(db, task)
+    if tasks:
+        await db.execute(NOTIFY_STATEMENT, [{"channel": CHANNEL, "payload": task_payload(op, task)} for task in tasks])
+
+
+async def notify_bulk_change_async(db: AsyncSession, op: str, count: int):
+    """
+    Queue one event standing for many changed tasks (bulk import).
+
+    Subscribers are not sent the rows; they are told to refetch instead.
+    """
+    payload = json.dumps({"op": op, "bulk": True, "count": count})
+    await db.execute(NOTIFY_STATEMENT, {"channel": CHANNEL, "payload": payload})
+
+
+def task_snapshot(task) -> dict:
+    """The filterable fields of a task before it is changed."""
+    return {
+        "status": task.status,
+        "priority": task.priority,
+        "due_date": task.due_date.isoformat() if task.due_date else None,
+    }
+
+
+class Subscriber:
+    """One SSE client: its filters and a bounded event queue."""
+
+    def __init__(self, loop, status=None, priority=None, start_date=None, end_date=None):
+        self.loop = loop
+        self.status = status
+        self.priority = priority
+        self.start_date = start_date
+        self.end_date = end_date
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+
+    def _matches(self, fields: dict) -> bool:
+        if self.status and fields.get("status") != self.status:
+            return False
+        if self.priority is not None and fields.get("priority") != self.priority:
+            return False
+        if self.start_date or self.end_date:
+            if not fields.get("due_date"):
+                return False
+            due_date = datetime.fromisoformat(fields["due_date"])
+            if self.start_date and due_date < self.start_date:
+                return False
+            if self.end_date and due_date > self.end_date:
+                return False
+        return True
+
+    def matches(self, event: dict) -> bool:
+        """Same filters as GET /tasks; updates also match if the task left the filter."""
+        if event.get("recurrence") and (self.start_date or self.end_date):
+            return True  # occurrences may fall in the window whatever the series start is
+        return self._matches(event) or bool(event.get("previous") and self._matches(event["previous"]))
+
+    def resync(self):
+        """Make the client refetch GET /tasks instead of applying events."""
+        self.overflowed = True
+
+    def offer(self, event: dict):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # The client is too slow; tell it to refetch instead of buffering forever
+            self.overflowed = True
+
+
+def subscribe(loop: asyncio.AbstractEventLoop, **filters) -> Subscriber:
+    subscriber = Subscriber(loop, **filters)
+    _subscribers.add(subscriber)
+    return subscriber
+
+
+def unsubscribe(subscriber: Subscriber):
+    _subscribers.discard(subscriber)
+
+
+def dispatch(payload: str):
+    """Fan one NOTIFY payload out to all matching subscribers (listener thread)."""
+    try:
+        event = json.loads(payload)
+    except json.JSONDecodeError:
+        logging.warning(f"Ignoring malformed change event: {payload}")
+        return
+    if event.get("bulk"):
+        for subscriber in list(_subscribers):
+            subscriber.loop.call_soon_threadsafe(subscriber.resync)
+        return
+    for subscriber in list(_subscribers):
+        if subscriber.matches(event):
+            subscriber.loop.call_soon_threadsafe(subscriber.offer, event)
+
+
+def listen_forever():
+    """Hold one LISTEN connection for this worker, reconnecting on failure."""
+    backoff = 1.0
+    while not _stop_event.is_set():
+        conn = None
+        try:
+            conn = psycopg2.connect(get_db_url())
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {CHANNEL}")
+            logging.info(f"Listening for task changes on '{CHANNEL}'")
+            backoff = 1.0
+            while not _stop_event.is_set():
+                if select.select([conn], [], [], LISTEN_POLL_SECONDS) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    dispatch(conn.notifies.pop(0).payload)
+        except Exception as e:
+            logging.error(f"Change feed listener failed, reconnecting in {backoff:.0f}s: {e}")
+            _stop_event.wait(backoff)
+            backoff = min(backoff * 2, 30.0)
+        finally:
+            if conn is not None:
+                conn.close()
+
+
+def start_change_listener():
+    """Start the per-worker listener thread."""
+    global _listener_thread
+    if _listener_thread is None or not _listener_thread.is_alive():
+        _stop_event.clear()
+        _listener_thread = threading.Thread(target=listen_forever, name="task-change-listener", daemon=True)
+        _listener_thread.start()
+
+
+def stop_change_listener():
+    """Stop the listener thread (application shutdown)."""
+    _stop_event.set()
+
+
+def format_sse(event: dict, event_id: int) -> str:
+    """Render one Server-Sent Event."""
+    return f"id: {event_id}\nevent: task\ndata: {json.dumps(event)}\n\n"
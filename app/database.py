@@ -1,18 +1,76 @@
+import os
+import threading
+from fastapi import Request
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.orm import sessionmaker, Session
 from database_tools.db_config import read_db_config
+from utils.metrics import TimedQueuePool, TimedAsyncQueuePool, instrument_engine, query_label
 
-# Load database configuration
-db_config = read_db_config()
+# Async pool settings (per API worker process)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))
+DB_POOL_RECYCLE_SECONDS = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
 
-DB_URL = (
-    f"postgresql://{db_config['DB_USER']}:{db_config['DB_PASSWORD']}"
-    f"@{db_config['DB_URL']}:{db_config['DB_PORT']}/{db_config['DB_NAME']}"
-)
+# The config file is read and the engines are built on first use, not at import
+_db_url = None
+_engine = None
+_async_engine = None
+_lock = threading.Lock()
 
-# DB - Engine setup session
-engine = create_engine(DB_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def get_db_url() -> str:
+    """Build the database URL from config/db_config.xml (read once)."""
+    global _db_url
+    if _db_url is None:
+        db_config = read_db_config()
+        _db_url = (
+            f"postgresql://{db_config['DB_USER']}:{db_config['DB_PASSWORD']}"
+            f"@{db_config['DB_URL']}:{db_config['DB_PORT']}/{db_config['DB_NAME']}"
+        )
+    return _db_url
+
+def get_engine():
+    """Sync engine (Celery workers and the reminder scheduler)."""
+    global _engine
+    with _lock:
+        if _engine is None:
+            _engine = create_engine(get_db_url(), poolclass=TimedQueuePool)
+            instrument_engine(_engine)
+    return _engine
+
+def get_async_engine():
+    """Async engine for the FastAPI endpoints."""
+    global _async_engine
+    with _lock:
+        if _async_engine is None:
+            _async_engine = create_async_engine(
+                get_db_url().replace("postgresql://", "postgresql+asyncpg://", 1),
+                pool_size=DB_POOL_SIZE,
+                max_overflow=DB_MAX_OVERFLOW,
+                pool_timeout=DB_POOL_TIMEOUT_SECONDS,
+                pool_recycle=DB_POOL_RECYCLE_SECONDS,
+                pool_pre_ping=True,
+                poolclass=TimedAsyncQueuePool,
+            )
+            instrument_engine(_async_engine.sync_engine)
+    return _async_engine
+
+class LazySession(Session):
+    """Session bound to the sync engine, created when the first session is."""
+
+    def __init__(self, bind=None, **kwargs):
+        super().__init__(bind=bind or get_engine(), **kwargs)
+
+class LazyAsyncSession(AsyncSession):
+    """AsyncSession bound to the async engine, created when the first session is."""
+
+    def __init__(self, bind=None, **kwargs):
+        super().__init__(bind=bind or get_async_engine(), **kwargs)
+
+# DB - session factories
+SessionLocal = sessionmaker(class_=LazySession, autocommit=False, autoflush=False)
+AsyncSessionLocal = async_sessionmaker(class_=LazyAsyncSession, autoflush=False, expire_on_commit=False)
 
 def get_db():
     db = SessionLocal()
@@ -20,3 +78,14 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db(request: Request):
+    # Label this request's queries with the endpoint that runs them
+    query_label.set(request.scope["endpoint"].__name__)
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def dispose_async_engine():
+    """Close pooled connections (application shutdown)."""
+    if _async_engine is not None:
+        await _async_engine.dispose()
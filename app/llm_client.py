@@ -0,0 +1,82 @@
+import os
+import time
+import aiohttp
+import openai
+from utils.metrics import LLM_REQUEST_SECONDS, record_llm_usage
+from utils.log_config import log_llm_exchange
+
+# Connection pool settings for outbound OpenAI calls
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "100"))
+LLM_KEEPALIVE_SECONDS = float(os.getenv("LLM_KEEPALIVE_SECONDS", "30"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+
+_http_session = None
+
+
+def prompt_label(kwargs: dict) -> str:
+    """Name the prompt of a completion request for metrics: the function called, or "text"."""
+    function_call = kwargs.get("function_call")
+    return function_call["name"] if isinstance(function_call, dict) else "text"
+
+
+def get_http_session() -> aiohttp.ClientSession:
+    """Return the shared keep-alive HTTP session, creating it on first use."""
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=LLM_POOL_SIZE,
+            keepalive_timeout=LLM_KEEPALIVE_SECONDS,
+        )
+        _http_session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=LLM_TIMEOUT_SECONDS),
+        )
+    return _http_session
+
+
+async def close_http_session():
+    """Close the shared HTTP session (called on application shutdown)."""
+    global _http_session
+    if _http_session is not None and not _http_session.closed:
+        await _http_session.close()
+    _http_session = None
+
+
+async def acreate_chat_completion(**kwargs):
+    """
+    Run an async ChatCompletion request over the pooled HTTP session.
+
+    Args:
+        **kwargs: Arguments forwarded to openai.ChatCompletion.acreate.
+
+    Returns:
+        The OpenAI response object.
+    """
+    # openai 0.28 reads the aiohttp session from a context variable; without it
+    # a fresh session (and TCP/TLS handshake) is created for every request.
+    token = openai.aiosession.set(get_http_session())
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        response = await openai.ChatCompletion.acreate(**kwargs)
+        outcome = "ok"
+    finally:
+        openai.aiosession.reset(token)
+        LLM_REQUEST_SECONDS.labels(outcome).observe(time.perf_counter() - start)
+    record_llm_usage(response, prompt_label(kwargs))
+    log_llm_exchange(kwargs.get("messages"), response)
+    return response
+
+
+def create_chat_completion(**kwargs):
+    """Synchronous counterpart of acreate_chat_completion (Celery workers)."""
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        response = openai.ChatCompletion.create(**kwargs)
+        outcome = "ok"
+    finally:
+        LLM_REQUEST_SECONDS.labels(outcome).observe(time.perf_counter() - start)
+    record_llm_usage(response, prompt_label(kwargs))
+    log_llm_exchange(kwargs.get("messages"), response)
+    return response
@@ -1,22 +1,82 @@
-from fastapi import FastAPI, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from app.database import get_db
-from app.services import generate_recurring_tasks
+from fastapi import FastAPI, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse, Response, JSONResponse
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import insert, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import AsyncSessionLocal, get_async_db, dispose_async_engine
+from app.services import (
+    generate_recurring_tasks, expand_recurring_tasks, iter_recurring_tasks, materialize_occurrence, skip_occurrence,
+)
 from database_tools.models import Task
-from database_tools.schemas import TaskCreate, TaskResponse
-from app.services import process_command, delete_root_token_after_process_start
+from database_tools.schemas import (
+    TaskCreate, TaskResponse, TaskPage, TaskBatchCreate, TaskBatchResult, TaskImportResult,
+    TaskSearchResult, TaskSearchPage,
+)
+from app.services import local_parse_stats, delete_root_token_after_process_start
+from app.parser_backends import request_backend, llm_breaker
+from app.task_import import IMPORT_FORMATS, import_tasks
+from app.llm_client import close_http_session
+from app.change_feed import (
+    notify_task_change_async, notify_task_changes_async, task_snapshot, subscribe, unsubscribe,
+    format_sse, start_change_listener, stop_change_listener,
+)
 from utils.background_tasks import process_task_in_background, get_task_status
 from utils.scheduler import start_scheduler
-from typing import List, Optional
+from utils.parse_cache import parse_cache_stats
+from utils.smtp_service import email_queue_stats, stop_email_workers
+from utils.metrics import render_metrics, query_label
+from utils.llm_limiter import LLMOverloaded
+from utils.log_config import configure_logging, stop_logging
+from utils.task_cache import (
+    TASK_CACHE_TTL_SECONDS, TASK_LIST_CACHE_TTL_SECONDS, TASK_LIST_CACHE_MAX_PAGE,
+    commit_and_invalidate, read_through, task_key, task_generation_key, list_key, list_generation_key,
+)
+from utils.task_export import EXPORT_FORMATS, EXPORT_COLUMNS, csv_header, format_rows, merge_batches
+from utils.task_search import search_clause, search_rank, search_seek_clause
+from utils.recurrence import expand_series, expansion_window, is_occurrence
+from utils.pagination import (
+    SORTABLE_FIELDS, InvalidCursor, encode_cursor, decode_cursor,
+    order_clauses, seek_clause, sort_items, row_sort_key, is_after, estimate_count,
+)
+from typing import List, Optional, Union
 from datetime import datetime
+import asyncio
+import asyncpg
+import uuid
+
+SSE_HEARTBEAT_SECONDS = 15
 
 app = FastAPI()
 
+@app.exception_handler(LLMOverloaded)
+async def llm_overloaded_handler(request: Request, exc: LLMOverloaded):
+    """Turn LLM backpressure into 429/503 with Retry-After."""
+    return JSONResponse(
+        status_code=exc.status, content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
 @app.post("/tasks", response_model=TaskResponse)
-async def add_task(command: str, db: Session = Depends(get_db)):
-    """Add a new task based on the given command."""
+async def add_task(
+    command: str,
+    response: Response,
+    backend: Optional[str] = Query(None, description="Parser backend (default: the deployment's)"),
+    db: AsyncSession = Depends(get_async_db),
+    ):
+    """
+    Add a new task based on the given command.
+
+    If the LLM was skipped or too slow, the command is parsed locally and the
+    response carries X-Parse-Confidence: low (and X-Parse-Degraded: the reason).
+    """
+    try:
+        parser = request_backend(backend)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     # Parse the command to extract task data
-    task_data = process_command(command)
+    task_data = await parser.parse(command)
 
     # Now let's delete the root token for security
     #delete_root_token_after_process_start()
@@ -41,23 +101,110 @@ async def add_task(command: str, db: Session = Depends(get_db)):
         recurrence=task_data.get("recurrence"),
     )
     db.add(new_task)
-    db.commit()
-    db.refresh(new_task)
+    await db.flush()
+    await notify_task_change_async(db, "created", new_task)
+    await commit_and_invalidate(db)
+    await db.refresh(new_task)
     
     # Generate recurring tasks if applicable
     if new_task.recurrence:
-        generate_recurring_tasks(new_task, new_task.recurrence, db)
+        await generate_recurring_tasks(new_task, new_task.recurrence, db)
 
     # Send long-running tasks to Celery worker
     if "background" in task_data and task_data["background"]:
         process_task_in_background.delay(new_task.id)
 
+    if task_data.get("low_confidence"):
+        response.headers["X-Parse-Confidence"] = "low"
+        response.headers["X-Parse-Degraded"] = task_data["degraded_reason"]
     return new_task
 
+# Endpoint: Create many tasks at once
+@app.post("/tasks/batch", response_model=List[TaskBatchResult])
+async def add_tasks_batch(
+    batch: TaskBatchCreate,
+    backend: Optional[str] = Query(None, description="Parser backend (default: the deployment's)"),
+    db: AsyncSession = Depends(get_async_db),
+    ):
+    """Add tasks for many commands, reporting success or failure per command."""
+    try:
+        parser = request_backend(backend)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    parsed = await parser.parse_batch(batch.commands)
+
+    results = []
+    rows = []
+    background_ids = []
+    for index, (command, task_data) in enumerate(zip(batch.commands, parsed)):
+        if not task_data or "error" in task_data:
+            error = task_data.get("error", "Invalid command") if task_data else "Invalid command"
+            results.append({"index": index, "command": command, "error": error})
+            continue
+        if not task_data.get("description"):
+            results.append({"index": index, "command": command, "error": "Task description is required."})
+            continue
+
+        row = {
+            "id": uuid.uuid4(),
+            "description": task_data["description"],
+            "due_date": task_data.get("due_date"),
+            "status": "pending",
+            "priority": task_data.get("priority") or 0,
+            "recurrence": task_data.get("recurrence"),
+        }
+        if row["recurrence"]:
+            # Recurring tasks are stored as a single series row
+            row["due_date"] = row["due_date"] or datetime.now().replace(second=0, microsecond=0)
+            row["recurrence_exceptions"] = []
+        rows.append(row)
+        if task_data.get("background"):
+            background_ids.append(row["id"])
+        results.append({
+            "index": index, "command": command, "task": row,
+            "low_confidence": bool(task_data.get("low_confidence")),
+        })
+
+    # One multi-row INSERT and one commit for the whole batch
+    if rows:
+        await db.execute(insert(Task), rows)
+        await notify_task_changes_async(db, "created", rows)
+        await commit_and_invalidate(db)
+
+    for task_id in background_ids:
+        process_task_in_background.delay(str(task_id))
+
+    return results
+
+# Endpoint: Bulk import of structured tasks
+@app.post("/tasks/import", response_model=TaskImportResult)
+async def import_tasks_bulk(
+    request: Request,
+    format: str = Query("ndjson", description="Body format (ndjson or csv with a header row)"),
+    db: AsyncSession = Depends(get_async_db),
+    ):
+    """
+    Create tasks from a streamed body of TaskCreate records, without parsing commands.
+
+    Valid rows are loaded with COPY and one INSERT ... SELECT; invalid rows
+    are skipped and reported by line.
+    """
+    if format not in IMPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(IMPORT_FORMATS)}")
+    try:
+        result = await import_tasks(db, request.stream(), format)
+        await commit_and_invalidate(db)
+    except (SQLAlchemyError, asyncpg.PostgresError, asyncpg.InterfaceError) as e:
+        # COPY runs on the raw asyncpg connection, so its errors are not wrapped by SQLAlchemy
+        await db.rollback()
+        # The driver's message only; str(e) would repeat the statement and its parameters
+        raise HTTPException(status_code=400, detail=f"Import failed, no rows were imported: {getattr(e, 'orig', e)}")
+    return result
+
 # Endpoint: Retrieve all tasks with filters, pagination, and sorting
-@app.get("/tasks", response_model=List[TaskResponse])
+@app.get("/tasks", response_model=Union[List[TaskResponse], TaskPage])
 async def get_tasks(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     status: Optional[str] = Query(None, description="Filter by task status"),
     priority: Optional[int] = Query(None, description="Filter by task priority"),
     start_date: Optional[datetime] = Query(None, description="Filter tasks due after this date"),
@@ -66,92 +213,398 @@ async def get_tasks(
     page_size: int = Query(10, description="Number of tasks per page"),
     sort_by: Optional[str] = Query("due_date", description="Sort tasks by this field"),
     sort_order: Optional[str] = Query("asc", description="Sort order (asc or desc)"),
+    pagination: str = Query("offset", description="Pagination mode (offset or cursor)"),
+    after: Optional[str] = Query(None, description="Cursor mode: next_cursor of the previous page"),
+    include_total: bool = Query(False, description="Cursor mode: include an approximate total"),
     ):
-    """Retrieve all tasks with optional filters, pagination, and sorting."""
-    query = db.query(Task).filter(Task.deleted_at == None)
+    """
+    Retrieve all tasks with optional filters, pagination, and sorting.
+
+    When a date window is given, recurrence series are expanded into their
+    occurrences inside the window instead of being returned as one row.
+    Cursor mode returns a TaskPage and seeks past the previous page instead
+    of using OFFSET.
+    """
+    if sort_by not in SORTABLE_FIELDS:
+        raise HTTPException(status_code=400, detail=f"Cannot sort by '{sort_by}'. Allowed: {', '.join(sorted(SORTABLE_FIELDS))}")
+    if sort_order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="sort_order must be 'asc' or 'desc'")
+    if pagination not in ("offset", "cursor"):
+        raise HTTPException(status_code=400, detail="pagination must be 'offset' or 'cursor'")
+
+    async def load():
+        return await query_tasks(
+            db, status, priority, start_date, end_date, page, page_size, sort_by, sort_order,
+            pagination, after, include_total,
+        )
+
+    # The first pages of each listing are served from the read cache
+    if after is None and (pagination == "cursor" or page <= TASK_LIST_CACHE_MAX_PAGE):
+        params = {
+            "status": status, "priority": priority, "start_date": start_date, "end_date": end_date,
+            "page": page if pagination == "offset" else None, "page_size": page_size,
+            "sort_by": sort_by, "sort_order": sort_order, "pagination": pagination,
+            "include_total": include_total,
+        }
+        payload = await read_through(
+            list_key(params), list_generation_key(status, priority), TASK_LIST_CACHE_TTL_SECONDS,
+            lambda: load_json(load),
+        )
+        return Response(content=payload, media_type="application/json")
+    return await load()
 
+async def load_json(load):
+    """Run a task query and make its result cacheable JSON."""
+    result = await load()
+    if isinstance(result, TaskPage):
+        return jsonable_encoder(result)
+    return jsonable_encoder([TaskResponse.model_validate(task) for task in result])
+
+def filter_tasks(query, status, priority, start_date, end_date):
+    """
+    Apply the GET /tasks filters to a task query.
+
+    With a date window, series rows are left out; their occurrences are
+    expanded separately (expand_recurring_tasks).
+    """
+    query = query.where(Task.deleted_at == None)
+    if start_date is not None or end_date is not None:
+        query = query.where(Task.recurrence == None)
     if status:
-        query = query.filter(Task.status == status)
+        query = query.where(Task.status == status)
     if priority is not None:
-        query = query.filter(Task.priority == priority)
+        query = query.where(Task.priority == priority)
     if start_date:
-        query = query.filter(Task.due_date >= start_date)
+        query = query.where(Task.due_date >= start_date)
     if end_date:
-        query = query.filter(Task.due_date <= end_date)
+        query = query.where(Task.due_date <= end_date)
+    return query
+
+async def query_tasks(db: AsyncSession, status, priority, start_date, end_date, page, page_size,
+                      sort_by, sort_order, pagination, after, include_total):
+    """Run the GET /tasks query for already validated parameters."""
+    query = filter_tasks(select(Task), status, priority, start_date, end_date)
+    expand = start_date is not None or end_date is not None
+
+    filtered_query = query
+    query = query.order_by(*order_clauses(sort_by, sort_order))
+
+    if pagination == "offset" and after is None:
+        if not expand:
+            return (await db.scalars(query.offset((page - 1) * page_size).limit(page_size))).all()
+
+        # Merge stored rows with virtual occurrences, then cut out the page
+        offset = (page - 1) * page_size
+        window_start, window_end = expansion_window(start_date, end_date)
+        tasks = [TaskResponse.model_validate(task) for task in await db.scalars(query.limit(offset + page_size))]
+        tasks += [
+            TaskResponse(**occurrence)
+            for occurrence in await expand_recurring_tasks(db, window_start, window_end, status, priority)
+        ]
+        return sort_items(tasks, sort_by, sort_order)[offset:offset + page_size]
+
+    # Cursor mode: seek past the last row of the previous page
+    position = None
+    if after:
+        try:
+            position = decode_cursor(after, sort_by, sort_order)
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        query = query.where(seek_clause(sort_by, sort_order, *position))
+
+    # One extra row tells us whether there is a next page
+    tasks = [TaskResponse.model_validate(task) for task in await db.scalars(query.limit(page_size + 1))]
+    occurrence_count = 0
+    if expand:
+        window_start, window_end = expansion_window(start_date, end_date)
+        occurrences = [
+            TaskResponse(**occurrence)
+            for occurrence in await expand_recurring_tasks(db, window_start, window_end, status, priority)
+        ]
+        occurrence_count = len(occurrences)
+        if position:
+            occurrences = [task for task in occurrences if is_after(task, sort_by, sort_order, *position)]
+        tasks = sort_items(tasks + occurrences, sort_by, sort_order)
+
+    items = tasks[:page_size]
+    next_cursor = None
+    if len(tasks) > page_size:
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, sort_by), last.id, sort_by, sort_order)
+
+    total_estimate = None
+    if include_total:
+        filtered = status is not None or priority is not None or expand
+        filters_key = (status, priority, start_date, end_date)
+        # The estimate covers stored rows; occurrences in the window are counted exactly
+        total_estimate = await estimate_count(db, filtered_query, filters_key, filtered) + occurrence_count
+
+    return TaskPage(items=items, next_cursor=next_cursor, total_estimate=total_estimate)
+
+# Endpoint: Export tasks (streamed)
+@app.get("/tasks/export")
+async def export_tasks(
+    format: str = Query("ndjson", description="Output format (ndjson or csv)"),
+    status: Optional[str] = Query(None, description="Filter by task status"),
+    priority: Optional[int] = Query(None, description="Filter by task priority"),
+    start_date: Optional[datetime] = Query(None, description="Filter tasks due after this date"),
+    end_date: Optional[datetime] = Query(None, description="Filter tasks due before this date"),
+    sort_by: Optional[str] = Query("due_date", description="Sort tasks by this field"),
+    sort_order: Optional[str] = Query("asc", description="Sort order (asc or desc)"),
+    ):
+    """
+    Stream every task matching the GET /tasks filters as NDJSON or CSV.
+
+    Rows come from a server-side cursor EXPORT_BATCH_SIZE at a time and the
+    next batch is only fetched once the client has taken the previous one,
+    so memory stays flat whatever the size of the export. With a date
+    window, recurrence occurrences are merged into the stream in the same
+    order as GET /tasks.
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+    if sort_by not in SORTABLE_FIELDS:
+        raise HTTPException(status_code=400, detail=f"Cannot sort by '{sort_by}'. Allowed: {', '.join(sorted(SORTABLE_FIELDS))}")
+    if sort_order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="sort_order must be 'asc' or 'desc'")
 
-    if hasattr(Task, sort_by):
-        if sort_order == "desc":
-            query = query.order_by(getattr(Task, sort_by).desc())
-        else:
-            query = query.order_by(getattr(Task, sort_by).asc())
+    query = filter_tasks(select(*EXPORT_COLUMNS), status, priority, start_date, end_date)
+    query = query.order_by(*order_clauses(sort_by, sort_order)).execution_options(yield_per=EXPORT_BATCH_SIZE)
 
-    total_tasks = query.count()
-    tasks = query.offset((page - 1) * page_size).limit(page_size).all()
+    async def rows():
+        # The session must outlive this handler, so the stream opens its own
+        query_label.set("export_tasks")
+        async with AsyncSessionLocal() as db:
+            if format == "csv":
+                yield csv_header()
+            occurrences = ()
+            if start_date is not None or end_date is not None:
+                window_start, window_end = expansion_window(start_date, end_date)
+                occurrences = await iter_recurring_tasks(
+                    db, window_start, window_end, status, priority, sort_by, sort_order,
+                )
+            result = await db.stream(query)
+            batches = merge_batches(
+                result.mappings().partitions(), occurrences, row_sort_key(sort_by, sort_order), sort_order == "desc",
+            )
+            async for batch in batches:
+                yield format_rows(batch, format)
 
-    return tasks
+    return StreamingResponse(
+        rows(), media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="tasks.{format}"'},
+    )
+
+# Endpoint: Search tasks
+@app.get("/tasks/search", response_model=TaskSearchPage)
+async def search_tasks(
+    q: str = Query(..., min_length=1, max_length=200, description="Search text (web search syntax)"),
+    db: AsyncSession = Depends(get_async_db),
+    status: Optional[str] = Query(None, description="Filter by task status"),
+    priority: Optional[int] = Query(None, description="Filter by task priority"),
+    start_date: Optional[datetime] = Query(None, description="Filter tasks due after this date"),
+    end_date: Optional[datetime] = Query(None, description="Filter tasks due before this date"),
+    page_size: int = Query(10, ge=1, le=100, description="Number of tasks per page"),
+    after: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    ):
+    """
+    Find tasks by description, best matches first.
+
+    Matches full-text (stemmed words, "quoted phrases", -exclusions) or by
+    trigram similarity, so small typos still match. Takes the GET /tasks
+    filters and pages with a cursor on (rank, id). As in GET /tasks, a date
+    window expands matching recurrence series into their occurrences inside
+    the window; each occurrence carries its series' rank.
+    """
+    rank = search_rank(q)
+    query = filter_tasks(select(Task, rank.label("rank")), status, priority, start_date, end_date)
+    query = query.where(search_clause(q))
+    position = None
+    if after:
+        try:
+            position = decode_cursor(after, "rank", "desc")
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        query = query.where(search_seek_clause(rank, *position))
+    query = query.order_by(rank.desc(), Task.id.desc()).limit(page_size + 1)
+
+    rows = (await db.execute(query)).all()
+    results = [
+        TaskSearchResult(**TaskResponse.model_validate(task).model_dump(), rank=task_rank)
+        for task, task_rank in rows
+    ]
+    if start_date is not None or end_date is not None:
+        # filter_tasks left the series rows out; match them and expand their occurrences
+        window_start, window_end = expansion_window(start_date, end_date)
+        series_query = select(Task, rank.label("rank")).where(
+            Task.deleted_at == None,
+            Task.recurrence != None,
+            Task.due_date <= window_end,
+            search_clause(q),
+        )
+        if status:
+            series_query = series_query.where(Task.status == status)
+        if priority is not None:
+            series_query = series_query.where(Task.priority == priority)
+        for series, series_rank in (await db.execute(series_query)).all():
+            for occurrence in expand_series(series, window_start, window_end):
+                result = TaskSearchResult(**occurrence, rank=series_rank)
+                if position is None or is_after(result, "rank", "desc", *position):
+                    results.append(result)
+        results = sort_items(results, "rank", "desc")
+
+    items = results[:page_size]
+    next_cursor = None
+    if len(results) > page_size:
+        last = items[-1]
+        next_cursor = encode_cursor(last.rank, last.id, "rank", "desc")
+    return TaskSearchPage(items=items, next_cursor=next_cursor)
+
+# Endpoint: Stream task changes (Server-Sent Events)
+@app.get("/tasks/stream")
+async def stream_tasks(
+    request: Request,
+    status: Optional[str] = Query(None, description="Filter by task status"),
+    priority: Optional[int] = Query(None, description="Filter by task priority"),
+    start_date: Optional[datetime] = Query(None, description="Filter tasks due after this date"),
+    end_date: Optional[datetime] = Query(None, description="Filter tasks due before this date"),
+    ):
+    """Push task change events matching the same filters as GET /tasks."""
+    subscriber = subscribe(
+        asyncio.get_running_loop(),
+        status=status, priority=priority, start_date=start_date, end_date=end_date,
+    )
+
+    async def events():
+        event_id = 0
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                if subscriber.overflowed:
+                    # Events were dropped for this client; it must refetch GET /tasks
+                    subscriber.overflowed = False
+                    event_id += 1
+                    yield f"id: {event_id}\nevent: resync\ndata: {{}}\n\n"
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), timeout=SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                event_id += 1
+                yield format_sse(event, event_id)
+        finally:
+            unsubscribe(subscriber)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 # Endpoint: Retrieve a specific task by ID
 @app.get("/tasks/{task_id}", response_model=TaskResponse)
-async def get_task(task_id: str, db: Session = Depends(get_db)):
+async def get_task(task_id: str, db: AsyncSession = Depends(get_async_db)):
     """Retrieve a specific task by ID."""
-    task = db.query(Task).filter(Task.id == task_id).first()
-    if not task:
+    payload = await get_task_json(task_id, db)
+    if payload is None:
         raise HTTPException(status_code=404, detail="Task not found")
-    return task
+    return Response(content=payload, media_type="application/json")
+
+async def get_task_json(task_id: str, db: AsyncSession):
+    """A task as TaskResponse JSON through the read cache, or None if it does not exist."""
+    async def load():
+        task = await db.get(Task, task_id)
+        return jsonable_encoder(TaskResponse.model_validate(task)) if task else None
+    return await read_through(task_key(task_id), task_generation_key(task_id), TASK_CACHE_TTL_SECONDS, load)
 
 # Endpoint: Update a task
 @app.put("/tasks/{task_id}", response_model=TaskResponse)
-async def update_task(task_id: str, task_update: TaskCreate, db: Session = Depends(get_db)):
+async def update_task(task_id: str, task_update: TaskCreate, db: AsyncSession = Depends(get_async_db)):
     """Update an existing task."""
-    task = db.query(Task).filter(Task.id == task_id).first()
+    task = await db.get(Task, task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
 
+    previous = task_snapshot(task)
     for key, value in task_update.dict(exclude_unset=True).items():
         setattr(task, key, value)
 
-    db.commit()
-    db.refresh(task)
+    await notify_task_change_async(db, "updated", task, previous)
+    await commit_and_invalidate(db)
+    await db.refresh(task)
     return task
 
+async def get_series_or_404(task_id: str, db: AsyncSession) -> Task:
+    """Load a live recurrence series or raise 404."""
+    series = await db.get(Task, task_id)
+    if series and series.deleted_at is not None:
+        series = None
+    if not series or not series.recurrence:
+        raise HTTPException(status_code=404, detail="Recurring task not found")
+    return series
+
+# Endpoint: Edit a single occurrence of a recurring task
+@app.put("/tasks/{task_id}/occurrences/{occurrence_date}", response_model=TaskResponse)
+async def update_occurrence(task_id: str, occurrence_date: datetime, task_update: TaskCreate, db: AsyncSession = Depends(get_async_db)):
+    """Store one occurrence of a series as its own task and update it."""
+    series = await get_series_or_404(task_id, db)
+    try:
+        occurrence = await materialize_occurrence(series, occurrence_date, db)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    previous = task_snapshot(occurrence)
+    for key, value in task_update.dict(exclude_unset=True).items():
+        if key != "recurrence":
+            setattr(occurrence, key, value)
+
+    await notify_task_change_async(db, "updated", occurrence, previous)
+    await commit_and_invalidate(db)
+    await db.refresh(occurrence)
+    return occurrence
+
+# Endpoint: Complete a single occurrence of a recurring task
+@app.post("/tasks/{task_id}/occurrences/{occurrence_date}/complete", response_model=TaskResponse)
+async def complete_occurrence(task_id: str, occurrence_date: datetime, db: AsyncSession = Depends(get_async_db)):
+    """Store one occurrence of a series as its own task and mark it completed."""
+    series = await get_series_or_404(task_id, db)
+    try:
+        occurrence = await materialize_occurrence(series, occurrence_date, db)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    previous = task_snapshot(occurrence)
+    occurrence.status = "completed"
+    await notify_task_change_async(db, "updated", occurrence, previous)
+    await commit_and_invalidate(db)
+    await db.refresh(occurrence)
+    return occurrence
+
+# Endpoint: Skip a single occurrence of a recurring task
+@app.delete("/tasks/{task_id}/occurrences/{occurrence_date}")
+async def delete_occurrence(task_id: str, occurrence_date: datetime, db: AsyncSession = Depends(get_async_db)):
+    """Remove one occurrence from a series without touching the others."""
+    series = await get_series_or_404(task_id, db)
+    if not is_occurrence(series, occurrence_date):
+        raise HTTPException(status_code=400, detail=f"{occurrence_date.isoformat()} is not an occurrence of task {task_id}")
+    skip_occurrence(series, occurrence_date)
+    await notify_task_change_async(db, "updated", series)
+    await commit_and_invalidate(db)
+    return {"detail": "Occurrence removed from the series."}
+
 # Endpoint: Delete a task
 @app.delete("/tasks/{task_id}")
-async def delete_task(task_id: str, db: Session = Depends(get_db)):
+async def delete_task(task_id: str, db: AsyncSession = Depends(get_async_db)):
     """Soft - Delete a task."""
-    task = db.query(Task).filter(Task.id == task_id).first()
+    task = await db.get(Task, task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
 
     task.deleted_at = datetime.utcnow()
-    db.commit()
+    await notify_task_change_async(db, "deleted", task)
+    await commit_and_invalidate(db)
     return {"detail": "Task marked as deleted."}
 
-@app.post("/tasks", response_model=TaskResponse)
-async def add_task(command: str, db: Session = Depends(get_db)):
-    task_data = process_command(command)
-
-    if not task_data or "error" in task_data:
-        raise HTTPException(status_code=400, detail=task_data.get("error", "Invalid command"))
-
-    new_task = Task(
-        description=task_data["description"],
-        due_date=task_data.get("due_date"),
-        status="pending",
-        priority=task_data.get("priority", 0),
-        recurrence=task_data.get("recurrence"),
-    )
-    db.add(new_task)
-    db.commit()
-    db.refresh(new_task)
-
-    if new_task.recurrence:
-        generate_recurring_tasks(new_task, new_task.recurrence, db)
-
-    return new_task
-
 # Endpoint: get status of backgroundtask...
 @app.get("/tasks/{task_id}/status")
-async def get_background_task_status(task_id: str, db: Session = Depends(get_db)):
+async def get_background_task_status(task_id: str, db: AsyncSession = Depends(get_async_db)):
     """
     Retrieve the status of a background task.
     Args:
@@ -160,8 +613,7 @@ async def get_background_task_status(task_id: str, db: Session = Depends(get_db)
     Returns:
         dict: Task status and result.
     """
-    task = db.query(Task).filter(Task.id == task_id).first()
-    if not task:
+    if await get_task_json(task_id, db) is None:
         raise HTTPException(status_code=404, detail=f"Task {task_id} does not exist in the database.")
 
     try:
@@ -173,18 +625,61 @@ async def get_background_task_status(task_id: str, db: Session = Depends(get_db)
         raise HTTPException(status_code=500, detail=str(e))
     
 @app.post("/tasks/{task_id}/restore")
-async def restore_task(task_id: str, db: Session = Depends(get_db)):
+async def restore_task(task_id: str, db: AsyncSession = Depends(get_async_db)):
     """Restore a soft-deleted task."""
-    task = db.query(Task).filter(Task.id == task_id).first()
+    task = await db.get(Task, task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     if task.deleted_at is None:
         raise HTTPException(status_code=400, detail="Task is not deleted, cannot restore")
 
     task.deleted_at = None
-    db.commit()
+    await notify_task_change_async(db, "restored", task)
+    await commit_and_invalidate(db)
     return {"message": f"Task {task_id} restored successfully"}
     
+# Endpoint: command-parse cache counters
+@app.get("/stats/parse-cache")
+async def get_parse_cache_stats():
+    """Return hit/miss counters for the command-parse cache."""
+    return parse_cache_stats()
+
+# Endpoint: local parser counters
+@app.get("/stats/local-parser")
+async def get_local_parser_stats():
+    """Return the fraction of commands served without the LLM."""
+    return local_parse_stats()
+
+# Endpoint: email delivery counters
+@app.get("/stats/email-queue")
+async def get_email_queue_stats():
+    """Return email delivery counters, queue depth and worker count."""
+    return email_queue_stats()
+
+# Endpoint: LLM circuit breaker state
+@app.get("/stats/llm-breaker")
+async def get_llm_breaker_stats():
+    """Return this worker's LLM circuit breaker state and window statistics."""
+    return llm_breaker.snapshot()
+
+# Endpoint: Prometheus metrics
+@app.get("/metrics")
+async def get_metrics():
+    """Expose latency histograms and counters in the Prometheus text format."""
+    payload, content_type = render_metrics()
+    return Response(content=payload, media_type=content_type)
+
 @app.on_event("startup")
 async def startup_event():
-    start_scheduler()
\ No newline at end of file
+    configure_logging()
+    start_scheduler()
+    start_change_listener()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    stop_change_listener()
+    # Deliver the reminders still queued before the process exits
+    await asyncio.to_thread(stop_email_workers)
+    await close_http_session()
+    await dispose_async_engine()
+    stop_logging()
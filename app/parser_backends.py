@@ -0,0 +1,472 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+from datetime import datetime
+from pydantic import ValidationError
+from vault.fetch_secrets import openai_key_provider
+from app.llm_client import acreate_chat_completion, create_chat_completion
+from app.services import (
+    BATCH_PROMPT_SIZE, BATCH_LLM_CONCURRENCY, CLOCK_PATTERN, try_local_parse, build_task_data, handle_gpt_response,
+    extract_gpt_content, build_request, build_batch_request, record_parse,
+)
+from database_tools.schemas import TaskCreate
+from utils.nlp_helpers import score_command
+from utils.parse_cache import cache_key, get_cached_parse, get_cached_parse_async, store_parse, store_parse_async
+from utils.llm_limiter import LLMOverloaded, run_limited
+from utils.single_flight import single_flight, single_flight_sync
+from utils.circuit_breaker import CircuitBreaker
+from utils.metrics import PARSE_RESULTS, PARSE_DEGRADED
+
+# Backend used when a request does not pick one, and the ones requests may pick
+PARSER_BACKEND = os.getenv("PARSER_BACKEND", "openai")
+PARSER_REQUEST_BACKENDS = set(filter(None, os.getenv("PARSER_REQUEST_BACKENDS", "openai,local").split(",")))
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
+
+# Record/replay store: "replay" serves stored responses only, "record" calls OpenAI and stores them
+PARSER_REPLAY_DIR = os.getenv("PARSER_REPLAY_DIR", "replay_store")
+PARSER_REPLAY_MODE = os.getenv("PARSER_REPLAY_MODE", "replay")
+
+# Longest a request waits for the LLM before the local parser answers instead
+PARSE_DEADLINE_SECONDS = float(os.getenv("PARSE_DEADLINE_SECONDS", "8"))
+
+llm_breaker = CircuitBreaker("openai")
+# Completions that outlived their request's deadline; they still fill the parse cache
+_late_completions = set()
+
+
+def encode_task_data(task_data: dict) -> str:
+    """Task data as JSON for sharing a parse across workers."""
+    return json.dumps(task_data, default=str)
+
+
+def decode_task_data(raw) -> dict:
+    """Inverse of encode_task_data."""
+    task_data = json.loads(raw)
+    if isinstance(task_data.get("due_date"), str):
+        task_data["due_date"] = datetime.fromisoformat(task_data["due_date"])
+    return task_data
+
+
+def degraded_parse(command: str, start: float, reason: str) -> dict:
+    """
+    Parse a command with the local rules because the LLM could not be used.
+
+    The result is flagged low_confidence so callers can tell the user, or
+    queue the task for review.
+
+    Args:
+        command (str): The user's command.
+        start (float): perf_counter() when parsing started.
+        reason (str): deadline, breaker_open or llm_error.
+
+    Returns:
+        dict: Validated task data, or an error dict.
+    """
+    PARSE_DEGRADED.labels(reason).inc()
+    task_data, confidence = score_command(command)
+    if not task_data.get("description"):
+        error = "The task parser is unavailable and the command could not be parsed locally."
+        return record_parse("degraded", start, {"error": error})
+    try:
+        task_data = TaskCreate(**task_data).dict()
+    except ValidationError as e:
+        return record_parse("degraded", start, {"error": "Validation failed.", "message": str(e)})
+    task_data.update(low_confidence=True, confidence=round(confidence, 2), degraded_reason=reason)
+    return record_parse("degraded", start, task_data)
+
+
+def _finish_late(flight: asyncio.Future):
+    _late_completions.discard(flight)
+    if not flight.cancelled() and flight.exception() is not None:
+        logging.warning(f"LLM parse failed after its deadline: {flight.exception()}")
+
+
+class ReplayMiss(LookupError):
+    """No stored response for a prompt in replay mode."""
+
+
+class ParserBackend:
+    """Turns commands into task data (or an error dict)."""
+
+    name = None
+
+    async def parse(self, command: str) -> dict:
+        raise NotImplementedError
+
+    def parse_sync(self, command: str) -> dict:
+        raise NotImplementedError
+
+    async def parse_batch(self, commands: list) -> list:
+        return list(await asyncio.gather(*(self.parse(command) for command in commands)))
+
+
+class LocalBackend(ParserBackend):
+    """The rule-based parser alone: no network, no cache, deterministic."""
+
+    name = "local"
+
+    def parse_sync(self, command: str) -> dict:
+        start = time.perf_counter()
+        task_data, _ = score_command(command)
+        if not task_data.get("description"):
+            return record_parse("local", start, {"error": "Could not find a task description."})
+        try:
+            return record_parse("local", start, TaskCreate(**task_data).dict())
+        except ValidationError as e:
+            return record_parse("local", start, {"error": "Validation failed.", "message": str(e)})
+
+    async def parse(self, command: str) -> dict:
+        return self.parse_sync(command)
+
+
+class OpenAIBackend(ParserBackend):
+    """
+    Local rules when confident, then the parse cache, then a chat completion.
+
+    Subclasses change where completions come from by overriding complete()
+    and complete_sync().
+    """
+
+    name = "openai"
+    source = "llm"
+
+    async def complete(self, messages: list, max_tokens: int, **options):
+        # The key is loaded on first use; only that first load touches Vault
+        api_key = openai_key_provider.cached() or await asyncio.to_thread(openai_key_provider.get)
+        return await run_limited(
+            lambda: acreate_chat_completion(
+                model=OPENAI_MODEL, messages=messages, max_tokens=max_tokens, api_key=api_key, **options,
+            ),
+            messages, max_tokens,
+        )
+
+    def complete_sync(self, messages: list, max_tokens: int, **options):
+        return create_chat_completion(
+            model=OPENAI_MODEL, messages=messages, max_tokens=max_tokens, api_key=openai_key_provider.get(),
+            **options,
+        )
+
+    async def parse(self, command: str) -> dict:
+        start = time.perf_counter()
+        local_task = try_local_parse(command)
+        if local_task is not None:
+            return record_parse("local", start, local_task)
+
+        cached_content = await get_cached_parse_async(command)
+        if cached_content is not None:
+            return record_parse("cache", start, build_task_data(cached_content))
+
+        if not llm_breaker.allow():
+            return degraded_parse(command, start, "breaker_open")
+
+        # Only the caller whose call reaches the LLM reports to the breaker; callers
+        # sharing that call would otherwise count its outcome once each
+        own_call = False
+
+        async def call():
+            nonlocal own_call
+            own_call = True
+            return await self.parse_remote(command)
+
+        # Identical commands already being parsed share that parse's result. The
+        # flight is shielded: past the deadline it keeps running and fills the cache.
+        flight = asyncio.ensure_future(single_flight(
+            f"{self.name}:{cache_key(command)}", call, encode=encode_task_data, decode=decode_task_data,
+        ))
+        remaining = PARSE_DEADLINE_SECONDS - (time.perf_counter() - start)
+        try:
+            task_data, shared = await asyncio.wait_for(asyncio.shield(flight), timeout=max(remaining, 0))
+        except asyncio.TimeoutError:
+            if own_call:
+                llm_breaker.record(time.perf_counter() - start, ok=False)
+            _late_completions.add(flight)
+            flight.add_done_callback(_finish_late)
+            logging.warning(f"LLM parse missed its {PARSE_DEADLINE_SECONDS}s deadline; using the local parser")
+            return degraded_parse(command, start, "deadline")
+        except LLMOverloaded:
+            raise
+        except ReplayMiss as e:
+            return record_parse(self.source, start, {"error": str(e)})
+        except Exception as e:
+            if own_call:
+                llm_breaker.record(time.perf_counter() - start, ok=False)
+            logging.error(f"Unexpected error while processing command: {e}")
+            return degraded_parse(command, start, "llm_error")
+        if not shared:
+            llm_breaker.record(time.perf_counter() - start, ok=True)
+        return record_parse("coalesced" if shared else self.source, start, dict(task_data))
+
+    async def parse_remote(self, command: str) -> dict:
+        """
+        Parse a command with a completion and cache the parsed content.
+
+        Completion errors propagate; parse() decides how to degrade.
+        """
+        response = await self.complete(**build_request(command))
+        parsed_content, task_data = handle_gpt_response(command, response)
+        if parsed_content is not None and "error" not in task_data:
+            await store_parse_async(command, parsed_content)
+        return task_data
+
+    def parse_sync(self, command: str) -> dict:
+        start = time.perf_counter()
+        local_task = try_local_parse(command)
+        if local_task is not None:
+            return record_parse("local", start, local_task)
+
+        cached_content = get_cached_parse(command)
+        if cached_content is not None:
+            return record_parse("cache", start, build_task_data(cached_content))
+
+        if not llm_breaker.allow():
+            return degraded_parse(command, start, "breaker_open")
+
+        own_call = False
+
+        def call():
+            nonlocal own_call
+            own_call = True
+            return self.parse_remote_sync(command)
+
+        # Celery tasks have no caller waiting, so there is no deadline here
+        try:
+            task_data, shared = single_flight_sync(f"{self.name}:{cache_key(command)}", call)
+        except ReplayMiss as e:
+            return record_parse(self.source, start, {"error": str(e)})
+        except Exception as e:
+            if own_call:
+                llm_breaker.record(time.perf_counter() - start, ok=False)
+            logging.error(f"Unexpected error while processing command: {e}")
+            return degraded_parse(command, start, "llm_error")
+        if not shared:
+            llm_breaker.record(time.perf_counter() - start, ok=True)
+        return record_parse("coalesced" if shared else self.source, start, dict(task_data))
+
+    def parse_remote_sync(self, command: str) -> dict:
+        response = self.complete_sync(**build_request(command))
+        parsed_content, task_data = handle_gpt_response(command, response)
+        if parsed_content is not None and "error" not in task_data:
+            store_parse(command, parsed_content)
+        return task_data
+
+    async def parse_chunk(self, commands: list, semaphore: asyncio.Semaphore) -> list:
+        """
+        Parse a chunk of commands with a single completion.
+
+        If the combined reply cannot be matched to the commands, each command in
+        the chunk is parsed on its own instead. If the LLM is failing, slow or
+        skipped by the breaker, the chunk is parsed locally and flagged.
+
+        Args:
+            commands (list): Commands to parse.
+            semaphore (asyncio.Semaphore): Bounds concurrent completions.
+
+        Returns:
+            list: Task data or error dict per command, in order.
+        """
+        items = None
+        degraded = None
+        async with semaphore:
+            start = time.perf_counter()
+            if not llm_breaker.allow():
+                degraded = "breaker_open"
+            else:
+                try:
+                    response = await asyncio.wait_for(
+                        self.complete(**build_batch_request(commands)),
+                        timeout=PARSE_DEADLINE_SECONDS,
+                    )
+                except asyncio.TimeoutError:
+                    llm_breaker.record(time.perf_counter() - start, ok=False)
+                    degraded = "deadline"
+                except LLMOverloaded:
+                    raise  # retrying command by command would only add load
+                except ReplayMiss as e:
+                    logging.error(f"Batch parsing failed, parsing {len(commands)} commands individually: {e}")
+                except Exception as e:
+                    llm_breaker.record(time.perf_counter() - start, ok=False)
+                    logging.error(f"Batch completion failed, parsing {len(commands)} commands locally: {e}")
+                    degraded = "llm_error"
+                else:
+                    llm_breaker.record(time.perf_counter() - start, ok=True)
+                    try:
+                        items = extract_gpt_content(response)
+                        if not isinstance(items, list) or len(items) != len(commands):
+                            raise ValueError(f"Expected {len(commands)} items in batch response")
+                    except Exception as e:
+                        logging.error(f"Batch parsing failed, parsing {len(commands)} commands individually: {e}")
+                        items = None
+
+        if degraded is not None:
+            return [degraded_parse(command, start, degraded) for command in commands]
+        if items is None:
+            async def parse_one(command):
+                async with semaphore:
+                    return await self.parse(command)
+            return list(await asyncio.gather(*(parse_one(command) for command in commands)))
+
+        results = []
+        for command, item in zip(commands, items):
+            if not isinstance(item, dict):
+                PARSE_RESULTS.labels("error").inc()
+                results.append({"error": "Invalid command"})
+                continue
+            task_data = build_task_data(item)
+            if "error" not in task_data:
+                await store_parse_async(command, item)
+            PARSE_RESULTS.labels("error" if "error" in task_data else self.source).inc()
+            results.append(task_data)
+        return results
+
+    async def parse_batch(self, commands: list) -> list:
+        """Parse many commands, packing the ones that need a completion into few prompts."""
+        results = [None] * len(commands)
+        pending = []
+        for index, command in enumerate(commands):
+            local_task = try_local_parse(command)
+            if local_task is not None:
+                PARSE_RESULTS.labels("local").inc()
+                results[index] = local_task
+                continue
+            cached_content = await get_cached_parse_async(command)
+            if cached_content is not None:
+                PARSE_RESULTS.labels("cache").inc()
+                results[index] = build_task_data(cached_content)
+                continue
+            pending.append(index)
+
+        semaphore = asyncio.Semaphore(BATCH_LLM_CONCURRENCY)
+        chunks = [pending[i:i + BATCH_PROMPT_SIZE] for i in range(0, len(pending), BATCH_PROMPT_SIZE)]
+        chunk_results = await asyncio.gather(
+            *(self.parse_chunk([commands[i] for i in chunk], semaphore) for chunk in chunks)
+        )
+        for chunk, parsed in zip(chunks, chunk_results):
+            for index, task_data in zip(chunk, parsed):
+                results[index] = task_data
+        return results
+
+
+class ReplayBackend(OpenAIBackend):
+    """
+    Serve completions from an on-disk store keyed by the exact prompt.
+
+    In record mode, misses are sent to OpenAI and the response is stored, so a
+    store can be built by running real traffic or a test suite once.
+    """
+
+    name = "replay"
+    source = "replay"
+
+    def __init__(self, store_dir: str, mode: str):
+        if mode not in ("replay", "record"):
+            raise ValueError(f"PARSER_REPLAY_MODE must be 'replay' or 'record', not '{mode}'")
+        self.store_dir = store_dir
+        self.mode = mode
+
+    def path_for(self, request: dict) -> str:
+        # The prompt's clock changes every minute; key recordings on the rest of it
+        keyed = dict(request, messages=[
+            dict(message, content=CLOCK_PATTERN.sub("Now:", message["content"])) for message in request["messages"]
+        ])
+        key = hashlib.sha256(json.dumps(keyed, sort_keys=True).encode("utf-8")).hexdigest()
+        return os.path.join(self.store_dir, key[:2], f"{key}.json")
+
+    def load(self, request: dict):
+        try:
+            with open(self.path_for(request), "r") as file:
+                return json.load(file)["response"]
+        except FileNotFoundError:
+            if self.mode == "replay":
+                raise ReplayMiss(f"No recorded response for this prompt in {self.store_dir}")
+            return None
+
+    def save(self, request: dict, response):
+        path = self.path_for(request)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w") as file:
+            json.dump({"request": request, "response": response}, file, indent=2)
+        os.replace(temp_path, path)
+
+    async def complete(self, messages: list, max_tokens: int, **options):
+        request = {"model": OPENAI_MODEL, "messages": messages, "max_tokens": max_tokens, **options}
+        response = self.load(request)
+        if response is None:
+            response = await super().complete(messages, max_tokens, **options)
+            self.save(request, response)
+        return response
+
+    def complete_sync(self, messages: list, max_tokens: int, **options):
+        request = {"model": OPENAI_MODEL, "messages": messages, "max_tokens": max_tokens, **options}
+        response = self.load(request)
+        if response is None:
+            response = super().complete_sync(messages, max_tokens, **options)
+            self.save(request, response)
+        return response
+
+
+_backends = {}
+
+
+def get_backend(name: str = None) -> ParserBackend:
+    """
+    Return a parser backend by name (default: PARSER_BACKEND).
+
+    Raises:
+        ValueError: If the name is unknown.
+    """
+    name = name or PARSER_BACKEND
+    if name not in _backends:
+        if name == "openai":
+            _backends[name] = OpenAIBackend()
+        elif name == "local":
+            _backends[name] = LocalBackend()
+        elif name == "replay":
+            _backends[name] = ReplayBackend(PARSER_REPLAY_DIR, PARSER_REPLAY_MODE)
+        else:
+            raise ValueError(f"Unknown parser backend '{name}'")
+    return _backends[name]
+
+
+def request_backend(name: str = None) -> ParserBackend:
+    """
+    Resolve the backend a request asked for.
+
+    Raises:
+        ValueError: If the backend is unknown or not enabled for requests.
+    """
+    if name and name != PARSER_BACKEND and name not in PARSER_REQUEST_BACKENDS:
+        allowed = ", ".join(sorted(PARSER_REQUEST_BACKENDS | {PARSER_BACKEND}))
+        raise ValueError(f"Parser backend '{name}' is not available. Allowed: {allowed}")
+    return get_backend(name)
+
+
+async def process_command_async(command: str, backend: str = None) -> dict:
+    """Process user input with a parser backend without blocking the event loop."""
+    return await get_backend(backend).parse(command)
+
+
+def process_command(command: str, backend: str = None) -> dict:
+    """
+    Synchronous counterpart of process_command_async.
+
+    Used by Celery workers and other code that does not run an event loop.
+    """
+    return get_backend(backend).parse_sync(command)
+
+
+async def process_commands_batch_async(commands: list, backend: str = None) -> list:
+    """
+    Parse many commands with a parser backend.
+
+    Args:
+        commands (list): The user's commands.
+        backend (str): Backend name (default: PARSER_BACKEND).
+
+    Returns:
+        list: Task data or error dict per command, in order.
+    """
+    return await get_backend(backend).parse_batch(commands)
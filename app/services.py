@@ -1,21 +1,38 @@
-from vault.fetch_secrets import fetch_openai_key, TOKEN_FILE
-import openai
+from vault.fetch_secrets import TOKEN_FILE
+import time
+import heapq
 import logging
 import json
 import os
+import re
 import parsedatetime
 from pydantic import ValidationError
 from database_tools.schemas import TaskCreate
 from database_tools.models import Task
 from datetime import datetime, timedelta
-from dateutil.rrule import rrule, DAILY, WEEKLY, MONTHLY
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from utils.nlp_helpers import score_command
+from app.change_feed import notify_task_change_async
+from utils.task_cache import commit_and_invalidate
+from utils.recurrence import series_rule, is_occurrence, expand_series, iter_series
+from utils.pagination import row_sort_key
+from utils.metrics import PROCESS_COMMAND_SECONDS, PARSE_RESULTS, VALIDATION_FAILURES
 
 
-logging.basicConfig(level=logging.DEBUG)
+# Commands the local rules score at or above this are not sent to GPT
+LOCAL_PARSE_THRESHOLD = float(os.getenv("LOCAL_PARSE_THRESHOLD", "0.8"))
+parse_stats = {"local": 0, "escalated": 0}
 
-# Fetch the OpenAI API key from Vault
-openai.api_key = fetch_openai_key()
+# Batch parsing: commands per GPT prompt and concurrent prompts per batch
+BATCH_PROMPT_SIZE = int(os.getenv("BATCH_PROMPT_SIZE", "20"))
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "4"))
+
+# "schema": a function call whose arguments follow a schema derived from TaskCreate.
+# "legacy": the prose prompt asking for free-form JSON.
+PARSER_PROMPT = os.getenv("PARSER_PROMPT", "schema")
+# Reply cap per command (schema prompt); the legacy prompt keeps its original 100
+PARSE_MAX_TOKENS = int(os.getenv("PARSE_MAX_TOKENS", "150"))
 
 def delete_root_token_after_process_start():
     """Delete Vault's root token after startup for security."""
@@ -36,12 +53,14 @@ def parse_natural_language_date(date_str: str) -> str:
     cal = parsedatetime.Calendar()
     time_struct, parse_status = cal.parse(date_str)
     
-    if parse_status == 1: 
+    # 1: date, 2: time of day, 3: both
+    if parse_status:
         parsed_date = datetime(*time_struct[:6])
         # Check if the parsed date is in the past and adjust if necessary
         if parsed_date < datetime.now():
             logging.warning(f"Parsed date {parsed_date} is in the past. Adjusting...")
-            parsed_date += timedelta(days=7)  # Add a week to ensure a future date
+            # A time of day that has passed means tomorrow; a date means a week on
+            parsed_date += timedelta(days=1 if parse_status == 2 else 7)
         return parsed_date.isoformat()
     
     logging.warning(f"Could not parse due_date: {date_str}")
@@ -58,57 +77,143 @@ def fallback_parse_command(command: str) -> dict:
         dict: Extracted task details.
     """
     try:
-        parts = command.split(",")
-        description = parts[0].strip()
-        due_date = None
-        recurrence = None
-
-        # Parse due_date from the command
-        for part in parts:
-            if "on" in part or "by" in part:
-                due_date = parse_natural_language_date(part.strip())
-            elif any(freq in part for freq in ["daily", "weekly", "monthly"]):
-                recurrence = part.strip().lower()
-
-        return {
-            "description": description,
-            "due_date": due_date,
-            "recurrence": recurrence,
-        }
+        task_data, _ = score_command(command)
+        return task_data
     except Exception as e:
         logging.error(f"Fallback parsing failed: {e}")
         return {}
 
-def process_command(command: str) -> dict:
-    """Process user input using GPT and handle JSON/validation errors."""
+def try_local_parse(command: str):
+    """
+    Parse a command with the local rules if they are confident enough.
+
+    Args:
+        command (str): The user's command.
+
+    Returns:
+        dict: Validated task data, or None if the command needs the LLM.
+    """
+    task_data, confidence = score_command(command)
+    if confidence >= LOCAL_PARSE_THRESHOLD:
+        try:
+            validated_task = TaskCreate(**task_data).dict()
+        except ValidationError as e:
+            logging.debug(f"Local parse failed validation: {e}")
+        else:
+            parse_stats["local"] += 1
+            return validated_task
+    parse_stats["escalated"] += 1
+    return None
+
+def local_parse_stats() -> dict:
+    """Return how many commands were served by the local parser."""
+    total = parse_stats["local"] + parse_stats["escalated"]
+    return {
+        **parse_stats,
+        "threshold": LOCAL_PARSE_THRESHOLD,
+        "local_fraction": parse_stats["local"] / total if total else 0.0,
+    }
+
+SYSTEM_PROMPT = (
+    "You are a task management assistant. "
+    "Always respond in JSON format like this: "
+    '{"description": "...", "due_date": "...", "background": true/false, "recurrence": "daily/weekly/monthly"}. '
+    "Ensure valid JSON in your responses. If information is missing, suggest fixes."
+)
+
+# TaskCreate fields the model fills in; new tasks are always "pending"
+PROMPT_FIELDS = ("description", "due_date", "priority", "recurrence")
+# The prompt's clock line; stripped from replay store keys so recordings stay valid
+CLOCK_PATTERN = re.compile(r"Now: \S+ \w+\.")
+
+def task_schema() -> dict:
+    """
+    Compact JSON schema for one parsed command, derived from TaskCreate.
+
+    Nullable fields become plain optional ones (the model omits what it does
+    not know), and due dates are asked for as local YYYY-MM-DDTHH:MM so they
+    can be read without parse_natural_language_date.
+    """
+    fields = TaskCreate.model_json_schema()["properties"]
+    properties = {}
+    for name in PROMPT_FIELDS:
+        field = next(option for option in fields[name].get("anyOf", [fields[name]]) if option["type"] != "null")
+        properties[name] = {key: value for key, value in field.items() if key in ("type", "enum")}
+    properties["due_date"]["description"] = "YYYY-MM-DDTHH:MM"
+    properties["background"] = {"type": "boolean"}
+    return {"type": "object", "properties": properties, "required": ["description"]}
+
+TASK_SCHEMA = task_schema()
+PARSE_FUNCTION = {"name": "create_task", "parameters": TASK_SCHEMA}
+BATCH_PARSE_FUNCTION = {
+    "name": "create_tasks",
+    "parameters": {
+        "type": "object",
+        "properties": {"tasks": {"type": "array", "items": TASK_SCHEMA}},
+        "required": ["tasks"],
+    },
+}
+
+def schema_system_prompt(now: datetime = None) -> str:
+    """System prompt for the schema prompt; relative dates resolve against now."""
+    now = now or datetime.now()
+    return f"Extract the task. Omit unknown fields. Now: {now:%Y-%m-%dT%H:%M} {now:%A}."
+
+def build_messages(command: str) -> list:
+    """Build the chat messages sent to GPT for a command (legacy prompt)."""
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": command},
+    ]
+
+def build_request(command: str) -> dict:
+    """
+    Build the completion arguments for one command.
+
+    Returns:
+        dict: messages, max_tokens and, for the schema prompt, the function to call.
+    """
+    if PARSER_PROMPT == "legacy":
+        return {"messages": build_messages(command), "max_tokens": 100}
+    return {
+        "messages": [
+            {"role": "system", "content": schema_system_prompt()},
+            {"role": "user", "content": command},
+        ],
+        "max_tokens": PARSE_MAX_TOKENS,
+        "functions": [PARSE_FUNCTION],
+        "function_call": {"name": PARSE_FUNCTION["name"]},
+    }
+
+def extract_gpt_content(response):
+    """Extract the JSON payload from a raw GPT response (content or function call)."""
+    message = response["choices"][0]["message"]
+    function_call = message.get("function_call")
+    if not function_call:
+        return json.loads(message["content"])
+
+    arguments = json.loads(function_call["arguments"])
+    if function_call.get("name") == BATCH_PARSE_FUNCTION["name"] and isinstance(arguments, dict):
+        return arguments.get("tasks")
+    return arguments
+
+def canonical_date(value):
+    """Read a due date already in ISO form, or return None."""
+    if not isinstance(value, str):
+        return None
     try:
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {
-                    "role": "system",
-                    "content": (
-                        "You are a task management assistant. "
-                        "Always respond in JSON format like this: "
-                        '{"description": "...", "due_date": "...", "background": true/false, "recurrence": "daily/weekly/monthly"}. '
-                        "Ensure valid JSON in your responses. If information is missing, suggest fixes."
-                    ),
-                },
-                {"role": "user", "content": command},
-            ],
-            max_tokens=100,
-        )
-
-        logging.debug(f"Raw OpenAI Response: {response}")
-        content = response["choices"][0]["message"]["content"]
-
-        # Parse content as JSON
-        parsed_content = json.loads(content)
-        logging.debug(f"Parsed JSON Content: {parsed_content}")
-
-        # Convert natural language dates to ISO format
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+def build_task_data(parsed_content: dict) -> dict:
+    """Resolve dates in parsed GPT content and validate it against TaskCreate."""
+    parsed_content = dict(parsed_content)
+    try:
+        # Dates in canonical form are used as is; anything else is natural language
         if "due_date" in parsed_content and parsed_content["due_date"]:
-            parsed_content["due_date"] = parse_natural_language_date(parsed_content["due_date"])
+            due_date = parsed_content["due_date"]
+            parsed_content["due_date"] = canonical_date(due_date) or parse_natural_language_date(due_date)
             
         # Convert "none" recurrence to None
         if "recurrence" in parsed_content and parsed_content["recurrence"] == "none":
@@ -123,11 +228,9 @@ def process_command(command: str) -> dict:
 
         return validated_task.dict()
 
-    except json.JSONDecodeError:
-        logging.error("Invalid JSON format received. Falling back to plain text response.")
-        return fallback_parse_command()
     except ValidationError as e:
         logging.error(f"Validation error: {e}")
+        VALIDATION_FAILURES.inc()
         missing_fields = [error['loc'][0] for error in e.errors()]
         suggestions = suggest_missing_fields(parsed_content)
 
@@ -140,27 +243,176 @@ def process_command(command: str) -> dict:
     except Exception as e:
         logging.error(f"Unexpected error while processing command: {e}")
         return {"error": str(e)}
-    
-def generate_recurring_tasks(task: Task, recurrence: str, db: Session, occurrences: int = 10):
-    """Generate recurring tasks based on recurrence."""
-    rules = {
-        "daily": DAILY,
-        "weekly": WEEKLY,
-        "monthly": MONTHLY,
+
+def handle_gpt_response(command: str, response):
+    """
+    Turn a raw GPT response into task data.
+
+    Returns:
+        tuple: (parsed GPT content or None, task data or error dict).
+    """
+    try:
+        parsed_content = extract_gpt_content(response)
+    except json.JSONDecodeError:
+        logging.error("Invalid JSON format received. Falling back to plain text response.")
+        return None, fallback_parse_command(command)
+    except Exception as e:
+        logging.error(f"Unexpected error while processing command: {e}")
+        return None, {"error": str(e)}
+    return parsed_content, build_task_data(parsed_content)
+
+def record_parse(source: str, start: float, task_data: dict) -> dict:
+    """Count how a command was parsed and how long it took."""
+    PROCESS_COMMAND_SECONDS.labels(source).observe(time.perf_counter() - start)
+    PARSE_RESULTS.labels("error" if "error" in task_data else source).inc()
+    return task_data
+
+BATCH_SYSTEM_PROMPT = (
+    "You are a task management assistant. "
+    "You will receive a numbered list of commands. "
+    "Respond with a JSON array containing exactly one object per command, in the same order, each like this: "
+    '{"description": "...", "due_date": "...", "background": true/false, "recurrence": "daily/weekly/monthly"}. '
+    "Ensure the whole response is a valid JSON array."
+)
+
+def build_batch_messages(commands: list) -> list:
+    """Build one chat prompt that asks GPT to parse several commands (legacy prompt)."""
+    numbered = "\n".join(f"{i}. {command}" for i, command in enumerate(commands, start=1))
+    return [
+        {"role": "system", "content": BATCH_SYSTEM_PROMPT},
+        {"role": "user", "content": numbered},
+    ]
+
+def build_batch_request(commands: list) -> dict:
+    """Build the completion arguments for a numbered batch of commands."""
+    if PARSER_PROMPT == "legacy":
+        return {"messages": build_batch_messages(commands), "max_tokens": 100 * len(commands)}
+    numbered = "\n".join(f"{i}. {command}" for i, command in enumerate(commands, start=1))
+    return {
+        "messages": [
+            {"role": "system", "content": f"{schema_system_prompt()} One task per numbered command, in order."},
+            {"role": "user", "content": numbered},
+        ],
+        "max_tokens": PARSE_MAX_TOKENS * len(commands),
+        "functions": [BATCH_PARSE_FUNCTION],
+        "function_call": {"name": BATCH_PARSE_FUNCTION["name"]},
     }
-    if recurrence not in rules:
-        raise ValueError(f"Unsupported recurrence: {recurrence}")
-    dates = list(rrule(rules[recurrence], dtstart=task.due_date, count=occurrences))
-    for date in dates[1:]:  
-        new_task = Task(
-            description=task.description,
-            due_date=date,
-            status=task.status,
-            priority=task.priority,
-            recurrence=task.recurrence,
-        )
-        db.add(new_task)
-    db.commit()
+
+async def generate_recurring_tasks(task: Task, recurrence: str, db: AsyncSession):
+    """
+    Turn a task into a recurrence series.
+
+    The task row itself stores the rule, its due_date is the series start and
+    occurrences are expanded on read (see utils.recurrence.expand_series).
+    """
+    if task.due_date is None:
+        task.due_date = datetime.now().replace(second=0, microsecond=0)
+    series_rule(recurrence, task.due_date)
+    task.recurrence = recurrence
+    if task.recurrence_exceptions is None:
+        task.recurrence_exceptions = []
+    await notify_task_change_async(db, "updated", task)
+    await commit_and_invalidate(db)
+
+async def expand_recurring_tasks(db: AsyncSession, window_start: datetime, window_end: datetime,
+                                 status: str = None, priority: int = None) -> list:
+    """
+    Expand all live recurrence series into virtual occurrences for a window.
+
+    Args:
+        db (AsyncSession): Database session.
+        window_start (datetime): Start of the window (inclusive).
+        window_end (datetime): End of the window (inclusive).
+        status (str): Only expand series with this status.
+        priority (int): Only expand series with this priority.
+
+    Returns:
+        list: Occurrence dicts shaped like TaskResponse.
+    """
+    occurrences = []
+    for series in (await db.scalars(series_query(window_end, status, priority))).all():
+        occurrences.extend(expand_series(series, window_start, window_end))
+    return occurrences
+
+async def iter_recurring_tasks(db: AsyncSession, window_start: datetime, window_end: datetime,
+                               status: str, priority: int, sort_by: str, sort_order: str):
+    """
+    Expand live recurrence series for a window into one stream in GET /tasks order.
+
+    Sorted by due_date ascending, occurrences are generated as they are
+    consumed; other sorts hold each series' occurrences to order them.
+
+    Returns:
+        iterator: Occurrence dicts shaped like TaskResponse.
+    """
+    key = row_sort_key(sort_by, sort_order)
+    reverse = sort_order == "desc"
+    streams = []
+    for series in (await db.scalars(series_query(window_end, status, priority))).all():
+        occurrences = iter_series(series, window_start, window_end)
+        if sort_by != "due_date" or reverse:
+            occurrences = sorted(occurrences, key=key, reverse=reverse)
+        streams.append(occurrences)
+    return heapq.merge(*streams, key=key, reverse=reverse)
+
+def series_query(window_end: datetime, status: str = None, priority: int = None):
+    """Live recurrence series that may have occurrences up to window_end."""
+    query = select(Task).where(
+        Task.deleted_at == None,
+        Task.recurrence != None,
+        Task.due_date <= window_end,
+    )
+    if status:
+        query = query.where(Task.status == status)
+    if priority is not None:
+        query = query.where(Task.priority == priority)
+    return query
+
+async def materialize_occurrence(series: Task, occurrence_date: datetime, db: AsyncSession) -> Task:
+    """
+    Store one occurrence of a series as its own row so it can be edited.
+
+    Args:
+        series (Task): The series row.
+        occurrence_date (datetime): The occurrence to materialize.
+        db (AsyncSession): Database session.
+
+    Returns:
+        Task: The new (or previously materialized) occurrence row.
+    """
+    existing = (await db.scalars(select(Task).where(
+        Task.series_id == series.id,
+        Task.occurrence_date == occurrence_date,
+    ).limit(1))).first()
+    if existing:
+        return existing
+    if not is_occurrence(series, occurrence_date):
+        raise ValueError(f"{occurrence_date.isoformat()} is not an occurrence of task {series.id}")
+
+    occurrence = Task(
+        description=series.description,
+        due_date=occurrence_date,
+        status=series.status,
+        priority=series.priority,
+        user_id=series.user_id,
+        series_id=series.id,
+        occurrence_date=occurrence_date,
+    )
+    db.add(occurrence)
+    skip_occurrence(series, occurrence_date)
+    await db.flush()
+    await notify_task_change_async(db, "created", occurrence)
+    await notify_task_change_async(db, "updated", series)
+    await commit_and_invalidate(db)
+    await db.refresh(occurrence)
+    return occurrence
+
+def skip_occurrence(series: Task, occurrence_date: datetime):
+    """Exclude an occurrence date from the expansion of a series."""
+    # Reassign so SQLAlchemy notices the change to the JSON column
+    series.recurrence_exceptions = sorted(
+        set(series.recurrence_exceptions or []) | {occurrence_date.isoformat()}
+    )
     
 def suggest_missing_fields(parsed_content: dict) -> dict:
     """Suggest fixes for missing fields."""
@@ -0,0 +1,246 @@
+import os
+import csv
+import json
+import time
+import uuid
+import logging
+from datetime import datetime
+from pydantic import ValidationError
+from sqlalchemy import Table, Column, MetaData, Integer, String, DateTime, UUID, JSON, insert, select, case, cast, literal
+from sqlalchemy.ext.asyncio import AsyncSession
+from database_tools.models import Task
+from database_tools.schemas import TaskCreate
+from app.change_feed import notify_bulk_change_async
+from utils.task_cache import record_bulk_change
+
+# Rows validated and copied to the staging table at a time
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "5000"))
+# Per-row errors listed in the response; the rest are only counted
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "1000"))
+
+IMPORT_FORMATS = ("ndjson", "csv")
+
+# Temporary table the rows are copied into before one INSERT ... SELECT
+staging = Table(
+    "task_import", MetaData(),
+    Column("line", Integer, nullable=False),
+    Column("id", UUID(as_uuid=True), nullable=False),
+    Column("description", String, nullable=False),
+    Column("due_date", DateTime),
+    Column("status", String(50), nullable=False),
+    Column("priority", Integer, nullable=False),
+    Column("recurrence", String(50)),
+    prefixes=["TEMPORARY"],
+)
+STAGING_COLUMNS = [column.name for column in staging.columns]
+
+
+class ImportReport:
+    """Counts and per-row errors for one import."""
+
+    def __init__(self):
+        self.received = 0
+        self.imported = 0
+        self.failed = 0
+        self.errors = []
+        self.fields = set()
+        self.start = time.perf_counter()
+
+    def error(self, line: int, message: str):
+        self.failed += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    def result(self) -> dict:
+        seconds = time.perf_counter() - self.start
+        return {
+            "rows_received": self.received,
+            "rows_imported": self.imported,
+            "rows_failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+            "seconds": round(seconds, 3),
+            "rows_per_second": round(self.imported / seconds, 1) if seconds else 0.0,
+        }
+
+
+async def iter_lines(chunks):
+    """
+    Split a stream of byte chunks into (line number, text line, valid UTF-8) triples.
+
+    Invalid bytes are replaced rather than raised, so one bad line is
+    reported as a row error instead of failing the whole import.
+    """
+    buffer = b""
+    number = 0
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            number += 1
+            yield (number, *decode_line(line, number))
+    if buffer:
+        yield (number + 1, *decode_line(buffer, number + 1))
+
+
+def decode_line(line: bytes, number: int) -> tuple:
+    encoding = "utf-8-sig" if number == 1 else "utf-8"
+    try:
+        return line.decode(encoding).rstrip("\r"), True
+    except UnicodeDecodeError:
+        return line.decode(encoding, errors="replace").rstrip("\r"), False
+
+
+async def iter_records(chunks, import_format: str):
+    """
+    Yield (line number, dict or error message) for each NDJSON or CSV record.
+
+    CSV files must start with a header row naming TaskCreate fields; quoted
+    fields may span lines.
+    """
+    header = None
+    pending, pending_line, pending_valid = None, None, True
+    async for number, line, valid in iter_lines(chunks):
+        if import_format == "ndjson":
+            if not line.strip():
+                continue
+            if not valid:
+                yield number, "Line is not valid UTF-8"
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield number, f"Invalid JSON: {e}"
+                continue
+            yield number, record if isinstance(record, dict) else "Expected a JSON object"
+            continue
+
+        # CSV: keep joining lines while a quoted field is open
+        if pending is not None:
+            pending += "\n" + line
+            pending_valid = pending_valid and valid
+        else:
+            pending, pending_line, pending_valid = line, number, valid
+        if pending.count('"') % 2:
+            continue
+        text, pending = pending, None
+        if not text.strip():
+            continue
+        if not pending_valid:
+            yield pending_line, "Record is not valid UTF-8"
+            continue
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        if len(values) != len(header):
+            yield pending_line, f"Expected {len(header)} columns, got {len(values)}"
+            continue
+        yield pending_line, {name: value for name, value in zip(header, values) if value != ""}
+    if pending is not None:
+        yield pending_line, "Unterminated quoted field"
+
+
+def staging_row(line: int, record: dict):
+    """Validate one record against TaskCreate; returns a staging row or an error message."""
+    try:
+        task = TaskCreate(**record)
+    except ValidationError as e:
+        return "; ".join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors())
+    if not task.description:
+        return "description is required"
+    due_date = task.due_date
+    if due_date is not None and due_date.tzinfo is not None:
+        # due_date is a naive local timestamp column
+        due_date = due_date.astimezone().replace(tzinfo=None)
+    return {
+        "line": line,
+        "id": uuid.uuid4(),
+        "description": task.description,
+        "due_date": due_date,
+        "status": task.status or "pending",
+        "priority": task.priority or 0,
+        "recurrence": task.recurrence,
+    }
+
+
+async def copy_rows(db: AsyncSession, rows: list):
+    """Load rows into the staging table with COPY (asyncpg), or an executemany elsewhere."""
+    connection = await db.connection()
+    if connection.dialect.driver == "asyncpg":
+        raw = await connection.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(
+            staging.name, records=[tuple(row[name] for name in STAGING_COLUMNS) for row in rows],
+            columns=STAGING_COLUMNS,
+        )
+    else:
+        await db.execute(insert(staging), rows)
+
+
+def insert_from_staging(now: datetime):
+    """
+    INSERT ... SELECT moving staged rows into tasks.
+
+    Recurring rows become series the same way generate_recurring_tasks makes
+    them: a missing due date becomes the series start (now) and the exception
+    list starts empty. Occurrences are expanded on read.
+    """
+    recurring = staging.c.recurrence != None
+    return insert(Task).from_select(
+        ["id", "description", "due_date", "status", "priority", "recurrence", "recurrence_exceptions"],
+        select(
+            staging.c.id,
+            staging.c.description,
+            case((recurring & (staging.c.due_date == None), literal(now, DateTime)), else_=staging.c.due_date),
+            staging.c.status,
+            staging.c.priority,
+            staging.c.recurrence,
+            case((recurring, cast(literal("[]"), JSON)), else_=None),
+        ).order_by(staging.c.line),
+    )
+
+
+async def import_tasks(db: AsyncSession, chunks, import_format: str) -> dict:
+    """
+    Import tasks from a streamed NDJSON or CSV body in one transaction.
+
+    Records are validated in chunks of IMPORT_CHUNK_SIZE and copied into a
+    temporary staging table as they arrive; one INSERT ... SELECT then moves
+    them into tasks. Invalid records are reported per line and skipped.
+
+    Args:
+        db (AsyncSession): Database session.
+        chunks: Async iterator over the request body's byte chunks.
+        import_format (str): "ndjson" or "csv".
+
+    Returns:
+        dict: Counts, per-line errors and rows per second.
+    """
+    report = ImportReport()
+    connection = await db.connection()
+    await connection.run_sync(staging.create)
+
+    batch = []
+    async for line, record in iter_records(chunks, import_format):
+        report.received += 1
+        row = staging_row(line, record) if isinstance(record, dict) else record
+        if isinstance(row, str):
+            report.error(line, row)
+            continue
+        batch.append(row)
+        report.fields.add((row["status"], row["priority"]))
+        if len(batch) >= IMPORT_CHUNK_SIZE:
+            await copy_rows(db, batch)
+            report.imported += len(batch)
+            batch = []
+    if batch:
+        await copy_rows(db, batch)
+        report.imported += len(batch)
+
+    if report.imported:
+        await db.execute(insert_from_staging(datetime.now().replace(second=0, microsecond=0)))
+        await notify_bulk_change_async(db, "created", report.imported)
+        record_bulk_change(db, report.fields)
+    await connection.run_sync(staging.drop)
+    logging.info(f"Imported {report.imported} tasks ({report.failed} rows rejected)")
+    return report.result()
@@ -0,0 +1,61 @@
+"""
+Measure cold-start time: importing the API and Celery modules in a fresh
+interpreter, and serving a first request that needs no external service.
+
+    python -m benchmarks.cold_start --runs 10
+"""
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+# Each snippet prints the seconds it measured
+SNIPPETS = {
+    "import app.main": (
+        "import time; start = time.perf_counter(); import app.main; "
+        "print(time.perf_counter() - start)"
+    ),
+    "import utils.background_tasks": (
+        "import time; start = time.perf_counter(); import utils.background_tasks; "
+        "print(time.perf_counter() - start)"
+    ),
+    "import + first request": (
+        "import time, asyncio; start = time.perf_counter()\n"
+        "import httpx\n"
+        "from app.main import app\n"
+        "async def first():\n"
+        "    transport = httpx.ASGITransport(app=app)\n"
+        "    async with httpx.AsyncClient(transport=transport, base_url='http://cold-start') as client:\n"
+        "        (await client.get('/stats/local-parser')).raise_for_status()\n"
+        "asyncio.run(first())\n"
+        "print(time.perf_counter() - start)"
+    ),
+}
+
+
+def measure(snippet: str, runs: int) -> dict:
+    """Run a snippet in `runs` fresh interpreters and summarize the timings."""
+    timings = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", snippet], capture_output=True, text=True, check=True,
+        ).stdout
+        timings.append(float(output.strip().splitlines()[-1]))
+    return {
+        "runs": runs,
+        "median_ms": round(statistics.median(timings) * 1000, 1),
+        "min_ms": round(min(timings) * 1000, 1),
+        "max_ms": round(max(timings) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+    print(json.dumps({name: measure(snippet, args.runs) for name, snippet in SNIPPETS.items()}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
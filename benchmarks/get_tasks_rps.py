@@ -0,0 +1,96 @@
+"""
+Compare GET /tasks throughput with the sync and async database sessions.
+
+Both variants run the same query in-process over ASGI, so the only
+difference is whether the database call blocks the event loop. The async
+endpoint is measured with the Redis task cache off, which is the like-for-like
+comparison, and then with it on.
+
+    python -m benchmarks.get_tasks_rps --requests 2000 --concurrency 50
+"""
+import time
+import asyncio
+import argparse
+import statistics
+import httpx
+from fastapi import FastAPI, Depends
+from sqlalchemy import insert, select, func
+from sqlalchemy.orm import Session
+from app.database import SessionLocal, get_db
+from app.main import app as async_app
+from database_tools.models import Task
+from utils import task_cache
+from utils.pagination import order_clauses
+
+sync_app = FastAPI()
+
+@sync_app.get("/tasks")
+async def get_tasks_sync(page_size: int = 10, db: Session = Depends(get_db)):
+    """The pre-async handler: a blocking query inside an async endpoint."""
+    query = db.query(Task).filter(Task.deleted_at == None).order_by(*order_clauses("due_date", "asc"))
+    return [
+        {"id": str(task.id), "description": task.description, "due_date": task.due_date}
+        for task in query.limit(page_size).all()
+    ]
+
+def seed_tasks(rows: int):
+    """Make sure the table has at least `rows` live tasks."""
+    with SessionLocal() as db:
+        existing = db.scalar(select(func.count()).select_from(Task).where(Task.deleted_at == None))
+        if existing < rows:
+            db.execute(insert(Task), [
+                {"description": f"benchmark task {i}", "status": "pending", "priority": i % 3}
+                for i in range(rows - existing)
+            ])
+            db.commit()
+
+async def run_load(app: FastAPI, requests: int, concurrency: int) -> dict:
+    """Send `requests` GET /tasks calls with `concurrency` in flight."""
+    latencies = []
+    errors = 0
+    remaining = iter(range(requests))
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        async def worker():
+            nonlocal errors
+            for _ in remaining:
+                start = time.perf_counter()
+                response = await client.get("/tasks", params={"page_size": 10})
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "requests_per_second": round(requests / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--seed-rows", type=int, default=1000)
+    args = parser.parse_args()
+
+    seed_tasks(args.seed_rows)
+    variants = (
+        ("sync session", sync_app, False),
+        ("async session", async_app, False),
+        ("async + cache", async_app, True),
+    )
+    for name, app, cached in variants:
+        task_cache.TASK_CACHE_ENABLED = cached
+        result = asyncio.run(run_load(app, args.requests, args.concurrency))
+        print(f"{name:<14} {result}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,389 @@
+"""
+Load test the API against local stand-ins for OpenAI, the database and Redis.
+
+The app runs in-process over ASGI. OpenAI calls go to a fake ChatCompletion
+server on localhost with configurable latency and error mix, the database is
+SQLite (default) or any async SQLAlchemy URL, and Redis is fakeredis unless
+--redis-url is given. Results are printed (or written) as JSON so runs can be
+compared.
+
+    python -m benchmarks.load_test --mix default --concurrency 20 --duration 30
+    python -m benchmarks.load_test --db-url postgresql+asyncpg://user:pw@localhost/bench --output run.json
+"""
+import os
+import json
+import time
+import random
+import asyncio
+import argparse
+import platform
+import subprocess
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+# Weights of each operation per scripted mix
+MIXES = {
+    "default": {
+        "create": 15, "list": 25, "list_filtered": 15, "deep_page": 5, "cursor_page": 10,
+        "get": 10, "update": 8, "delete": 2, "status": 10,
+    },
+    "read_heavy": {
+        "create": 2, "list": 35, "list_filtered": 20, "deep_page": 10, "cursor_page": 15,
+        "get": 10, "update": 3, "delete": 0, "status": 5,
+    },
+    "write_heavy": {
+        "create": 40, "list": 10, "list_filtered": 5, "deep_page": 0, "cursor_page": 5,
+        "get": 5, "update": 25, "delete": 5, "status": 5,
+    },
+}
+
+# Commands sent to POST /tasks. The vague ones are escalated to the (fake) LLM.
+COMMANDS = [
+    "Pay rent tomorrow at 9am",
+    "Submit the expense report next Friday",
+    "Call the dentist on Monday at 3pm",
+    "Water the plants every day",
+    "Team standup daily at 10am",
+    "Renew the car insurance in 2 weeks",
+    "something about the thing Bob mentioned",
+    "hmm, need to deal with the landlord maybe",
+    "follow up on that email whenever",
+    "prepare slides for the quarterly review",
+]
+PAGE_SIZE = 20
+
+
+def sqlite_compat(engine):
+    """Let SQLite run the Postgres-flavoured schema and queries."""
+    import uuid
+    from sqlalchemy import UUID, event
+    from sqlalchemy.ext.compiler import compiles
+    from sqlalchemy.sql import sqltypes
+
+    @compiles(UUID, "sqlite")
+    def _compile_uuid(type_, compiler, **kw):
+        return "CHAR(32)"
+
+    # Endpoints bind task ids as strings; SQLite stores UUIDs as hex
+    bind_processor = sqltypes.Uuid.bind_processor
+
+    def _bind_processor(self, dialect):
+        process = bind_processor(self, dialect)
+        if process is None:
+            return None
+        return lambda value: process(uuid.UUID(value) if isinstance(value, str) else value)
+
+    sqltypes.Uuid.bind_processor = _bind_processor
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _register_functions(dbapi_connection, connection_record):
+        dbapi_connection.create_function("pg_notify", 2, lambda channel, payload: None)
+
+
+def fake_completion(body: dict) -> dict:
+    """Build a ChatCompletion reply for the request (single or numbered batch, text or function call)."""
+    command = body["messages"][-1]["content"]
+    lines = [line.split(". ", 1)[1] for line in command.splitlines() if ". " in line[:6]]
+    function_call = body.get("function_call")
+    if function_call:
+        due_date = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%dT09:00")
+        item = lambda text: {"description": text[:60], "due_date": due_date}
+        if function_call["name"] == "create_tasks":
+            arguments = {"tasks": [item(line) for line in (lines if len(lines) > 1 else [command])]}
+        else:
+            arguments = item(command)
+        message = {"role": "assistant", "content": None, "function_call": {
+            "name": function_call["name"], "arguments": json.dumps(arguments, separators=(",", ":")),
+        }}
+        usage = {"prompt_tokens": 70, "completion_tokens": 20, "total_tokens": 90}
+    else:
+        item = lambda text: {
+            "description": text[:60], "due_date": "tomorrow", "background": False, "recurrence": "none",
+        }
+        content = json.dumps([item(line) for line in lines]) if len(lines) > 1 else json.dumps(item(command))
+        message = {"role": "assistant", "content": content}
+        usage = {"prompt_tokens": 80, "completion_tokens": 30, "total_tokens": 110}
+    return {
+        "id": "chatcmpl-benchmark",
+        "object": "chat.completion",
+        "choices": [{"index": 0, "message": message, "finish_reason": "stop"}],
+        "usage": usage,
+    }
+
+
+async def start_fake_openai(latency_ms: float, jitter_ms: float, error_rate: float, rate_limit_rate: float, rng):
+    """Serve /v1/chat/completions on a free localhost port."""
+    from aiohttp import web
+
+    async def chat_completions(request):
+        body = await request.json()
+        await asyncio.sleep(max(rng.gauss(latency_ms, jitter_ms), 0) / 1000)
+        roll = rng.random()
+        if roll < error_rate:
+            return web.json_response({"error": {"message": "fake server error", "type": "server_error"}}, status=500)
+        if roll < error_rate + rate_limit_rate:
+            return web.json_response({"error": {"message": "fake rate limit", "type": "rate_limit"}}, status=429)
+        return web.json_response(fake_completion(body))
+
+    server = web.Application()
+    server.router.add_post("/v1/chat/completions", chat_completions)
+    runner = web.AppRunner(server)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/v1"
+
+
+def load_app(args):
+    """Import the app with its external services pointed at the stand-ins."""
+    from vault.fetch_secrets import openai_key_provider
+    openai_key_provider.loader = lambda: ("sk-benchmark", 0)
+
+    import app.services as services
+    import app.parser_backends as parser_backends
+    import app.database as database
+    import utils.parse_cache as parse_cache
+    import utils.task_cache as task_cache
+    import utils.single_flight as single_flight
+    import utils.llm_limiter as llm_limiter
+    from app.main import app
+    from utils.background_tasks import celery_app
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    parser_backends.PARSER_BACKEND = args.parser_backend
+    if args.no_local_parser:
+        services.LOCAL_PARSE_THRESHOLD = float("inf")
+
+    pool_options = {} if args.db_url.startswith("sqlite") else {"pool_size": args.concurrency, "max_overflow": 0}
+    engine = create_async_engine(args.db_url, **pool_options)
+    if engine.dialect.name == "sqlite":
+        sqlite_compat(engine)
+    database.AsyncSessionLocal.configure(bind=engine)
+
+    task_cache.TASK_CACHE_ENABLED = not args.no_task_cache
+    if args.redis_url:
+        parse_cache.redis_url = args.redis_url
+        task_cache.redis_url = args.redis_url
+        single_flight.redis_url = args.redis_url
+        llm_limiter.redis_url = args.redis_url
+    else:
+        import fakeredis
+        parse_cache._redis_client = fakeredis.FakeRedis()
+        parse_cache._async_redis_client = fakeredis.aioredis.FakeRedis()
+        task_cache._redis_client = fakeredis.FakeRedis()
+        task_cache._async_redis_client = fakeredis.aioredis.FakeRedis()
+        single_flight._async_redis_client = fakeredis.aioredis.FakeRedis()
+        llm_limiter._async_redis_client = fakeredis.aioredis.FakeRedis()
+
+    # Status polls read Celery results; keep them in memory
+    celery_app.conf.update(broker_url="memory://", result_backend="cache+memory://")
+    return app, engine
+
+
+async def seed_tasks(engine, rows: int, rng):
+    """Create the schema and insert `rows` tasks so deep pages exist."""
+    import uuid
+    from sqlalchemy import insert
+    from database_tools.models import Base, Task
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        now = datetime.now()
+        await conn.execute(insert(Task), [
+            {
+                "id": uuid.uuid4(),
+                "description": f"seeded task {i}",
+                "due_date": now + timedelta(minutes=rng.randrange(60 * 24 * 60)),
+                "status": rng.choice(["pending", "pending", "in progress", "completed"]),
+                "priority": rng.randrange(4),
+            }
+            for i in range(rows)
+        ])
+
+
+class LoadState:
+    """Task ids and cursors shared between the simulated clients."""
+
+    def __init__(self, seed_rows: int, rng):
+        self.rng = rng
+        self.task_ids = []
+        self.cursors = []
+        self.deep_page = max(seed_rows // PAGE_SIZE - 2, 1)
+
+    def some_task(self):
+        return self.rng.choice(self.task_ids) if self.task_ids else None
+
+
+async def run_operation(client, op: str, state: LoadState):
+    """Run one scripted operation; returns the HTTP response (or None if skipped)."""
+    rng = state.rng
+    if op == "create":
+        command = rng.choice(COMMANDS)
+        response = await client.post("/tasks", params={"command": command})
+        if response.status_code == 200 and "id" in response.json():
+            state.task_ids.append(response.json()["id"])
+        return response
+    if op == "list":
+        response = await client.get("/tasks", params={"page_size": PAGE_SIZE})
+        if response.status_code == 200:
+            state.task_ids.extend(task["id"] for task in response.json()[:5])
+            del state.task_ids[:-1000]
+        return response
+    if op == "list_filtered":
+        return await client.get("/tasks", params={
+            "status": rng.choice(["pending", "completed"]), "priority": rng.randrange(4),
+            "sort_by": rng.choice(["due_date", "priority"]), "page_size": PAGE_SIZE,
+        })
+    if op == "deep_page":
+        return await client.get("/tasks", params={"page": state.deep_page, "page_size": PAGE_SIZE})
+    if op == "cursor_page":
+        params = {"pagination": "cursor", "page_size": PAGE_SIZE}
+        if state.cursors:
+            params["after"] = state.cursors.pop(rng.randrange(len(state.cursors)))
+        response = await client.get("/tasks", params=params)
+        if response.status_code == 200 and response.json().get("next_cursor"):
+            state.cursors.append(response.json()["next_cursor"])
+        return response
+
+    task_id = state.some_task()
+    if task_id is None:
+        return None
+    if op == "get":
+        return await client.get(f"/tasks/{task_id}")
+    if op == "update":
+        return await client.put(f"/tasks/{task_id}", json={
+            "status": rng.choice(["pending", "in progress", "completed"]), "priority": rng.randrange(4),
+        })
+    if op == "delete":
+        state.task_ids.remove(task_id)
+        return await client.delete(f"/tasks/{task_id}")
+    if op == "status":
+        return await client.get(f"/tasks/{task_id}/status")
+    raise ValueError(f"Unknown operation: {op}")
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    if not sorted_values:
+        return None
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return round(sorted_values[index] * 1000, 2)
+
+
+def summarize(latencies: list, errors: int, elapsed: float) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "p50_ms": percentile(latencies, 0.50),
+        "p95_ms": percentile(latencies, 0.95),
+        "p99_ms": percentile(latencies, 0.99),
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return None
+
+
+async def run(args) -> dict:
+    import httpx
+    import openai
+
+    rng = random.Random(args.seed)
+    runner, api_base = await start_fake_openai(
+        args.llm_latency_ms, args.llm_jitter_ms, args.llm_error_rate, args.llm_rate_limit_rate, rng,
+    )
+    openai.api_base = api_base
+    app, engine = load_app(args)
+    await seed_tasks(engine, args.seed_tasks, rng)
+
+    mix = MIXES[args.mix]
+    ops, weights = zip(*((op, weight) for op, weight in mix.items() if weight))
+    state = LoadState(args.seed_tasks, rng)
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    deadline = time.perf_counter() + args.duration
+
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://benchmark", timeout=60,
+    ) as client:
+        # Warm up the list so id-based operations have targets
+        await run_operation(client, "list", state)
+
+        async def worker():
+            while time.perf_counter() < deadline:
+                op = rng.choices(ops, weights)[0]
+                start = time.perf_counter()
+                try:
+                    response = await run_operation(client, op, state)
+                except Exception:
+                    response = False
+                if response is None:
+                    continue
+                latencies[op].append(time.perf_counter() - start)
+                if response is False or response.status_code >= 400:
+                    errors[op] += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - start
+
+    await runner.cleanup()
+    await engine.dispose()
+    from app.llm_client import close_http_session
+    await close_http_session()
+
+    all_latencies = [value for values in latencies.values() for value in values]
+    return {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "config": {
+            key: value for key, value in vars(args).items() if key not in ("output",)
+        },
+        "elapsed_seconds": round(elapsed, 2),
+        "overall": summarize(all_latencies, sum(errors.values()), elapsed),
+        "operations": {op: summarize(latencies[op], errors[op], elapsed) for op in sorted(latencies)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--mix", choices=sorted(MIXES), default="default")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of load")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for a reproducible run")
+    parser.add_argument("--seed-tasks", type=int, default=2000, help="Tasks inserted before the run")
+    parser.add_argument("--db-url", default="sqlite+aiosqlite:///benchmark.db",
+                        help="Async SQLAlchemy URL (SQLite file is recreated each run)")
+    parser.add_argument("--redis-url", default=None, help="Use a real Redis instead of fakeredis")
+    parser.add_argument("--llm-latency-ms", type=float, default=400)
+    parser.add_argument("--llm-jitter-ms", type=float, default=100)
+    parser.add_argument("--llm-error-rate", type=float, default=0.01)
+    parser.add_argument("--llm-rate-limit-rate", type=float, default=0.01)
+    parser.add_argument("--no-task-cache", action="store_true", help="Disable the task read cache")
+    parser.add_argument("--no-local-parser", action="store_true", help="Send every command to the fake LLM")
+    parser.add_argument("--parser-backend", choices=["openai", "local", "replay"], default="openai",
+                        help="replay reads PARSER_REPLAY_DIR / PARSER_REPLAY_MODE")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    if args.db_url.startswith("sqlite") and ":///" in args.db_url:
+        path = args.db_url.split(":///", 1)[1]
+        if path and os.path.exists(path):
+            os.remove(path)
+
+    report = json.dumps(asyncio.run(run(args)), indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
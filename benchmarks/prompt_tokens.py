@@ -0,0 +1,203 @@
+"""
+Compare the schema (function-calling) prompt with the legacy prose prompt:
+tokens, latency and parse failures per command.
+
+Without --live only prompt sizes are compared, counted with tiktoken when it
+is installed and estimated at ~4 characters per token otherwise. With --live
+every command is sent to OpenAI (OPENAI_MODEL; key from Vault or
+OPENAI_API_KEY) with each prompt, and the usage OpenAI reports is summarized.
+--fake sends them to the load test's stand-in server instead, which checks
+the harness but reports made-up token counts.
+
+    python -m benchmarks.prompt_tokens
+    python -m benchmarks.prompt_tokens --live --repeat 3 --output prompts.json
+"""
+import os
+import json
+import time
+import asyncio
+import argparse
+import statistics
+from collections import Counter
+from benchmarks.load_test import COMMANDS, percentile, git_revision
+
+PROMPTS = ("legacy", "schema")
+
+# More commands that need the LLM, with dates in several shapes
+EXTRA_COMMANDS = [
+    "remind me to send the invoice to ACME by the end of next week, it's important",
+    "book a table for four at the Italian place on the 14th at 7:30pm",
+    "every month pay the electricity bill",
+    "sometime after lunch tomorrow look over Priya's pull request",
+    "renew passport before the trip in March",
+]
+
+
+def count_tokens(text: str, model: str) -> tuple:
+    """Token count of a text, and whether it is exact (tiktoken) or estimated."""
+    try:
+        import tiktoken
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding("cl100k_base")
+    except Exception:  # not installed, or its encodings cannot be downloaded
+        return max(1, len(text) // 4), False
+    return len(encoding.encode(text)), True
+
+
+def schema_type(schema: dict) -> str:
+    if "enum" in schema:
+        return " | ".join(json.dumps(value) for value in schema["enum"])
+    if schema.get("type") == "array":
+        return f"{schema_type(schema['items'])}[]"
+    if schema.get("type") == "object":
+        required = schema.get("required", [])
+        fields = []
+        for name, field in schema["properties"].items():
+            comment = f" // {field['description']}" if "description" in field else ""
+            fields.append(f"{name}{'' if name in required else '?'}: {schema_type(field)},{comment}")
+        return "{\n" + "\n".join(fields) + "\n}"
+    return {"integer": "number"}.get(schema.get("type"), schema.get("type"))
+
+
+def request_text(request: dict) -> str:
+    """
+    Everything in a request that counts as prompt tokens.
+
+    Functions are rendered the way OpenAI presents them to the model (a
+    TypeScript namespace), which is much terser than their JSON.
+    """
+    parts = [message["content"] for message in request["messages"]]
+    for function in request.get("functions", []):
+        parts.append(
+            f"namespace functions {{\ntype {function['name']} = (_: {schema_type(function['parameters'])}) => any;\n}}"
+        )
+    return "\n".join(parts)
+
+
+def compare_prompt_sizes(commands: list, model: str) -> dict:
+    from app import services
+
+    results = {}
+    for prompt in PROMPTS:
+        services.PARSER_PROMPT = prompt
+        counts = []
+        exact = True
+        for command in commands:
+            tokens, exact = count_tokens(request_text(services.build_request(command)), model)
+            counts.append(tokens)
+        results[prompt] = {
+            "prompt_tokens_mean": round(statistics.mean(counts), 1),
+            "max_tokens": services.build_request(commands[0])["max_tokens"],
+            "counted_with": "tiktoken" if exact else "estimate (~4 chars/token)",
+        }
+    return results
+
+
+def classify(response) -> str:
+    """How a completion fared: ok, truncated, invalid_json or invalid."""
+    from app import services
+
+    if response["choices"][0].get("finish_reason") == "length":
+        return "truncated"
+    try:
+        content = services.extract_gpt_content(response)
+    except (json.JSONDecodeError, TypeError, KeyError):
+        return "invalid_json"
+    if not isinstance(content, dict) or "error" in services.build_task_data(content):
+        return "invalid"
+    return "ok"
+
+
+async def run_live(commands: list, repeat: int, model: str, api_key: str) -> dict:
+    from app import services
+    from app.llm_client import acreate_chat_completion
+
+    results = {}
+    for prompt in PROMPTS:
+        services.PARSER_PROMPT = prompt
+        latencies, prompt_tokens, completion_tokens = [], [], []
+        outcomes = Counter()
+        for command in commands * repeat:
+            start = time.perf_counter()
+            try:
+                response = await acreate_chat_completion(
+                    model=model, api_key=api_key, **services.build_request(command),
+                )
+            except Exception:
+                outcomes["error"] += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+            usage = response.get("usage") or {}
+            prompt_tokens.append(usage.get("prompt_tokens", 0))
+            completion_tokens.append(usage.get("completion_tokens", 0))
+            outcomes[classify(response)] += 1
+
+        calls = sum(outcomes.values())
+        latencies.sort()
+        results[prompt] = {
+            "calls": calls,
+            "prompt_tokens_mean": round(statistics.mean(prompt_tokens), 1) if prompt_tokens else None,
+            "completion_tokens_mean": round(statistics.mean(completion_tokens), 1) if completion_tokens else None,
+            "p50_ms": percentile(latencies, 0.50),
+            "p95_ms": percentile(latencies, 0.95),
+            "failure_rate": round(1 - outcomes["ok"] / calls, 3) if calls else None,
+            "outcomes": dict(outcomes),
+        }
+    return results
+
+
+async def run(args) -> dict:
+    import openai
+    from app.llm_client import close_http_session
+
+    commands = COMMANDS + EXTRA_COMMANDS
+    report = {
+        "revision": git_revision(),
+        "model": args.model,
+        "commands": len(commands),
+        "prompt_size": compare_prompt_sizes(commands, args.model),
+    }
+    if not (args.live or args.fake):
+        return report
+
+    runner = None
+    if args.fake:
+        import random
+        from benchmarks.load_test import start_fake_openai
+
+        runner, openai.api_base = await start_fake_openai(5, 1, 0, 0, random.Random(0))
+        api_key = "benchmark"
+    else:
+        from vault.fetch_secrets import fetch_openai_key
+
+        api_key = fetch_openai_key()
+    try:
+        report["live"] = await run_live(commands, args.repeat, args.model, api_key)
+        report["live"]["server"] = "fake" if args.fake else "openai"
+    finally:
+        await close_http_session()
+        if runner is not None:
+            await runner.cleanup()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--live", action="store_true", help="Send the commands to OpenAI")
+    parser.add_argument("--fake", action="store_true", help="Send the commands to a local stand-in server")
+    parser.add_argument("--repeat", type=int, default=1, help="Times each command is sent per prompt")
+    parser.add_argument("--model", default=os.getenv("OPENAI_MODEL", "gpt-3.5-turbo"))
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = json.dumps(asyncio.run(run(args)), indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(report)
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Deliver emails through the background SMTP workers to a local aiosmtpd server
+and check that every one arrives.
+
+The server runs in-process on 127.0.0.1. With --auth it advertises and
+requires AUTH PLAIN/LOGIN; with --password the workers log in. Credentials
+without --auth exercise the refusal to send unauthenticated, so nothing may
+arrive. Exits non-zero when the outcome is not the expected one.
+
+    python -m benchmarks.smtp_delivery --messages 500
+    python -m benchmarks.smtp_delivery --auth --password secret
+    python -m benchmarks.smtp_delivery --password secret   # expects 0 delivered
+"""
+import sys
+import json
+import time
+import argparse
+
+
+class CountingHandler:
+    """aiosmtpd handler that only counts the messages it accepts."""
+
+    def __init__(self):
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return "250 OK"
+
+
+def start_server(port: int, username: str, password: str, auth: bool):
+    from aiosmtpd.controller import Controller
+    from aiosmtpd.smtp import AuthResult
+
+    def authenticator(server, session, envelope, mechanism, auth_data):
+        ok = auth_data.login.decode() == username and auth_data.password.decode() == password
+        return AuthResult(success=ok)
+
+    handler = CountingHandler()
+    options = {"authenticator": authenticator, "auth_require_tls": False, "auth_required": True} if auth else {}
+    controller = Controller(handler, hostname="127.0.0.1", port=port, **options)
+    controller.start()
+    return controller, handler
+
+
+def run(args) -> dict:
+    from utils import smtp_service
+
+    controller, handler = start_server(args.port, args.username, args.password, args.auth)
+    smtp_service._smtp_config = {
+        "server": "127.0.0.1",
+        "port": args.port,
+        "username": args.username,
+        "password": args.password,
+        "use_tls": False,
+    }
+    smtp_service.SMTP_POOL_SIZE = args.pool_size
+    smtp_service.SMTP_MAX_ATTEMPTS = 1
+    try:
+        start = time.perf_counter()
+        for i in range(args.messages):
+            smtp_service.enqueue_email("someone@example.com", f"Delivery check {i}", "Sent by benchmarks.smtp_delivery")
+        smtp_service.stop_email_workers()
+        elapsed = time.perf_counter() - start
+    finally:
+        controller.stop()
+
+    expected = 0 if args.password and not args.auth else args.messages
+    return {
+        "messages": args.messages,
+        "received": handler.received,
+        "expected": expected,
+        "ok": handler.received == expected,
+        "seconds": round(elapsed, 3),
+        "messages_per_second": round(handler.received / elapsed, 1) if elapsed else None,
+        "stats": smtp_service.email_queue_stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--messages", type=int, default=100)
+    parser.add_argument("--pool-size", type=int, default=2, help="Delivery workers (SMTP_POOL_SIZE)")
+    parser.add_argument("--port", type=int, default=8025)
+    parser.add_argument("--auth", action="store_true", help="Make the server advertise and require AUTH")
+    parser.add_argument("--username", default="tasks@example.com")
+    parser.add_argument("--password", help="Log in with this password (as smtp_config.xml would)")
+    args = parser.parse_args()
+
+    report = run(args)
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if report["ok"] else 1)
+
+
+if __name__ == "__main__":
+    main()
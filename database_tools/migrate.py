@@ -0,0 +1,314 @@
+import sys
+import json
+import uuid
+import psycopg2
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+from database_tools.db_config import read_db_config
+from database_tools.models import Task
+
+# Each migration is (version, description, statements, transactional).
+# Non-transactional migrations run statement by statement in autocommit mode,
+# which CREATE INDEX CONCURRENTLY requires. Never edit an applied migration;
+# append a new one instead.
+MIGRATIONS = [
+    (1, "Create users and tasks tables", [
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+            email VARCHAR NOT NULL UNIQUE
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS tasks (
+            id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+            description TEXT NOT NULL,
+            due_date TIMESTAMP,
+            status VARCHAR(50) DEFAULT 'pending',
+            priority INT DEFAULT 0,
+            recurrence VARCHAR(50),
+            celery_task_id VARCHAR(255)
+        )
+        """,
+    ], True),
+    (2, "Add columns the Task model declares to tables created by older setups", [
+        "ALTER TABLE tasks ADD COLUMN IF NOT EXISTS deleted_at TIMESTAMP NULL",
+        "ALTER TABLE tasks ADD COLUMN IF NOT EXISTS archived_at TIMESTAMP NULL",
+        "ALTER TABLE tasks ADD COLUMN IF NOT EXISTS user_id UUID NULL REFERENCES users(id)",
+        "ALTER TABLE tasks ADD COLUMN IF NOT EXISTS recurrence_exceptions JSON NULL",
+        "ALTER TABLE tasks ADD COLUMN IF NOT EXISTS series_id UUID NULL REFERENCES tasks(id)",
+        "ALTER TABLE tasks ADD COLUMN IF NOT EXISTS occurrence_date TIMESTAMP NULL",
+    ], True),
+    (3, "Store tasks.due_date as TIMESTAMP instead of DATE", [
+        """
+        DO $$
+        BEGIN
+            IF EXISTS (
+                SELECT 1 FROM information_schema.columns
+                WHERE table_name = 'tasks' AND column_name = 'due_date' AND data_type = 'date'
+            ) THEN
+                ALTER TABLE tasks ALTER COLUMN due_date TYPE TIMESTAMP USING due_date::timestamp;
+            END IF;
+        END $$
+        """,
+    ], True),
+    (4, "Partial indexes for the live-task queries", [
+        # GET /tasks default sort and keyset pagination
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_tasks_live_due_id "
+        "ON tasks (due_date, id) WHERE deleted_at IS NULL",
+        # status filter and the reminder scheduler
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_tasks_live_status_due "
+        "ON tasks (status, due_date) WHERE deleted_at IS NULL",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_tasks_live_priority_due "
+        "ON tasks (priority, due_date) WHERE deleted_at IS NULL",
+        # recurrence series expansion
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_tasks_live_series_due "
+        "ON tasks (due_date) WHERE deleted_at IS NULL AND recurrence IS NOT NULL",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_tasks_series_occurrence "
+        "ON tasks (series_id, occurrence_date) WHERE series_id IS NOT NULL",
+    ], False),
+    (5, "Track tasks.updated_at for incremental readers", [
+        "ALTER TABLE tasks ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP NOT NULL DEFAULT now()",
+        """
+        CREATE OR REPLACE FUNCTION tasks_set_updated_at() RETURNS trigger AS $$
+        BEGIN
+            NEW.updated_at = now();
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+        """,
+        "DROP TRIGGER IF EXISTS tasks_updated_at ON tasks",
+        "CREATE TRIGGER tasks_updated_at BEFORE INSERT OR UPDATE ON tasks "
+        "FOR EACH ROW EXECUTE FUNCTION tasks_set_updated_at()",
+    ], True),
+    (6, "Index tasks.updated_at for the reminder index refresh", [
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_tasks_updated_at ON tasks (updated_at)",
+    ], False),
+    (7, "Per-user quiet hours for reminder digests", [
+        "ALTER TABLE users ADD COLUMN IF NOT EXISTS quiet_hours_start TIME NULL",
+        "ALTER TABLE users ADD COLUMN IF NOT EXISTS quiet_hours_end TIME NULL",
+    ], True),
+    (8, "Full-text search vector on tasks.description", [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        # Rewrites the table once; the 'english' config must match utils/task_search.py
+        "ALTER TABLE tasks ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        "GENERATED ALWAYS AS (to_tsvector('english', coalesce(description, ''))) STORED",
+    ], True),
+    (9, "GIN indexes for GET /tasks/search", [
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_tasks_live_search_vector "
+        "ON tasks USING GIN (search_vector) WHERE deleted_at IS NULL",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_tasks_live_description_trgm "
+        "ON tasks USING GIN (description gin_trgm_ops) WHERE deleted_at IS NULL",
+    ], False),
+    (10, "Stamp tasks.updated_at with the statement's clock time", [
+        # now() is the transaction start, so a long transaction stamped rows
+        # older than the reminder watermark it committed after
+        """
+        CREATE OR REPLACE FUNCTION tasks_set_updated_at() RETURNS trigger AS $$
+        BEGIN
+            NEW.updated_at = clock_timestamp();
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+        """,
+    ], True),
+]
+
+
+def get_connection():
+    """Open a psycopg2 connection using config/db_config.xml."""
+    db_config = read_db_config()
+    return psycopg2.connect(
+        dbname=db_config["DB_NAME"],
+        user=db_config["DB_USER"],
+        password=db_config["DB_PASSWORD"],
+        host=db_config["DB_URL"],
+        port=db_config["DB_PORT"],
+    )
+
+
+def get_engine():
+    """Build a SQLAlchemy engine for the configured database."""
+    db_config = read_db_config()
+    return create_engine(
+        f"postgresql://{db_config['DB_USER']}:{db_config['DB_PASSWORD']}"
+        f"@{db_config['DB_URL']}:{db_config['DB_PORT']}/{db_config['DB_NAME']}"
+    )
+
+
+def applied_versions(conn) -> set:
+    """Create the bookkeeping table if needed and return applied versions."""
+    with conn.cursor() as cur:
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT now()
+        )
+        """)
+        cur.execute("SELECT version FROM schema_migrations")
+        versions = {row[0] for row in cur.fetchall()}
+    conn.commit()
+    return versions
+
+
+def drop_invalid_indexes(cur, statements: list):
+    """Drop indexes left INVALID by an interrupted CREATE INDEX CONCURRENTLY."""
+    for statement in statements:
+        words = statement.split()
+        if "CONCURRENTLY" not in words or "EXISTS" not in words:
+            continue
+        index_name = words[words.index("EXISTS") + 1]
+        cur.execute(
+            "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = %s AND NOT i.indisvalid",
+            [index_name],
+        )
+        if cur.fetchone():
+            print(f"Dropping invalid index {index_name} left by an earlier run.")
+            cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}")
+
+
+def run_migrations(target: int = None):
+    """Apply all pending migrations up to target (default: latest)."""
+    conn = get_connection()
+    try:
+        done = applied_versions(conn)
+        for version, description, statements, transactional in MIGRATIONS:
+            if version in done or (target is not None and version > target):
+                continue
+            print(f"Applying migration {version}: {description}")
+            if transactional:
+                with conn.cursor() as cur:
+                    for statement in statements:
+                        cur.execute(statement)
+                    cur.execute(
+                        "INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+                        [version, description],
+                    )
+                conn.commit()
+            else:
+                conn.autocommit = True
+                try:
+                    with conn.cursor() as cur:
+                        drop_invalid_indexes(cur, statements)
+                        for statement in statements:
+                            cur.execute(statement)
+                        cur.execute(
+                            "INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+                            [version, description],
+                        )
+                finally:
+                    conn.autocommit = False
+        print("Database schema is up to date.")
+    finally:
+        conn.close()
+
+
+def show_status():
+    """Print applied and pending migrations."""
+    conn = get_connection()
+    try:
+        done = applied_versions(conn)
+    finally:
+        conn.close()
+    for version, description, _, _ in MIGRATIONS:
+        state = "applied" if version in done else "pending"
+        print(f"{version:>4}  {state:<8} {description}")
+
+
+def hot_path_queries(db: Session) -> dict:
+    """
+    The queries app/main.py and utils/scheduler.py run on every request or tick.
+
+    Keep in sync with those modules when their filters change.
+    """
+    from utils.pagination import order_clauses, seek_clause
+    from utils.task_search import search_clause
+
+    now = datetime.now()
+    live = db.query(Task).filter(Task.deleted_at == None)
+    return {
+        "get_tasks (default sort)": live.order_by(*order_clauses("due_date", "asc")).limit(10),
+        "get_tasks (status filter)": live.filter(Task.status == "pending")
+            .order_by(*order_clauses("due_date", "asc")).limit(10),
+        "get_tasks (priority filter)": live.filter(Task.priority == 1)
+            .order_by(*order_clauses("due_date", "asc")).limit(10),
+        "get_tasks (date window)": live.filter(
+            Task.recurrence == None, Task.due_date >= now, Task.due_date <= now + timedelta(days=7),
+        ).order_by(*order_clauses("due_date", "asc")).limit(10),
+        "get_tasks (cursor)": live.filter(seek_clause("due_date", "asc", now, uuid.uuid4()))
+            .order_by(*order_clauses("due_date", "asc")).limit(11),
+        "get_task (by id)": db.query(Task).filter(Task.id == uuid.uuid4()),
+        "search_tasks": live.filter(search_clause("groceries")),
+        "expand_recurring_tasks": live.filter(
+            Task.recurrence != None, Task.due_date <= now + timedelta(days=31),
+        ),
+        "materialize_occurrence": db.query(Task).filter(
+            Task.series_id == uuid.uuid4(), Task.occurrence_date == now,
+        ),
+        "schedule_reminders (changes)": db.query(Task).filter(Task.updated_at > now),
+        "schedule_reminders (horizon)": live.filter(
+            Task.status == "pending", Task.recurrence == None,
+            Task.due_date > now, Task.due_date <= now + timedelta(days=1),
+        ),
+        "schedule_reminders (series)": live.filter(
+            Task.status == "pending", Task.recurrence != None, Task.due_date <= now + timedelta(days=1),
+        ),
+    }
+
+
+def plan_node_types(plan: dict):
+    """Yield (node type, relation) for every node of an EXPLAIN JSON plan."""
+    yield plan.get("Node Type"), plan.get("Relation Name")
+    for child in plan.get("Plans", []):
+        yield from plan_node_types(child)
+
+
+def check_query_plans() -> bool:
+    """
+    EXPLAIN the hot-path queries and report any sequential scan on tasks.
+
+    Sequential scans are disabled for the session, so the planner only picks
+    one when no index can serve the query at all.
+    """
+    engine = get_engine()
+    ok = True
+    with Session(engine) as db:
+        db.execute(text("SET enable_seqscan = off"))
+        for name, query in hot_path_queries(db).items():
+            # Compiled without pyformat escaping: text() below doubles any % itself
+            statement = query.statement.compile(
+                dialect=postgresql.dialect(paramstyle="named"), compile_kwargs={"literal_binds": True},
+            )
+            plan = db.execute(text(f"EXPLAIN (FORMAT JSON) {statement}")).scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            nodes = list(plan_node_types(plan[0]["Plan"]))
+            seq_scans = [relation for node, relation in nodes if node == "Seq Scan"]
+            status = "SEQ SCAN on " + ", ".join(seq_scans) if seq_scans else "ok"
+            print(f"{name:<32} {status}")
+            ok = ok and not seq_scans
+    return ok
+
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else "upgrade"
+    if command == "upgrade":
+        target = int(sys.argv[2]) if len(sys.argv) > 2 else None
+        run_migrations(target)
+    elif command == "status":
+        show_status()
+    elif command == "check":
+        if not check_query_plans():
+            print("Some hot-path queries fall back to a sequential scan.")
+            sys.exit(1)
+    else:
+        print("Usage: python -m database_tools.migrate [upgrade [VERSION] | status | check]")
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
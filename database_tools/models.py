@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, UUID, Integer, ForeignKey
+from sqlalchemy import Column, String, DateTime, Time, UUID, Integer, ForeignKey, JSON, func
 from sqlalchemy.ext.declarative import declarative_base
 import uuid
 
@@ -8,6 +8,9 @@ class User(Base):
     __tablename__ = "users"
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
     email = Column(String, unique=True, nullable=False)
+    # Reminder digests are held while the server's local time is in this range
+    quiet_hours_start = Column(Time, nullable=True)
+    quiet_hours_end = Column(Time, nullable=True)
 
 class Task(Base):
     __tablename__ = "tasks"
@@ -17,4 +20,15 @@ class Task(Base):
     status = Column(String(50), default="pending")
     priority = Column(Integer, default=0)
     recurrence = Column(String(50), nullable=True)
-    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)  
+    celery_task_id = Column(String(255), nullable=True)
+    deleted_at = Column(DateTime, nullable=True)
+    archived_at = Column(DateTime, nullable=True)
+    # Nullable until task creation is tied to an authenticated user
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=True)
+    # Recurrence series: occurrence dates that are skipped or stored as their own rows
+    recurrence_exceptions = Column(JSON, nullable=True)
+    # Set on occurrences of a series that were edited or completed
+    series_id = Column(UUID(as_uuid=True), ForeignKey("tasks.id"), nullable=True)
+    occurrence_date = Column(DateTime, nullable=True)
+    # Maintained by a database trigger; the reminder index reads changes since a watermark
+    updated_at = Column(DateTime, nullable=False, server_default=func.now())
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional, Literal
+from typing import Optional, Literal, List
 from uuid import UUID  
 
 class TaskResponse(BaseModel):
@@ -11,10 +11,24 @@ class TaskResponse(BaseModel):
     priority: int
     recurrence: Optional[str] = None
     celery_task_id: Optional[str] = None
+    series_id: Optional[UUID] = None
+    occurrence_date: Optional[datetime] = None
 
     class Config:
         from_attributes = True
 
+class TaskPage(BaseModel):
+    items: List[TaskResponse]
+    next_cursor: Optional[str] = None
+    total_estimate: Optional[int] = None
+
+class TaskSearchResult(TaskResponse):
+    rank: float
+
+class TaskSearchPage(BaseModel):
+    items: List[TaskSearchResult]
+    next_cursor: Optional[str] = None
+
 class TaskCreate(BaseModel):
     description: Optional[str] = None
     due_date: Optional[datetime] = None
@@ -34,3 +48,26 @@ class TaskCreate(BaseModel):
                 "recurrence": "weekly",
             }
         }
+
+class TaskBatchCreate(BaseModel):
+    commands: List[str] = Field(..., min_length=1, max_length=500, description="Commands to turn into tasks")
+
+class TaskBatchResult(BaseModel):
+    index: int
+    command: str
+    task: Optional[TaskResponse] = None
+    error: Optional[str] = None
+    low_confidence: bool = False  # parsed locally because the LLM was unavailable
+
+class TaskImportError(BaseModel):
+    line: int
+    error: str
+
+class TaskImportResult(BaseModel):
+    rows_received: int
+    rows_imported: int
+    rows_failed: int
+    errors: List[TaskImportError]
+    errors_truncated: bool
+    seconds: float
+    rows_per_second: float
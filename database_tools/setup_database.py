@@ -1,6 +1,7 @@
 import psycopg2
 from psycopg2 import sql
 import getpass
+from database_tools.migrate import run_migrations
 
 DB_HOST = "localhost"
 DB_PORT = 5432
@@ -50,55 +51,8 @@ def initialize_database():
         cur.close()
         conn.close()
 
-        # Connect to the new database to create/update tables
-        conn = psycopg2.connect(
-            dbname=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            host=DB_HOST,
-            port=DB_PORT
-        )
-        cur = conn.cursor()
-
-        # Create or update the tasks table
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS tasks (
-            id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
-            description TEXT NOT NULL,
-            due_date DATE,
-            status VARCHAR(50) DEFAULT 'pending',
-            priority INT DEFAULT 0,
-            recurrence VARCHAR(50),
-            celery_task_id VARCHAR(255)
-        );
-        """)
-
-        # Check and add missing columns
-        columns_to_add = [
-            ("deleted_at", "TIMESTAMP NULL"),
-            ("archived_at", "TIMESTAMP NULL")
-        ]
-
-        for column, datatype in columns_to_add:
-            cur.execute(f"""
-            DO $$
-            BEGIN
-                IF NOT EXISTS (
-                    SELECT 1 FROM information_schema.columns 
-                    WHERE table_name='tasks' AND column_name='{column}'
-                ) THEN
-                    ALTER TABLE tasks ADD COLUMN {column} {datatype};
-                    RAISE NOTICE 'Added missing column: {column}';
-                END IF;
-            END $$;
-            """)
-
-        conn.commit()
-        print("Table 'tasks' created/updated successfully.")
-
-        # Close connection
-        cur.close()
-        conn.close()
+        # Create/update tables through the versioned migrations
+        run_migrations()
 
     except Exception as e:
         print(f"Error initializing database: {e}")
@@ -210,7 +210,7 @@ def run_database_setup():
 
     try:
         subprocess.run(
-            [sys.executable, database_setup_script],
+            [sys.executable, "-m", "database_tools.setup_database"],
             check=True
         )
         print("Database setup completed successfully.")
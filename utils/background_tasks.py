@@ -2,9 +2,14 @@ import os
 import time
 from celery import Celery
 from celery.result import AsyncResult
+from celery.signals import before_task_publish, after_task_publish, task_prerun, task_postrun, worker_init, setup_logging
 from sqlalchemy.orm import Session
 from app.database import SessionLocal
+from app.change_feed import notify_task_change
 from database_tools.models import Task
+from utils.log_config import configure_logging
+from utils.task_cache import commit_and_invalidate_sync
+from utils.metrics import CELERY_ENQUEUE_SECONDS, CELERY_TASK_SECONDS, query_label, start_metrics_server
 
 redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 
@@ -14,6 +19,42 @@ celery_app = Celery(
     backend=redis_url
 )
 
+# Start times keyed by Celery task id, for the timing signals below
+_publish_started = {}
+_run_started = {}
+
+@before_task_publish.connect
+def _before_publish(sender=None, headers=None, **kwargs):
+    _publish_started[headers["id"]] = time.perf_counter()
+
+@after_task_publish.connect
+def _after_publish(sender=None, headers=None, **kwargs):
+    start = _publish_started.pop(headers["id"], None)
+    if start is not None:
+        CELERY_ENQUEUE_SECONDS.labels(sender).observe(time.perf_counter() - start)
+
+@task_prerun.connect
+def _before_run(task_id=None, task=None, **kwargs):
+    query_label.set(task.name)
+    _run_started[task_id] = time.perf_counter()
+
+@task_postrun.connect
+def _after_run(task_id=None, task=None, state=None, **kwargs):
+    start = _run_started.pop(task_id, None)
+    if start is not None:
+        CELERY_TASK_SECONDS.labels(task.name, state or "UNKNOWN").observe(time.perf_counter() - start)
+
+# Connecting this signal stops Celery from installing its own root handlers
+@setup_logging.connect
+def _setup_worker_logging(**kwargs):
+    configure_logging()
+
+@worker_init.connect
+def _start_worker_metrics(**kwargs):
+    port = os.getenv("CELERY_METRICS_PORT")
+    if port:
+        start_metrics_server(int(port))
+
 @celery_app.task
 def process_task_in_background(task_id: str):
     """Process a task in the background."""
@@ -23,10 +64,12 @@ def process_task_in_background(task_id: str):
         if not task:
             raise ValueError(f"Task with ID {task_id} not found.")
         task.status = "in progress"
-        session.commit()
+        notify_task_change(session, "updated", task, {"status": "pending"})
+        commit_and_invalidate_sync(session)
         time.sleep(10)  # Simulate processing
         task.status = "completed"
-        session.commit()
+        notify_task_change(session, "updated", task, {"status": "in progress"})
+        commit_and_invalidate_sync(session)
     except Exception as e:
         print(f"Error processing task {task_id}: {e}")
     finally:
@@ -0,0 +1,115 @@
+import os
+import time
+import threading
+from collections import deque
+from utils.metrics import LLM_BREAKER_STATE, LLM_BREAKER_TRANSITIONS
+
+# Calls looked at, and how many are needed before the breaker may open
+BREAKER_WINDOW_SECONDS = float(os.getenv("LLM_BREAKER_WINDOW_SECONDS", "60"))
+BREAKER_MIN_CALLS = int(os.getenv("LLM_BREAKER_MIN_CALLS", "10"))
+# Open when either is exceeded over the window
+BREAKER_ERROR_RATE = float(os.getenv("LLM_BREAKER_ERROR_RATE", "0.5"))
+BREAKER_P95_SECONDS = float(os.getenv("LLM_BREAKER_P95_SECONDS", "6"))
+# How long to skip the LLM before letting one probe call through
+BREAKER_OPEN_SECONDS = float(os.getenv("LLM_BREAKER_OPEN_SECONDS", "30"))
+
+STATE_VALUES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+class CircuitBreaker:
+    """
+    Stop calling a dependency while it is failing or slow.
+
+    closed: calls go through and their outcome is recorded.
+    open: calls are refused until BREAKER_OPEN_SECONDS have passed.
+    half_open: one probe call goes through; its outcome closes or reopens
+    the breaker. A probe that never reports back is replaced after
+    BREAKER_OPEN_SECONDS.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.state = "closed"
+        self.calls = deque()  # (time, seconds, ok)
+        self.opened_at = None
+        self.probe_started_at = None
+        self.lock = threading.Lock()
+        LLM_BREAKER_STATE.labels(name).set(0)
+
+    def _set_state(self, state: str, now: float):
+        if state != self.state:
+            LLM_BREAKER_TRANSITIONS.labels(self.name, state).inc()
+        self.state = state
+        LLM_BREAKER_STATE.labels(self.name).set(STATE_VALUES[state])
+        if state == "open":
+            self.opened_at = now
+            self.calls.clear()
+        elif state == "closed":
+            self.opened_at = None
+            self.calls.clear()
+        self.probe_started_at = None
+
+    def allow(self) -> bool:
+        """Whether a call may go to the dependency now."""
+        with self.lock:
+            if self.state == "closed":
+                return True
+            now = time.monotonic()
+            if self.state == "open" and now - self.opened_at < BREAKER_OPEN_SECONDS:
+                return False
+            if self.state == "open":
+                self._set_state("half_open", now)
+            if self.probe_started_at is None or now - self.probe_started_at >= BREAKER_OPEN_SECONDS:
+                self.probe_started_at = now
+                return True
+            return False
+
+    def record(self, seconds: float, ok: bool):
+        """Record the outcome of a call that allow() let through."""
+        with self.lock:
+            now = time.monotonic()
+            if self.state == "half_open":
+                healthy = ok and seconds < BREAKER_P95_SECONDS
+                self._set_state("closed" if healthy else "open", now)
+                return
+            if self.state == "open":
+                return  # a call that started before the breaker opened
+            self.calls.append((now, seconds, ok))
+            while self.calls and self.calls[0][0] < now - BREAKER_WINDOW_SECONDS:
+                self.calls.popleft()
+            if len(self.calls) < BREAKER_MIN_CALLS:
+                return
+            error_rate, p95 = self._stats()
+            if error_rate >= BREAKER_ERROR_RATE or p95 >= BREAKER_P95_SECONDS:
+                self._set_state("open", now)
+
+    def _stats(self) -> tuple:
+        if not self.calls:
+            return 0.0, 0.0
+        failures = sum(1 for _, _, ok in self.calls if not ok)
+        latencies = sorted(seconds for _, seconds, _ in self.calls)
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        return failures / len(self.calls), p95
+
+    def snapshot(self) -> dict:
+        """State and window statistics, for monitoring."""
+        with self.lock:
+            error_rate, p95 = self._stats()
+            retry_in = None
+            if self.state == "open":
+                retry_in = max(0.0, BREAKER_OPEN_SECONDS - (time.monotonic() - self.opened_at))
+            return {
+                "name": self.name,
+                "state": self.state,
+                "calls_in_window": len(self.calls),
+                "error_rate": round(error_rate, 3),
+                "p95_seconds": round(p95, 3),
+                "probe_in_seconds": None if retry_in is None else round(retry_in, 1),
+                "thresholds": {
+                    "error_rate": BREAKER_ERROR_RATE,
+                    "p95_seconds": BREAKER_P95_SECONDS,
+                    "min_calls": BREAKER_MIN_CALLS,
+                    "window_seconds": BREAKER_WINDOW_SECONDS,
+                    "open_seconds": BREAKER_OPEN_SECONDS,
+                },
+            }
@@ -0,0 +1,97 @@
+import os
+import zlib
+from datetime import datetime, timedelta
+
+# Reminders due within this window of each other go out in one email
+DIGEST_WINDOW = timedelta(minutes=int(os.getenv("REMINDER_DIGEST_WINDOW_MINUTES", "60")))
+
+
+def in_quiet_hours(user, moment: datetime) -> bool:
+    """Check whether a moment falls in the user's quiet hours (may span midnight)."""
+    start, end = getattr(user, "quiet_hours_start", None), getattr(user, "quiet_hours_end", None)
+    if start is None or end is None or start == end:
+        return False
+    now = moment.time()
+    if start < end:
+        return start <= now < end
+    return now >= start or now < end
+
+
+def quiet_hours_end(user, moment: datetime) -> datetime:
+    """The first moment after `moment` that is outside the user's quiet hours."""
+    end = datetime.combine(moment.date(), user.quiet_hours_end)
+    if end <= moment:
+        end += timedelta(days=1)
+    return end
+
+
+def spread_offset(user_id) -> timedelta:
+    """Stable per-user offset inside the digest window, so sends do not all land at once."""
+    window_seconds = max(int(DIGEST_WINDOW.total_seconds()), 1)
+    return timedelta(seconds=zlib.crc32(str(user_id).encode("utf-8")) % window_seconds)
+
+
+def render_digest(entries: list, now: datetime = None) -> tuple:
+    """
+    Render the reminders for one user as a single email.
+
+    Args:
+        entries (list): ReminderEntry tuples for the user.
+        now (datetime): When the email is sent; entries due by then are marked
+            as past due.
+
+    Returns:
+        tuple: (subject, body).
+    """
+    entries = sorted(entries, key=lambda entry: entry.due_date)
+    overdue = [now is not None and entry.due_date <= now for entry in entries]
+    if len(entries) == 1:
+        entry = entries[0]
+        verb = "was" if overdue[0] else "is"
+        subject = f"Reminder: '{entry.description}' {verb} due at {entry.due_date:%H:%M}"
+    else:
+        subject = f"Reminder: {len(entries)} tasks due soon"
+    lines = [
+        f"- {entry.due_date:%a %d %b %H:%M}  {entry.description}{'  (past due)' if past else ''}"
+        for entry, past in zip(entries, overdue)
+    ]
+    body = "The following tasks are due soon:\n\n" + "\n".join(lines) + "\n"
+    return subject, body
+
+
+class DigestBuffer:
+    """Reminders waiting to be sent, grouped per user."""
+
+    def __init__(self):
+        self.pending = {}
+
+    def add(self, entry, remind_at: datetime, now: datetime):
+        digest = self.pending.setdefault(entry.user_id, {"entries": [], "send_at": None})
+        digest["entries"].append(entry)
+        send_at = max(min(now + spread_offset(entry.user_id), remind_at), now)
+        if digest["send_at"] is None or send_at < digest["send_at"]:
+            digest["send_at"] = send_at
+
+    def ready(self, now: datetime, users: dict) -> list:
+        """
+        Remove and return the digests that should be sent now.
+
+        Digests for users in quiet hours are held until the quiet hours end.
+
+        Returns:
+            list: (user, entries) pairs.
+        """
+        ready = []
+        for user_id, digest in list(self.pending.items()):
+            if digest["send_at"] > now:
+                continue
+            user = users.get(user_id)
+            if user is not None and in_quiet_hours(user, now):
+                digest["send_at"] = quiet_hours_end(user, now)
+                continue
+            del self.pending[user_id]
+            ready.append((user, digest["entries"]))
+        return ready
+
+    def user_ids(self, now: datetime) -> set:
+        return {user_id for user_id, digest in self.pending.items() if digest["send_at"] <= now}
@@ -0,0 +1,270 @@
+import os
+import math
+import time
+import asyncio
+import logging
+from collections import deque
+import openai
+import redis
+import redis.asyncio as aioredis
+from utils.metrics import (
+    LLM_CONCURRENCY_LIMIT, LLM_IN_FLIGHT, LLM_LIMITER_REJECTIONS, LLM_LIMITER_WAIT_SECONDS,
+)
+
+redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# In-flight completions per worker: starting point and bounds for the adaptive limit
+LLM_CONCURRENCY_INITIAL = int(os.getenv("LLM_CONCURRENCY_INITIAL", "16"))
+LLM_CONCURRENCY_MIN = int(os.getenv("LLM_CONCURRENCY_MIN", "2"))
+LLM_CONCURRENCY_MAX = int(os.getenv("LLM_CONCURRENCY_MAX", "64"))
+# Completions slower than this shrink the limit a little; provider 429s halve it
+LLM_LATENCY_TARGET_SECONDS = float(os.getenv("LLM_LATENCY_TARGET_SECONDS", "5"))
+# Requests beyond the limit wait this long at most, and at most this many wait
+LLM_QUEUE_TIMEOUT_SECONDS = float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "5"))
+LLM_QUEUE_SIZE = int(os.getenv("LLM_QUEUE_SIZE", "200"))
+# Budget shared by all workers through Redis, per minute (0 = unlimited)
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))
+LLM_BUDGET_KEY_PREFIX = "llmbudget:v1:"
+
+_async_redis_client = None
+
+
+def _get_async_redis():
+    global _async_redis_client
+    if _async_redis_client is None:
+        _async_redis_client = aioredis.Redis.from_url(redis_url, socket_timeout=0.2)
+    return _async_redis_client
+
+
+class LLMOverloaded(Exception):
+    """
+    The LLM cannot take this request now; the client should retry later.
+
+    status is 429 when the shared or provider rate limit is exhausted and
+    503 when this worker's queue is full or the wait ran past its deadline.
+    """
+
+    def __init__(self, message: str, status: int, retry_after: float):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class AdaptiveLimiter:
+    """
+    Cap in-flight calls with an AIMD limit and queue the excess up to a deadline.
+
+    Each fast success raises the limit by 1/limit (about one per round of
+    calls). A provider 429 halves it, and a call slower than the target
+    trims it by 10%, at most once per target interval.
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int, latency_target: float, queue_size: int):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_target = latency_target
+        self.queue_size = queue_size
+        self.in_flight = 0
+        self.waiters = deque()
+        self.last_decrease = 0.0
+        self.latency = latency_target / 2  # moving average, for Retry-After
+        LLM_CONCURRENCY_LIMIT.set(self.limit)
+
+    def retry_after(self) -> float:
+        return self.latency * (1 + len(self.waiters) / max(self.limit, 1))
+
+    async def acquire(self, deadline: float):
+        """Take a slot, waiting until the deadline (loop time) at most."""
+        if self.in_flight < int(self.limit) and not self.waiters:
+            self.in_flight += 1
+            LLM_IN_FLIGHT.set(self.in_flight)
+            return
+        if len(self.waiters) >= self.queue_size:
+            LLM_LIMITER_REJECTIONS.labels("queue_full").inc()
+            raise LLMOverloaded("Too many requests are waiting for the LLM", 503, self.retry_after())
+
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        self.waiters.append(waiter)
+        start = loop.time()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=max(deadline - start, 0))
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # A slot was handed over just as we gave up; pass it on
+                self.release(None)
+            else:
+                waiter.cancel()
+                self.waiters.remove(waiter)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            LLM_LIMITER_REJECTIONS.labels("queue_timeout").inc()
+            raise LLMOverloaded("Timed out waiting for an LLM slot", 503, self.retry_after())
+        finally:
+            LLM_LIMITER_WAIT_SECONDS.observe(loop.time() - start)
+
+    def release(self, latency: float = None, throttled: bool = False):
+        """Free a slot, adjusting the limit from the call's latency or a provider 429."""
+        self.in_flight -= 1
+        now = time.monotonic()
+        if throttled:
+            self._decrease(now, 0.5)
+        elif latency is not None:
+            self.latency = 0.8 * self.latency + 0.2 * latency
+            if latency > self.latency_target:
+                self._decrease(now, 0.9)
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+        LLM_CONCURRENCY_LIMIT.set(self.limit)
+
+        # Hand freed slots straight to waiters so newcomers cannot jump the queue
+        while self.waiters and self.in_flight < int(self.limit):
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+        LLM_IN_FLIGHT.set(self.in_flight)
+
+    def _decrease(self, now: float, factor: float):
+        if now - self.last_decrease >= self.latency_target:
+            self.limit = max(self.minimum, self.limit * factor)
+            self.last_decrease = now
+
+
+class SharedBudget:
+    """Per-minute request and token budget counted in Redis by every worker."""
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.requests_per_minute or self.tokens_per_minute)
+
+    def _keys(self, now: float) -> tuple:
+        window = int(now // 60)
+        return f"{LLM_BUDGET_KEY_PREFIX}requests:{window}", f"{LLM_BUDGET_KEY_PREFIX}tokens:{window}"
+
+    async def reserve(self, tokens: int, deadline: float) -> str:
+        """
+        Count a call and its estimated tokens, waiting for the next minute if needed.
+
+        Returns:
+            str: The token counter key, to adjust once actual usage is known.
+
+        Raises:
+            LLMOverloaded: If the budget stays exhausted past the deadline.
+        """
+        loop = asyncio.get_running_loop()
+        client = _get_async_redis()
+        while True:
+            now = time.time()
+            requests_key, tokens_key = self._keys(now)
+            try:
+                async with client.pipeline(transaction=False) as pipe:
+                    pipe.incr(requests_key)
+                    pipe.expire(requests_key, 120)
+                    pipe.incrby(tokens_key, tokens)
+                    pipe.expire(tokens_key, 120)
+                    used_requests, _, used_tokens, _ = await pipe.execute()
+            except redis.RedisError as e:
+                logging.warning(f"LLM budget unavailable, not enforcing it: {e}")
+                return None
+            over = (
+                (self.requests_per_minute and used_requests > self.requests_per_minute)
+                or (self.tokens_per_minute and used_tokens > self.tokens_per_minute)
+            )
+            if not over:
+                return tokens_key
+
+            # Give back what was taken, then wait for the next window if the deadline allows
+            try:
+                async with client.pipeline(transaction=False) as pipe:
+                    pipe.decr(requests_key)
+                    pipe.decrby(tokens_key, tokens)
+                    await pipe.execute()
+            except redis.RedisError:
+                pass
+            wait = 60 - now % 60
+            if loop.time() + wait > deadline:
+                LLM_LIMITER_REJECTIONS.labels("budget").inc()
+                raise LLMOverloaded("LLM request budget exhausted for this minute", 429, wait)
+            await asyncio.sleep(wait)
+
+    async def adjust(self, tokens_key: str, delta: int):
+        """Correct the token counter once the actual usage is known."""
+        if tokens_key and delta:
+            try:
+                await _get_async_redis().incrby(tokens_key, delta)
+            except redis.RedisError:
+                pass
+
+    async def refund(self, tokens_key: str, tokens: int):
+        """Give back a reservation whose call never started."""
+        if not tokens_key:
+            return
+        requests_key = tokens_key.replace(f"{LLM_BUDGET_KEY_PREFIX}tokens:", f"{LLM_BUDGET_KEY_PREFIX}requests:", 1)
+        try:
+            async with _get_async_redis().pipeline(transaction=False) as pipe:
+                pipe.decr(requests_key)
+                pipe.decrby(tokens_key, tokens)
+                await pipe.execute()
+        except redis.RedisError:
+            pass
+
+
+limiter = AdaptiveLimiter(
+    LLM_CONCURRENCY_INITIAL, LLM_CONCURRENCY_MIN, LLM_CONCURRENCY_MAX, LLM_LATENCY_TARGET_SECONDS, LLM_QUEUE_SIZE,
+)
+budget = SharedBudget(LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE)
+
+
+def estimate_tokens(messages: list, max_tokens: int) -> int:
+    """Rough token count for a request: ~4 characters per prompt token plus the reply cap."""
+    return sum(len(message["content"]) for message in messages) // 4 + max_tokens
+
+
+async def run_limited(call, messages: list, max_tokens: int):
+    """
+    Run an LLM call under the shared budget and the adaptive limit.
+
+    Args:
+        call: Async callable making the completion request.
+        messages (list): The request's chat messages (for the token estimate).
+        max_tokens (int): The request's reply cap.
+
+    Returns:
+        The completion response.
+
+    Raises:
+        LLMOverloaded: If the call cannot start before the queue deadline, or
+            the provider rate-limited it.
+    """
+    deadline = asyncio.get_running_loop().time() + LLM_QUEUE_TIMEOUT_SECONDS
+    estimate = estimate_tokens(messages, max_tokens)
+    tokens_key = await budget.reserve(estimate, deadline) if budget.enabled else None
+    try:
+        await limiter.acquire(deadline)
+    except (LLMOverloaded, asyncio.CancelledError):
+        await budget.refund(tokens_key, estimate)
+        raise
+
+    start = time.perf_counter()
+    latency, throttled = None, False
+    try:
+        response = await call()
+        latency = time.perf_counter() - start
+    except openai.error.RateLimitError as e:
+        throttled = True
+        LLM_LIMITER_REJECTIONS.labels("provider").inc()
+        raise LLMOverloaded(f"LLM provider rate limit: {e}", 429, limiter.retry_after()) from e
+    finally:
+        limiter.release(latency, throttled)
+
+    usage = response.get("usage") if hasattr(response, "get") else None
+    if usage and tokens_key:
+        await budget.adjust(tokens_key, usage.get("total_tokens", estimate) - estimate)
+    return response
@@ -0,0 +1,179 @@
+import os
+import sys
+import copy
+import json
+import time
+import queue
+import atexit
+import random
+import logging
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from utils.metrics import LOG_RECORDS_DROPPED
+
+# Root level, per-logger overrides ("name=LEVEL,..."), and output format (json or text)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_LEVELS = os.getenv("LOG_LEVELS", "llm.payload=DEBUG")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+# Records waiting for the writer thread; new records are dropped when it is full
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# Share of LLM exchanges logged in full, and a hard cap per minute
+LLM_LOG_SAMPLE_RATE = float(os.getenv("LLM_LOG_SAMPLE_RATE", "0.01"))
+LLM_LOG_MAX_PER_MINUTE = int(os.getenv("LLM_LOG_MAX_PER_MINUTE", "60"))
+
+payload_logger = logging.getLogger("llm.payload")
+
+# Attributes every LogRecord has; anything else was passed with extra={...}
+_RECORD_ATTRS = set(logging.makeLogRecord({}).__dict__) | {"message", "asctime"}
+
+_listener = None
+_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with any `extra` fields included."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "thread": record.threadName,
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Hand records to the writer thread; never block the caller if it falls behind."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only resolve the message here; JSON encoding happens on the writer thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+def parse_levels(spec: str) -> dict:
+    """Parse "name=LEVEL,name=LEVEL" into {name: LEVEL}."""
+    levels = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, level = item.partition("=")
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging():
+    """
+    Route all logging through a queue drained by a background thread.
+
+    Safe to call more than once; only the first call has an effect. Replaces
+    any handlers already on the root logger.
+    """
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return
+        output = logging.StreamHandler(sys.stdout)
+        if LOG_FORMAT == "json":
+            output.setFormatter(JsonFormatter())
+        else:
+            output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+        records = queue.Queue(LOG_QUEUE_SIZE)
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(DroppingQueueHandler(records))
+        root.setLevel(LOG_LEVEL.upper())
+        for name, level in parse_levels(LOG_LEVELS).items():
+            logging.getLogger(name).setLevel(level)
+
+        _listener = QueueListener(records, output, respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop_logging)
+
+
+def stop_logging():
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+def _restart_after_fork():
+    # The writer thread does not survive fork (Celery prefork children), so
+    # start a new one on the same queue, without the parent's pending records
+    global _listener, _lock
+    _lock = threading.Lock()
+    if _listener is not None:
+        records = _listener.queue
+        while not records.empty():
+            records.get_nowait()
+        _listener = QueueListener(records, *_listener.handlers, respect_handler_level=True)
+        _listener.start()
+
+
+os.register_at_fork(after_in_child=_restart_after_fork)
+
+
+class RateSampler:
+    """Let through a random share of events, at most `per_minute` of them."""
+
+    def __init__(self, rate: float, per_minute: int):
+        self.rate = rate
+        self.per_minute = per_minute
+        self.window_start = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        if self.rate <= 0 or random.random() >= self.rate:
+            return False
+        with self.lock:
+            now = time.monotonic()
+            if now - self.window_start >= 60:
+                self.window_start, self.count = now, 0
+            if self.count >= self.per_minute:
+                return False
+            self.count += 1
+            return True
+
+
+llm_sampler = RateSampler(LLM_LOG_SAMPLE_RATE, LLM_LOG_MAX_PER_MINUTE)
+
+
+def log_llm_exchange(messages: list, response):
+    """
+    Log the prompt and raw response of a sampled share of LLM calls.
+
+    The check is cheap and happens before anything is formatted, so calls
+    that are not sampled cost one random() at most.
+    """
+    if not payload_logger.isEnabledFor(logging.DEBUG) or not llm_sampler.allow():
+        return
+    payload_logger.debug(
+        "LLM exchange",
+        extra={"prompt": messages[-1]["content"] if messages else None, "response": response},
+    )
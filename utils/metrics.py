@@ -0,0 +1,188 @@
+import os
+import time
+import contextvars
+from prometheus_client import (
+    Counter, Gauge, Histogram, CollectorRegistry, REGISTRY, CONTENT_TYPE_LATEST, generate_latest,
+    start_http_server,
+)
+from prometheus_client import multiprocess
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+# Label for DB queries: the endpoint (or job) that issued them
+query_label = contextvars.ContextVar("query_label", default="other")
+
+LLM_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30)
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+# Command parsing
+PROCESS_COMMAND_SECONDS = Histogram(
+    "process_command_seconds", "Time to turn one command into task data",
+    ["source"], buckets=LLM_BUCKETS,
+)
+PARSE_RESULTS = Counter(
+    "parse_results_total", "Parsed commands by the path that served them",
+    ["source"],  # local, cache, llm, coalesced, degraded, error
+)
+PARSE_COALESCED = Counter(
+    "parse_coalesced_total", "Parses that shared an identical in-flight parse", ["scope"],  # local, redis
+)
+VALIDATION_FAILURES = Counter("parse_validation_failures_total", "Parsed commands rejected by TaskCreate")
+LLM_REQUEST_SECONDS = Histogram(
+    "llm_request_seconds", "Latency of OpenAI chat completion calls", ["outcome"], buckets=LLM_BUCKETS,
+)
+LLM_TOKENS = Counter("llm_tokens_total", "Tokens used by OpenAI calls", ["kind"])
+LLM_REQUEST_TOKENS = Histogram(
+    "llm_request_tokens", "Tokens per OpenAI call", ["kind", "prompt"],  # prompt: function name or "text"
+    buckets=(16, 32, 64, 96, 128, 192, 256, 384, 512, 1024, 2048, 4096),
+)
+LLM_CONCURRENCY_LIMIT = Gauge(
+    "llm_concurrency_limit", "Adaptive cap on in-flight OpenAI calls", multiprocess_mode="livesum",
+)
+LLM_IN_FLIGHT = Gauge("llm_in_flight", "OpenAI calls in flight", multiprocess_mode="livesum")
+LLM_LIMITER_REJECTIONS = Counter(
+    "llm_limiter_rejections_total", "Requests turned away by the LLM limiter",
+    ["reason"],  # queue_full, queue_timeout, budget, provider
+)
+LLM_LIMITER_WAIT_SECONDS = Histogram(
+    "llm_limiter_wait_seconds", "Time spent queued for an LLM slot", buckets=FAST_BUCKETS + (5, 10),
+)
+LLM_BREAKER_STATE = Gauge(
+    "llm_breaker_state", "LLM circuit breaker state (0 closed, 1 half-open, 2 open)", ["breaker"],
+    multiprocess_mode="livemax",
+)
+LLM_BREAKER_TRANSITIONS = Counter(
+    "llm_breaker_transitions_total", "LLM circuit breaker state changes", ["breaker", "state"],
+)
+PARSE_DEGRADED = Counter(
+    "parse_degraded_total", "Commands served by the local parser instead of the LLM",
+    ["reason"],  # deadline, breaker_open, llm_error
+)
+
+# Database
+DB_QUERY_SECONDS = Histogram(
+    "db_query_seconds", "Database statement execution time", ["query"], buckets=FAST_BUCKETS,
+)
+DB_POOL_CHECKOUT_SECONDS = Histogram(
+    "db_pool_checkout_seconds", "Time spent waiting for a pooled connection", ["pool"], buckets=FAST_BUCKETS,
+)
+DB_POOL_IN_USE = Gauge(
+    "db_pool_connections_in_use", "Connections checked out of the pool", ["pool"], multiprocess_mode="livesum",
+)
+DB_POOL_SATURATION = Gauge(
+    "db_pool_saturation", "Checked-out connections over pool size plus overflow", ["pool"],
+    multiprocess_mode="livemax",
+)
+
+# Celery
+CELERY_ENQUEUE_SECONDS = Histogram(
+    "celery_enqueue_seconds", "Time to publish a task to the broker", ["task"], buckets=FAST_BUCKETS,
+)
+CELERY_TASK_SECONDS = Histogram(
+    "celery_task_seconds", "Celery task execution time", ["task", "state"], buckets=LLM_BUCKETS,
+)
+
+# Reminder scheduler
+SCHEDULER_RUNS = Counter("scheduler_runs_total", "Scheduler job runs", ["job", "outcome"])
+SCHEDULER_REMINDERS = Counter("scheduler_reminders_total", "Reminders handed off for delivery", ["kind"])
+
+# SMTP
+SMTP_SEND_SECONDS = Histogram(
+    "smtp_send_seconds", "Time to send one email over SMTP", ["outcome"], buckets=FAST_BUCKETS + (5, 10, 30),
+)
+SMTP_EVENTS = Counter("smtp_events_total", "Email delivery pipeline events", ["event"])
+
+# Task read cache
+TASK_CACHE_EVENTS = Counter(
+    "task_cache_events_total", "Task read cache events",
+    ["event"],  # hit, wait_hit, miss, invalidate, error
+)
+
+# Logging
+LOG_RECORDS_DROPPED = Counter("log_records_dropped_total", "Log records dropped because the log queue was full")
+
+
+def record_llm_usage(response, prompt: str = "text"):
+    """Count prompt and completion tokens of an OpenAI response, in total and per call."""
+    usage = response.get("usage") if hasattr(response, "get") else None
+    if usage:
+        for kind in ("prompt", "completion"):
+            tokens = usage.get(f"{kind}_tokens", 0)
+            LLM_TOKENS.labels(kind).inc(tokens)
+            LLM_REQUEST_TOKENS.labels(kind, prompt).observe(tokens)
+
+
+def instrument_engine(engine):
+    """
+    Time every statement an engine executes, labelled with query_label.
+
+    For an AsyncEngine pass engine.sync_engine.
+    """
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info["query_start"].pop()
+        DB_QUERY_SECONDS.labels(query_label.get()).observe(time.perf_counter() - start)
+
+
+class _TimedPoolMixin:
+    """Observe checkout wait and usage of a QueuePool."""
+
+    metrics_name = "sync"
+
+    def _update_usage(self):
+        in_use = self.checkedout()
+        DB_POOL_IN_USE.labels(self.metrics_name).set(in_use)
+        DB_POOL_SATURATION.labels(self.metrics_name).set(in_use / max(self.size() + max(self._max_overflow, 0), 1))
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_SECONDS.labels(self.metrics_name).observe(time.perf_counter() - start)
+            self._update_usage()
+
+    def _do_return_conn(self, record):
+        super()._do_return_conn(record)
+        self._update_usage()
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    metrics_name = "sync"
+
+
+class TimedAsyncQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    metrics_name = "async"
+
+
+def metrics_registry():
+    """
+    The registry to export.
+
+    With several worker processes, set PROMETHEUS_MULTIPROC_DIR so every
+    process writes its samples there and they are merged on export.
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def render_metrics() -> tuple:
+    """
+    Render all metrics in the Prometheus text format.
+
+    Returns:
+        tuple: (payload bytes, content type).
+    """
+    return generate_latest(metrics_registry()), CONTENT_TYPE_LATEST
+
+
+def start_metrics_server(port: int):
+    """Serve /metrics on its own port (processes without the API, e.g. Celery)."""
+    start_http_server(port, registry=metrics_registry())
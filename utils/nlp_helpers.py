@@ -1,36 +1,155 @@
 from datetime import datetime
 import re
+import parsedatetime
 
-def parse_command(command: str) -> dict:
+ISO_DATE_PATTERN = re.compile(r"\b(\d{4}-\d{2}-\d{2})(?:[ T](\d{2}:\d{2}))?\b")
+
+RECURRENCE_PATTERNS = [
+    (re.compile(r"\b(daily|every\s+day|each\s+day)\b", re.IGNORECASE), "daily"),
+    (re.compile(r"\b(weekly|every\s+week|each\s+week)\b", re.IGNORECASE), "weekly"),
+    (re.compile(r"\b(monthly|every\s+month|each\s+month)\b", re.IGNORECASE), "monthly"),
+]
+
+# Leading phrases that carry no task information
+FILLER_PATTERN = re.compile(
+    r"^(please\s+)?(remind\s+me\s+to|remember\s+to|i\s+need\s+to|i\s+have\s+to|"
+    r"add\s+(a\s+)?task\s+to|todo:?)\s+",
+    re.IGNORECASE,
+)
+
+# Prepositions left dangling once a date phrase has been cut out
+DANGLING_PATTERN = re.compile(r"\b(on|by|at|due|before|for)\s*$", re.IGNORECASE)
+
+# Constructs the rules cannot represent; these are left to the LLM
+AMBIGUOUS_PATTERN = re.compile(
+    r"\b(every\s+other|except|unless|until|between|and\s+then|or|if)\b|\?",
+    re.IGNORECASE,
+)
+
+# Time-like words that should not survive into the description
+LEFTOVER_TIME_PATTERN = re.compile(
+    r"\b(\d+|am|pm|noon|midnight|o'clock|today|tonight|tomorrow|next|every|"
+    r"monday|tuesday|wednesday|thursday|friday|saturday|sunday|"
+    r"january|february|march|april|may|june|july|august|september|october|november|december)\b",
+    re.IGNORECASE,
+)
+
+# Date matches that are often not dates at all: a bare number ("fix bug 1234")
+# or a month name without a day ("march madness", "meet with May")
+BARE_NUMBER_PATTERN = re.compile(r"^\d+$")
+MONTH_PATTERN = re.compile(
+    r"\b(january|february|march|april|may|june|july|august|september|october|november|december)\b",
+    re.IGNORECASE,
+)
+
+# Words that need an object; a date match right after one took part of the description
+OBJECT_WORD_PATTERN = re.compile(r"\b(to|with|about|from|of|the|a|an|and|my|his|her|their|our)\s*$", re.IGNORECASE)
+
+# A time taken from a run of digits with no colon or am/pm ("bug 1234 tomorrow", "room 101 on friday")
+DIGIT_RUN_TIME_PATTERN = re.compile(r"(?<![\d:])\d{3,4}(?![\d:])")
+CLOCK_MARKER_PATTERN = re.compile(r":|\b(am|pm|a\.m\.|p\.m\.)|\d(am|pm)\b", re.IGNORECASE)
+
+# Signs of a date that parsedatetime did not find ("on the 1st", "this weekend")
+UNPARSED_DATE_PATTERN = re.compile(
+    r"\d|\b(weekend|weekday|on\s+the|tonight|morning|afternoon|evening|"
+    r"monday|tuesday|wednesday|thursday|friday|saturday|sunday|"
+    r"january|february|march|april|may|june|july|august|september|october|november|december)\b",
+    re.IGNORECASE,
+)
+
+MAX_DESCRIPTION_WORDS = 10
+
+
+def score_command(command: str, now: datetime = None) -> tuple:
     """
-    Parse a natural language command into structured data.
+    Parse a command with local rules and score the result.
 
     Args:
         command (str): The user's command.
+        now (datetime): Reference time for relative dates (defaults to now).
 
     Returns:
-        dict: Extracted description, due_date, and other fields.
+        tuple: (task data dict, confidence between 0 and 1).
     """
-    # parsing logic for due dates
-    date_patterns = [
-        r"(on|by)\s+(\d{4}-\d{2}-\d{2})",  # Match YYYY-MM-DD
-        r"(on|by)\s+(\w+\s\d{1,2}(?:st|nd|rd|th)?)"  # Match natural dates
-    ]
+    now = now or datetime.now()
+    text = command.strip()
+    confidence = 1.0
+
+    if AMBIGUOUS_PATTERN.search(text):
+        confidence -= 0.5
+
+    # Recurrence keywords
+    recurrence = None
+    for pattern, value in RECURRENCE_PATTERNS:
+        if pattern.search(text):
+            if recurrence:
+                confidence -= 0.5
+            recurrence = value
+            text = pattern.sub(" ", text)
+
+    # Due date: ISO dates first, then natural language via parsedatetime
     due_date = None
-    for pattern in date_patterns:
-        match = re.search(pattern, command, re.IGNORECASE)
-        if match:
-            try:
-                due_date = datetime.strptime(match.group(2), "%Y-%m-%d")
-                break
-            except ValueError:
-                # Handle natural language dates
-                pass
-
-    # Extract description
-    description = re.sub(r"(on|by)\s+\S+", "", command).strip()
-    return {
+    iso_match = ISO_DATE_PATTERN.search(text)
+    if iso_match:
+        try:
+            due_date = datetime.fromisoformat(" ".join(filter(None, iso_match.groups())))
+            text = text[:iso_match.start()] + text[iso_match.end():]
+        except ValueError:
+            confidence -= 0.5
+    else:
+        matches = parsedatetime.Calendar().nlp(text, sourceTime=now) or ()
+        if len(matches) > 1:
+            confidence -= 0.3
+        if matches:
+            due_date, flag, start, end, phrase = matches[0]
+            phrase = phrase.strip()
+            if BARE_NUMBER_PATTERN.match(phrase) or (MONTH_PATTERN.search(phrase) and not re.search(r"\d", phrase)):
+                confidence -= 0.5
+            if OBJECT_WORD_PATTERN.search(text[:start]):
+                confidence -= 0.5
+            if flag & 2 and DIGIT_RUN_TIME_PATTERN.search(phrase) and not CLOCK_MARKER_PATTERN.search(phrase):
+                confidence -= 0.5
+            text = text[:start] + text[end:]
+            if flag == 1:
+                # Date without a time of day: use the same default as "tomorrow"
+                due_date = due_date.replace(hour=9, minute=0, second=0, microsecond=0)
+
+    if due_date and due_date < now:
+        confidence -= 0.4
+
+    # Whatever is left is the description
+    text = re.sub(r"\s+", " ", text).strip(" ,.;:-")
+    text = FILLER_PATTERN.sub("", text)
+    text = DANGLING_PATTERN.sub("", text).strip(" ,.;:-")
+    description = text[:1].upper() + text[1:] if text else None
+
+    if not description:
+        confidence = 0.0
+    else:
+        if LEFTOVER_TIME_PATTERN.search(description):
+            confidence -= 0.4
+        if due_date is None and UNPARSED_DATE_PATTERN.search(description):
+            confidence -= 0.5
+        if len(description.split()) > MAX_DESCRIPTION_WORDS:
+            confidence -= 0.2
+
+    task_data = {
         "description": description,
         "due_date": due_date.isoformat() if due_date else None,
-        "recurrence": None
+        "recurrence": recurrence,
     }
+    return task_data, max(confidence, 0.0)
+
+
+def parse_command(command: str) -> dict:
+    """
+    Parse a natural language command into structured data.
+
+    Args:
+        command (str): The user's command.
+
+    Returns:
+        dict: Extracted description, due_date, and other fields.
+    """
+    task_data, _ = score_command(command)
+    return task_data
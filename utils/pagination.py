@@ -0,0 +1,160 @@
+import os
+import json
+import time
+import base64
+import threading
+from uuid import UUID
+from datetime import datetime
+from sqlalchemy import and_, or_, text
+from database_tools.models import Task
+
+# Columns GET /tasks may sort by; anything else is rejected
+SORTABLE_FIELDS = {
+    "due_date": Task.due_date,
+    "priority": Task.priority,
+    "status": Task.status,
+    "description": Task.description,
+    "id": Task.id,
+}
+DATETIME_FIELDS = {"due_date"}
+UUID_FIELDS = {"id"}
+
+COUNT_CACHE_TTL_SECONDS = int(os.getenv("COUNT_CACHE_TTL_SECONDS", "60"))
+
+_count_cache = {}
+_count_lock = threading.Lock()
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(value, task_id, sort_by: str, sort_order: str) -> str:
+    """Build an opaque cursor for the position right after (value, task_id)."""
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    elif isinstance(value, UUID):
+        value = str(value)
+    payload = {"v": value, "id": str(task_id), "s": sort_by, "o": sort_order}
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_by: str, sort_order: str) -> tuple:
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Returns:
+        tuple: (sort value, task id).
+
+    Raises:
+        InvalidCursor: If the cursor is malformed or was issued for another sort.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        value, task_id = payload["v"], UUID(payload["id"])
+        if payload.get("s") != sort_by or payload.get("o") != sort_order:
+            raise InvalidCursor("Cursor was issued for a different sort order")
+        if value is not None and sort_by in DATETIME_FIELDS:
+            value = datetime.fromisoformat(value)
+        elif value is not None and sort_by in UUID_FIELDS:
+            value = UUID(value)
+    except InvalidCursor:
+        raise
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {e}")
+    return value, task_id
+
+
+def order_clauses(sort_by: str, sort_order: str) -> list:
+    """ORDER BY clauses for keyset pagination (NULLs last, id as tie-breaker)."""
+    column = SORTABLE_FIELDS[sort_by]
+    if sort_order == "desc":
+        return [column.desc().nulls_last(), Task.id.desc()]
+    return [column.asc().nulls_last(), Task.id.asc()]
+
+
+def seek_clause(sort_by: str, sort_order: str, value, task_id):
+    """WHERE clause selecting the rows that come after (value, task_id)."""
+    column = SORTABLE_FIELDS[sort_by]
+    desc = sort_order == "desc"
+    id_beyond = Task.id < task_id if desc else Task.id > task_id
+    if value is None:
+        return and_(column == None, id_beyond)
+    beyond = column < value if desc else column > value
+    return or_(beyond, and_(column == value, id_beyond), column == None)
+
+
+def sort_items(items: list, sort_by: str, sort_order: str) -> list:
+    """Sort objects the same way order_clauses sorts rows."""
+    present = [item for item in items if getattr(item, sort_by) is not None]
+    missing = [item for item in items if getattr(item, sort_by) is None]
+    reverse = sort_order == "desc"
+    present.sort(key=lambda item: (getattr(item, sort_by), item.id), reverse=reverse)
+    missing.sort(key=lambda item: item.id, reverse=reverse)
+    return present + missing
+
+
+def row_sort_key(sort_by: str, sort_order: str):
+    """
+    Sort key for mappings that, with reverse=(sort_order == "desc"), matches
+    order_clauses: NULLs last either way, id as tie-breaker.
+    """
+    desc = sort_order == "desc"
+
+    def key(row):
+        value = row[sort_by]
+        present = value is not None
+        return (present if desc else not present, value if present else 0, row["id"])
+    return key
+
+
+def is_after(item, sort_by: str, sort_order: str, value, task_id) -> bool:
+    """Python counterpart of seek_clause."""
+    item_value = getattr(item, sort_by)
+    if sort_order == "desc":
+        beyond = lambda a, b: a < b
+    else:
+        beyond = lambda a, b: a > b
+    if value is None:
+        return item_value is None and beyond(item.id, task_id)
+    if item_value is None:
+        return True
+    return beyond(item_value, value) or (item_value == value and beyond(item.id, task_id))
+
+
+async def estimate_count(db, statement, filters_key: tuple, filtered: bool) -> int:
+    """
+    Approximate row count for a task query, cached for a short time.
+
+    Unfiltered counts come from pg_class statistics; filtered counts use the
+    planner's row estimate, so no query ever scans the table to count.
+
+    Args:
+        db (AsyncSession): Database session.
+        statement (Select): The filtered task query.
+        filters_key (tuple): Cache key for the filters.
+        filtered (bool): Whether any filter is applied.
+    """
+    now = time.monotonic()
+    with _count_lock:
+        cached = _count_cache.get(filters_key)
+        if cached and cached[0] > now:
+            return cached[1]
+
+    if filtered:
+        compiled = statement.compile(dialect=db.bind.dialect, compile_kwargs={"literal_binds": True})
+        plan = (await db.execute(text(f"EXPLAIN (FORMAT JSON) {compiled}"))).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        estimate = int(plan[0]["Plan"]["Plan Rows"])
+    else:
+        estimate = (await db.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE relname = 'tasks'")
+        )).scalar() or 0
+        estimate = max(int(estimate), 0)
+
+    with _count_lock:
+        _count_cache[filters_key] = (now + COUNT_CACHE_TTL_SECONDS, estimate)
+    return estimate
@@ -0,0 +1,188 @@
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+import parsedatetime
+import redis
+import redis.asyncio as aioredis
+
+redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+PARSE_CACHE_SIZE = int(os.getenv("PARSE_CACHE_SIZE", "1024"))
+PARSE_CACHE_TTL_SECONDS = int(os.getenv("PARSE_CACHE_TTL_SECONDS", "3600"))
+PARSE_CACHE_REDIS_TTL_SECONDS = int(os.getenv("PARSE_CACHE_REDIS_TTL_SECONDS", "86400"))
+PARSE_CACHE_KEY_PREFIX = "parse:v2:"
+
+_local_cache = OrderedDict()
+_lock = threading.Lock()
+_redis_client = None
+_async_redis_client = None
+
+stats = {"local_hits": 0, "redis_hits": 0, "misses": 0, "stores": 0, "redis_errors": 0}
+
+
+def normalize_command(command: str) -> str:
+    """Normalize a command so trivially different spellings share a cache entry."""
+    normalized = re.sub(r"\s+", " ", command.strip().lower())
+    return normalized.rstrip(".!?")
+
+
+def cache_key(command: str) -> str:
+    """Build the cache key for a command."""
+    digest = hashlib.sha256(normalize_command(command).encode("utf-8")).hexdigest()
+    return PARSE_CACHE_KEY_PREFIX + digest
+
+
+def _get_redis():
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(redis_url, socket_timeout=0.2)
+    return _redis_client
+
+
+def _get_async_redis():
+    global _async_redis_client
+    if _async_redis_client is None:
+        _async_redis_client = aioredis.Redis.from_url(redis_url, socket_timeout=0.2)
+    return _async_redis_client
+
+
+def _count(name: str):
+    with _lock:
+        stats[name] += 1
+
+
+def _local_get(key: str):
+    with _lock:
+        entry = _local_cache.get(key)
+        if entry is None:
+            return None
+        expires_at, content = entry
+        if expires_at < time.monotonic():
+            del _local_cache[key]
+            return None
+        _local_cache.move_to_end(key)
+        stats["local_hits"] += 1
+        return dict(content)
+
+
+def _local_put(key: str, content: dict):
+    with _lock:
+        _local_cache[key] = (time.monotonic() + PARSE_CACHE_TTL_SECONDS, content)
+        _local_cache.move_to_end(key)
+        while len(_local_cache) > PARSE_CACHE_SIZE:
+            _local_cache.popitem(last=False)
+
+
+def cacheable_content(command: str, content: dict):
+    """
+    Prepare parsed GPT content for caching.
+
+    A due date is never cached as an absolute value: it is replaced by the
+    date phrase of the command ("tomorrow at 9am", "March 3"), so it is
+    resolved against the current clock every time the entry is replayed.
+    If the command has no single date phrase that parsedatetime understands
+    ("on the 1st", "daily at 9", or several phrases), the date cannot be
+    replayed safely and the content is not cached.
+
+    Args:
+        command (str): The user's command.
+        content (dict): Parsed GPT JSON for the command.
+
+    Returns:
+        dict: Content to store, or None if it cannot be replayed safely.
+    """
+    content = dict(content)
+    if not content.get("due_date"):
+        return content
+    matches = parsedatetime.Calendar().nlp(command) or ()
+    if len(matches) != 1:
+        return None
+    content["due_date"] = matches[0][4].strip()
+    return content
+
+
+def get_cached_parse(command: str):
+    """Return cached GPT content for a command, or None on a miss."""
+    key = cache_key(command)
+    content = _local_get(key)
+    if content is not None:
+        return content
+    try:
+        raw = _get_redis().get(key)
+    except redis.RedisError as e:
+        logging.warning(f"Parse cache lookup failed: {e}")
+        _count("redis_errors")
+        raw = None
+    if raw is None:
+        _count("misses")
+        return None
+    content = json.loads(raw)
+    _local_put(key, content)
+    _count("redis_hits")
+    return dict(content)
+
+
+def store_parse(command: str, content: dict):
+    """Store GPT content for a command in both cache tiers."""
+    content = cacheable_content(command, content)
+    if content is None:
+        return
+    key = cache_key(command)
+    _local_put(key, content)
+    _count("stores")
+    try:
+        _get_redis().set(key, json.dumps(content), ex=PARSE_CACHE_REDIS_TTL_SECONDS)
+    except redis.RedisError as e:
+        logging.warning(f"Parse cache store failed: {e}")
+        _count("redis_errors")
+
+
+async def get_cached_parse_async(command: str):
+    """Async variant of get_cached_parse for the request path."""
+    key = cache_key(command)
+    content = _local_get(key)
+    if content is not None:
+        return content
+    try:
+        raw = await _get_async_redis().get(key)
+    except redis.RedisError as e:
+        logging.warning(f"Parse cache lookup failed: {e}")
+        _count("redis_errors")
+        raw = None
+    if raw is None:
+        _count("misses")
+        return None
+    content = json.loads(raw)
+    _local_put(key, content)
+    _count("redis_hits")
+    return dict(content)
+
+
+async def store_parse_async(command: str, content: dict):
+    """Async variant of store_parse for the request path."""
+    content = cacheable_content(command, content)
+    if content is None:
+        return
+    key = cache_key(command)
+    _local_put(key, content)
+    _count("stores")
+    try:
+        await _get_async_redis().set(key, json.dumps(content), ex=PARSE_CACHE_REDIS_TTL_SECONDS)
+    except redis.RedisError as e:
+        logging.warning(f"Parse cache store failed: {e}")
+        _count("redis_errors")
+
+
+def parse_cache_stats() -> dict:
+    """Return hit/miss counters and the current local cache size."""
+    with _lock:
+        result = dict(stats)
+        result["local_size"] = len(_local_cache)
+    lookups = result["local_hits"] + result["redis_hits"] + result["misses"]
+    result["hit_rate"] = (result["local_hits"] + result["redis_hits"]) / lookups if lookups else 0.0
+    return result
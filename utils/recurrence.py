@@ -0,0 +1,81 @@
+import os
+import uuid
+from datetime import datetime, timedelta
+from dateutil.rrule import rrule, DAILY, WEEKLY, MONTHLY
+
+RECURRENCE_RULES = {
+    "daily": DAILY,
+    "weekly": WEEKLY,
+    "monthly": MONTHLY,
+}
+
+# How far ahead GET /tasks expands a series when only one bound is given
+RECURRENCE_WINDOW_DAYS = int(os.getenv("RECURRENCE_WINDOW_DAYS", "31"))
+
+
+def series_rule(recurrence: str, dtstart: datetime) -> rrule:
+    """Build the rrule for a recurrence series."""
+    if recurrence not in RECURRENCE_RULES:
+        raise ValueError(f"Unsupported recurrence: {recurrence}")
+    return rrule(RECURRENCE_RULES[recurrence], dtstart=dtstart)
+
+
+def occurrence_id(series_id, occurrence_date: datetime) -> uuid.UUID:
+    """Stable id for a virtual occurrence of a series."""
+    return uuid.uuid5(series_id, occurrence_date.isoformat())
+
+
+def series_exceptions(series) -> set:
+    """Occurrence dates of a series that are skipped or stored as their own rows."""
+    return {datetime.fromisoformat(date) for date in (series.recurrence_exceptions or [])}
+
+
+def is_occurrence(series, occurrence_date: datetime) -> bool:
+    """Check whether a date is an occurrence of a series."""
+    rule = series_rule(series.recurrence, series.due_date)
+    return rule.after(occurrence_date, inc=True) == occurrence_date
+
+
+def iter_series(series, window_start: datetime, window_end: datetime):
+    """
+    Lazily yield the occurrences of a series inside a date window, in date order.
+
+    Args:
+        series (Task): The series row (recurrence rule, due_date as dtstart).
+        window_start (datetime): Start of the window (inclusive).
+        window_end (datetime): End of the window (inclusive).
+
+    Yields:
+        dict: One virtual occurrence, shaped like TaskResponse.
+    """
+    if series.due_date is None:
+        return
+    exceptions = series_exceptions(series)
+    for date in series_rule(series.recurrence, series.due_date):
+        if date > window_end:
+            return
+        if date < window_start or date in exceptions:
+            continue
+        yield {
+            "id": occurrence_id(series.id, date),
+            "description": series.description,
+            "due_date": date,
+            "status": series.status,
+            "priority": series.priority,
+            "recurrence": series.recurrence,
+            "celery_task_id": None,
+            "series_id": series.id,
+            "occurrence_date": date,
+        }
+
+
+def expand_series(series, window_start: datetime, window_end: datetime) -> list:
+    """Expand the occurrences of a series that fall inside a date window (see iter_series)."""
+    return list(iter_series(series, window_start, window_end))
+
+
+def expansion_window(start_date: datetime = None, end_date: datetime = None) -> tuple:
+    """Fill in missing bounds of a requested date window."""
+    window_start = start_date or datetime.now()
+    window_end = end_date or window_start + timedelta(days=RECURRENCE_WINDOW_DAYS)
+    return window_start, window_end
@@ -1,42 +1,238 @@
 from apscheduler.schedulers.background import BackgroundScheduler
+from collections import namedtuple
 from datetime import datetime, timedelta
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from app.database import SessionLocal
-from database_tools.models import Task
+from database_tools.models import Task, User
+from utils.digests import DIGEST_WINDOW, DigestBuffer, render_digest
+from utils.recurrence import expand_series
+from utils.smtp_service import enqueue_email
+from utils.metrics import SCHEDULER_RUNS, SCHEDULER_REMINDERS, query_label
+import heapq
 import logging
-
-logging.basicConfig(level=logging.INFO)
+import os
+import threading
 
 scheduler = BackgroundScheduler()
 
+REMINDER_LEAD = timedelta(minutes=30)
+REMINDER_HORIZON = timedelta(days=1)
+REMINDER_TICK_SECONDS = int(os.getenv("REMINDER_TICK_SECONDS", "30"))
+# Re-read changes older than the watermark to cover late commits. A row is
+# stamped when it is written, not when its transaction commits, so a change
+# committed more than this long after it was written is never seen.
+WATERMARK_OVERLAP = timedelta(seconds=int(os.getenv("REMINDER_WATERMARK_OVERLAP_SECONDS", "60")))
+# Group each user's reminders into one email instead of one message per task
+REMINDER_DIGEST = os.getenv("REMINDER_DIGEST", "false").lower() in ("1", "true", "yes")
+
+ReminderEntry = namedtuple("ReminderEntry", ["id", "due_date", "description", "user_id"])
+
+
+class ReminderIndex:
+    """
+    In-memory min-heap of upcoming reminders keyed by task id.
+
+    Each task has at most one live entry; changing its due date pushes a new
+    heap item and the old one is discarded when it surfaces. Fired reminders
+    are remembered by (id, due_date) so a task is reminded exactly once per
+    due date.
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self.heap = []
+        self.fired = {}
+        self.series_members = {}
+        self.watermark = None
+        self.loaded_until = None
+        self.lock = threading.Lock()
+
+    def upsert(self, task_id, due_date: datetime, description: str, user_id=None):
+        if self.fired.get(task_id) == due_date:
+            return
+        entry = ReminderEntry(task_id, due_date, description, user_id)
+        current = self.entries.get(task_id)
+        if current == entry:
+            return
+        self.entries[task_id] = entry
+        if not current or current.due_date != due_date:
+            heapq.heappush(self.heap, (due_date - REMINDER_LEAD, due_date, task_id))
+
+    def remove(self, task_id):
+        self.entries.pop(task_id, None)
+
+    def pop_due(self, now: datetime) -> list:
+        """Remove and return the entries whose reminder time has come."""
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            _, due_date, task_id = heapq.heappop(self.heap)
+            entry = self.entries.get(task_id)
+            if entry is None or entry.due_date != due_date:
+                continue  # superseded or removed
+            del self.entries[task_id]
+            self.fired[task_id] = due_date
+            due.append(entry)
+        return due
+
+    def compact(self, now: datetime):
+        """Drop stale heap items and forget reminders for dates that passed."""
+        self.fired = {task_id: due for task_id, due in self.fired.items() if due > now}
+        # Occurrences that fired or were removed no longer need tracking
+        for series_id, members in list(self.series_members.items()):
+            members.intersection_update(self.entries)
+            if not members:
+                del self.series_members[series_id]
+        if len(self.heap) > 2 * len(self.entries) + 64:
+            self.heap = [
+                item for item in self.heap
+                if item[2] in self.entries and self.entries[item[2]].due_date == item[1]
+            ]
+            heapq.heapify(self.heap)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "heap_size": len(self.heap),
+                "fired_tracked": len(self.fired),
+                "series_tracked": len(self.series_members),
+                "watermark": self.watermark.isoformat() if self.watermark else None,
+                "loaded_until": self.loaded_until.isoformat() if self.loaded_until else None,
+            }
+
+
+reminder_index = ReminderIndex()
+digest_buffer = DigestBuffer()
+
+
 def send_reminder(task):
     """Simulate sending a reminder for a task."""
     logging.info(f"Reminder: Task '{task.description}' is due on {task.due_date}.")
+    SCHEDULER_REMINDERS.labels("single").inc()
+
+
+def send_digest(user, entries: list, now: datetime):
+    """
+    Email one user all of their buffered reminders.
+
+    Entries that came due while the digest was held for quiet hours are
+    still sent, marked as past due.
+    """
+    if not entries:
+        return
+    if user is None:
+        # Tasks without an owner have no recipient
+        for entry in entries:
+            send_reminder(entry)
+        return
+    subject, body = render_digest(entries, now)
+    enqueue_email(user.email, subject, body)
+    SCHEDULER_REMINDERS.labels("digest").inc()
+
+
+def reminder_columns(db: Session):
+    """Query only the columns the reminder index needs."""
+    return db.query(
+        Task.id, Task.due_date, Task.description, Task.status,
+        Task.deleted_at, Task.recurrence, Task.user_id,
+    )
+
+
+def index_series(index: ReminderIndex, series, window_start: datetime, window_end: datetime):
+    """(Re)load the occurrences of one series for a window."""
+    members = index.series_members.setdefault(series.id, set())
+    for occurrence in expand_series(series, window_start, window_end):
+        index.upsert(occurrence["id"], occurrence["due_date"], occurrence["description"], series.user_id)
+        members.add(occurrence["id"])
+
+
+def extend_horizon(db: Session, index: ReminderIndex, now: datetime):
+    """Load tasks whose due date moved into the reminder horizon."""
+    start = max(index.loaded_until, now)
+    end = now + REMINDER_HORIZON
+    if end <= start:
+        return
+    rows = reminder_columns(db).filter(
+        Task.deleted_at == None,
+        Task.status == "pending",
+        Task.recurrence == None,
+        Task.due_date > start,
+        Task.due_date <= end,
+    ).all()
+    for row in rows:
+        index.upsert(row.id, row.due_date, row.description, row.user_id)
+
+    series_rows = db.query(Task).filter(
+        Task.deleted_at == None,
+        Task.status == "pending",
+        Task.recurrence != None,
+        Task.due_date <= end,
+    ).all()
+    for series in series_rows:
+        index_series(index, series, start + timedelta(microseconds=1), end)
+    index.loaded_until = end
+
+
+def apply_changes(db: Session, index: ReminderIndex, now: datetime):
+    """Apply tasks changed since the watermark to the index."""
+    rows = db.query(Task).filter(Task.updated_at > index.watermark - WATERMARK_OVERLAP).all()
+    for row in rows:
+        index.watermark = max(index.watermark, row.updated_at)
+        live = row.deleted_at is None and row.status == "pending"
+        if row.recurrence:
+            for task_id in index.series_members.pop(row.id, set()):
+                index.remove(task_id)
+            if live:
+                index_series(index, row, now, index.loaded_until)
+        elif live and row.due_date and now < row.due_date <= index.loaded_until:
+            index.upsert(row.id, row.due_date, row.description, row.user_id)
+        else:
+            index.remove(row.id)
+
 
 def schedule_reminders():
-    """Schedule reminders for all pending tasks."""
+    """Bring the reminder index up to date and send the reminders that are due."""
+    query_label.set("schedule_reminders")
     db: Session = SessionLocal()
     try:
         now = datetime.now()
-        tasks = db.query(Task).filter(
-            Task.deleted_at == None,
-            Task.status == "pending",
-            Task.due_date > now,
-            Task.due_date <= now + timedelta(days=1)  
-        ).all()
-        for task in tasks:
-            scheduler.add_job(
-                send_reminder,
-                trigger="date",
-                run_date=task.due_date - timedelta(minutes=30),  
-                args=[task],
-            )
+        with reminder_index.lock:
+            if reminder_index.watermark is None:
+                # First run: read the watermark before loading so no change is missed
+                reminder_index.watermark = db.query(func.max(Task.updated_at)).scalar() or now
+                reminder_index.loaded_until = now
+            else:
+                apply_changes(db, reminder_index, now)
+            extend_horizon(db, reminder_index, now)
+            if REMINDER_DIGEST:
+                # Take reminders a window early so each user's can be batched
+                for entry in reminder_index.pop_due(now + DIGEST_WINDOW):
+                    digest_buffer.add(entry, entry.due_date - REMINDER_LEAD, now)
+                user_ids = [user_id for user_id in digest_buffer.user_ids(now) if user_id is not None]
+                users = {user.id: user for user in db.query(User).filter(User.id.in_(user_ids))} if user_ids else {}
+                digests = digest_buffer.ready(now, users)
+                due = []
+            else:
+                due = reminder_index.pop_due(now)
+                digests = []
+            reminder_index.compact(now)
     except Exception as e:
         logging.error(f"Error scheduling reminders: {e}")
+        SCHEDULER_RUNS.labels("schedule_reminders", "error").inc()
+        return
     finally:
         db.close()
+    SCHEDULER_RUNS.labels("schedule_reminders", "ok").inc()
+
+    for entry in due:
+        if entry.due_date > now:
+            send_reminder(entry)
+    for user, entries in digests:
+        send_digest(user, entries, now)
+
 
 def start_scheduler():
     """Start the scheduler."""
-    scheduler.add_job(schedule_reminders, "interval", minutes=30)  
+    scheduler.add_job(schedule_reminders, "interval", seconds=REMINDER_TICK_SECONDS, id="schedule_reminders", replace_existing=True)
     scheduler.start()
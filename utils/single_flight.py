@@ -0,0 +1,144 @@
+import os
+import json
+import uuid
+import asyncio
+import logging
+import threading
+import redis
+import redis.asyncio as aioredis
+from utils.metrics import PARSE_COALESCED
+
+redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# Also coalesce across workers through Redis (a lock plus a short-lived result key)
+SINGLE_FLIGHT_REDIS = os.getenv("SINGLE_FLIGHT_REDIS", "false").lower() in ("1", "true", "yes")
+# Longest a parse is expected to take; waiters give up and parse themselves after this
+SINGLE_FLIGHT_LOCK_SECONDS = float(os.getenv("SINGLE_FLIGHT_LOCK_SECONDS", "30"))
+SINGLE_FLIGHT_RESULT_SECONDS = int(os.getenv("SINGLE_FLIGHT_RESULT_SECONDS", "10"))
+SINGLE_FLIGHT_POLL_SECONDS = 0.05
+SINGLE_FLIGHT_KEY_PREFIX = "flight:v1:"
+
+_inflight = {}
+_inflight_sync = {}
+_sync_lock = threading.Lock()
+_async_redis_client = None
+
+
+def _get_async_redis():
+    global _async_redis_client
+    if _async_redis_client is None:
+        _async_redis_client = aioredis.Redis.from_url(redis_url, socket_timeout=0.2)
+    return _async_redis_client
+
+
+async def single_flight(key: str, fn, encode=json.dumps, decode=json.loads) -> tuple:
+    """
+    Run fn() once for concurrent callers with the same key.
+
+    Within a worker, callers that arrive while a call is running await its
+    result. With SINGLE_FLIGHT_REDIS, the first worker to take a Redis lock
+    runs the call and publishes the result for the others.
+
+    Args:
+        key (str): Identifies identical calls.
+        fn: Async callable to run.
+        encode: Turns the result into a string for Redis.
+        decode: Inverse of encode.
+
+    Returns:
+        tuple: (result, whether it was shared from another caller's call).
+    """
+    future = _inflight.get(key)
+    if future is not None:
+        try:
+            result = await asyncio.shield(future)
+        except asyncio.CancelledError:
+            if not future.cancelled():
+                raise  # this caller was cancelled
+            return await fn(), False  # the call we waited on was cancelled
+        PARSE_COALESCED.labels("local").inc()
+        return result, True
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        if SINGLE_FLIGHT_REDIS:
+            result, shared = await _redis_flight(key, fn, encode, decode)
+        else:
+            result, shared = await fn(), False
+        future.set_result(result)
+        return result, shared
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        # Waiters see the exception; nobody may be waiting, so mark it retrieved
+        future.exception()
+        raise
+    finally:
+        if _inflight.get(key) is future:
+            del _inflight[key]
+
+
+async def _redis_flight(key: str, fn, encode, decode) -> tuple:
+    client = _get_async_redis()
+    lock_key = f"{SINGLE_FLIGHT_KEY_PREFIX}{key}:lock"
+    result_key = f"{SINGLE_FLIGHT_KEY_PREFIX}{key}:result"
+    token = uuid.uuid4().hex
+    try:
+        leader = await client.set(lock_key, token, nx=True, px=int(SINGLE_FLIGHT_LOCK_SECONDS * 1000))
+        if not leader:
+            deadline = asyncio.get_running_loop().time() + SINGLE_FLIGHT_LOCK_SECONDS
+            while asyncio.get_running_loop().time() < deadline:
+                raw, lock = await client.mget(result_key, lock_key)
+                if raw is not None:
+                    PARSE_COALESCED.labels("redis").inc()
+                    return decode(raw), True
+                if lock is None:
+                    break  # the leader gave up without a result
+                await asyncio.sleep(SINGLE_FLIGHT_POLL_SECONDS)
+            return await fn(), False
+    except redis.RedisError as e:
+        logging.warning(f"Single-flight lock unavailable, parsing without it: {e}")
+        return await fn(), False
+
+    try:
+        result = await fn()
+        try:
+            await client.set(result_key, encode(result), ex=SINGLE_FLIGHT_RESULT_SECONDS)
+        except redis.RedisError as e:
+            logging.warning(f"Could not publish single-flight result: {e}")
+        return result, False
+    finally:
+        try:
+            if await client.get(lock_key) == token.encode("utf-8"):
+                await client.delete(lock_key)
+        except redis.RedisError:
+            pass  # the lock expires on its own
+
+
+def single_flight_sync(key: str, fn) -> tuple:
+    """Thread-based counterpart of single_flight for one worker process (no Redis)."""
+    with _sync_lock:
+        flight = _inflight_sync.get(key)
+        leader = flight is None
+        if leader:
+            flight = _inflight_sync[key] = {"done": threading.Event(), "result": None, "error": None}
+    if not leader:
+        flight["done"].wait()
+        PARSE_COALESCED.labels("local").inc()
+        if flight["error"] is not None:
+            raise flight["error"]
+        return flight["result"], True
+
+    try:
+        flight["result"] = fn()
+        return flight["result"], False
+    except Exception as e:
+        flight["error"] = e
+        raise
+    finally:
+        with _sync_lock:
+            del _inflight_sync[key]
+        flight["done"].set()
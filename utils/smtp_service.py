@@ -1,30 +1,236 @@
+import os
+import time
+import queue
+import random
 import smtplib
 import logging
+import threading
 from email.message import EmailMessage
-from utils.smtp_config import read_smtp_config  
+from utils.smtp_config import read_smtp_config
+from utils.metrics import SMTP_SEND_SECONDS, SMTP_EVENTS
 
-# Logging setup
-logging.basicConfig(level=logging.INFO)
+# Delivery pipeline settings
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "2"))
+SMTP_QUEUE_SIZE = int(os.getenv("SMTP_QUEUE_SIZE", "1000"))
+SMTP_BATCH_SIZE = int(os.getenv("SMTP_BATCH_SIZE", "20"))
+SMTP_MAX_ATTEMPTS = int(os.getenv("SMTP_MAX_ATTEMPTS", "5"))
+SMTP_RETRY_BASE_SECONDS = float(os.getenv("SMTP_RETRY_BASE_SECONDS", "2"))
+SMTP_IDLE_CHECK_SECONDS = float(os.getenv("SMTP_IDLE_CHECK_SECONDS", "60"))
+SMTP_TIMEOUT_SECONDS = float(os.getenv("SMTP_TIMEOUT_SECONDS", "30"))
+
+_smtp_config = None
+_email_queue = queue.Queue(maxsize=SMTP_QUEUE_SIZE)
+_workers = []
+_workers_lock = threading.Lock()
+_stop_event = threading.Event()
+_stats_lock = threading.Lock()
+stats = {"enqueued": 0, "sent": 0, "retried": 0, "failed": 0, "dropped": 0, "connections_opened": 0}
+
+
+def _count(name: str, amount: int = 1):
+    with _stats_lock:
+        stats[name] += amount
+    SMTP_EVENTS.labels(name).inc(amount)
+
+
+def _send_timed(server: smtplib.SMTP, msg: EmailMessage):
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        server.send_message(msg)
+        outcome = "ok"
+    finally:
+        SMTP_SEND_SECONDS.labels(outcome).observe(time.perf_counter() - start)
+
+
+def get_smtp_config() -> dict:
+    """Load the SMTP configuration from XML on first use."""
+    global _smtp_config
+    if _smtp_config is None:
+        _smtp_config = read_smtp_config()
+    return _smtp_config
+
+
+def build_message(to_email: str, subject: str, body: str) -> EmailMessage:
+    """Build the email sent for a notification."""
+    msg = EmailMessage()
+    msg["Subject"] = subject
+    msg["From"] = get_smtp_config()["username"]
+    msg["To"] = to_email
+    msg.set_content(body)
+    return msg
+
+
+def open_smtp_connection() -> smtplib.SMTP:
+    """Open an SMTP connection, upgrade it to TLS and log in as configured."""
+    smtp_config = get_smtp_config()
+    server = smtplib.SMTP(smtp_config["server"], smtp_config["port"], timeout=SMTP_TIMEOUT_SECONDS)
+    try:
+        if smtp_config["use_tls"]:
+            server.starttls()
+        server.ehlo_or_helo_if_needed()
+        if smtp_config.get("password"):
+            # With credentials configured, never fall back to sending unauthenticated
+            if not server.has_extn("auth"):
+                raise smtplib.SMTPNotSupportedError(
+                    f"{smtp_config['server']} does not offer AUTH; not sending without logging in"
+                )
+            server.login(smtp_config["username"], smtp_config["password"])
+    except Exception:
+        server.close()
+        raise
+    _count("connections_opened")
+    return server
 
-# Load SMTP Configuration from XML
-smtp_config = read_smtp_config()
 
 def send_email_notification(to_email: str, subject: str, body: str):
     """Send an email notification using SMTP details from XML config."""
     try:
-        msg = EmailMessage()
-        msg["Subject"] = subject
-        msg["From"] = smtp_config["username"]
-        msg["To"] = to_email
-        msg.set_content(body)
-
-        with smtplib.SMTP(smtp_config["server"], smtp_config["port"]) as server:
-            if smtp_config["use_tls"]:
-                server.starttls()
-            server.login(smtp_config["username"], smtp_config["password"])
-            server.send_message(msg)
+        msg = build_message(to_email, subject, body)
+
+        with open_smtp_connection() as server:
+            _send_timed(server, msg)
 
         logging.info(f"Email notification sent to {to_email}")
 
     except Exception as e:
         logging.error(f"Failed to send email: {e}")
+
+
+def enqueue_email(to_email: str, subject: str, body: str) -> bool:
+    """
+    Queue an email for the background delivery workers without blocking.
+
+    Args:
+        to_email (str): Recipient address.
+        subject (str): Subject line.
+        body (str): Plain-text body.
+
+    Returns:
+        bool: False if the queue is full and the email was dropped.
+    """
+    start_email_workers()
+    try:
+        _email_queue.put_nowait((build_message(to_email, subject, body), 1))
+    except queue.Full:
+        logging.error(f"Email queue full, dropping notification to {to_email}")
+        _count("dropped")
+        return False
+    _count("enqueued")
+    return True
+
+
+def _is_permanent(error: Exception) -> bool:
+    """5xx replies and refused recipients will not succeed on retry."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return True
+    return isinstance(error, smtplib.SMTPResponseException) and 500 <= error.smtp_code < 600
+
+
+def _schedule_retry(msg: EmailMessage, attempt: int, error: Exception):
+    if attempt >= SMTP_MAX_ATTEMPTS or _is_permanent(error):
+        logging.error(f"Giving up on email to {msg['To']} after {attempt} attempt(s): {error}")
+        _count("failed")
+        return
+    delay = SMTP_RETRY_BASE_SECONDS * (2 ** (attempt - 1)) * random.uniform(0.8, 1.2)
+    logging.warning(f"Email to {msg['To']} failed ({error}), retrying in {delay:.1f}s")
+    _count("retried")
+
+    def requeue():
+        try:
+            _email_queue.put_nowait((msg, attempt + 1))
+        except queue.Full:
+            logging.error(f"Email queue full, dropping retry to {msg['To']}")
+            _count("dropped")
+
+    timer = threading.Timer(delay, requeue)
+    timer.daemon = True
+    timer.start()
+
+
+def _take_batch() -> list:
+    """Block briefly for one message, then take whatever else is already queued."""
+    try:
+        batch = [_email_queue.get(timeout=1.0)]
+    except queue.Empty:
+        return []
+    while len(batch) < SMTP_BATCH_SIZE:
+        try:
+            batch.append(_email_queue.get_nowait())
+        except queue.Empty:
+            break
+    return batch
+
+
+def _close_quietly(server):
+    try:
+        server.quit()
+    except Exception:
+        server.close()
+
+
+def _delivery_worker():
+    """Own one long-lived SMTP connection and send queued batches over it."""
+    server = None
+    last_used = 0.0
+    while not (_stop_event.is_set() and _email_queue.empty()):
+        batch = _take_batch()
+        if not batch:
+            continue
+        for index, (msg, attempt) in enumerate(batch):
+            try:
+                if server is not None and time.monotonic() - last_used > SMTP_IDLE_CHECK_SECONDS:
+                    # Servers drop idle sessions; check before reusing this one
+                    if server.noop()[0] != 250:
+                        raise smtplib.SMTPServerDisconnected("NOOP failed")
+                if server is None:
+                    server = open_smtp_connection()
+                _send_timed(server, msg)
+                last_used = time.monotonic()
+                _count("sent")
+            except (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, OSError) as e:
+                # Connection-level failure: reconnect for the next message
+                if server is not None:
+                    server.close()
+                server = None
+                _schedule_retry(msg, attempt, e)
+            except smtplib.SMTPException as e:
+                _schedule_retry(msg, attempt, e)
+            except Exception as e:
+                # Anything else (e.g. a message that cannot be encoded) must not end this worker
+                logging.exception(f"Unexpected error sending email to {msg['To']}")
+                _schedule_retry(msg, attempt, e)
+            finally:
+                _email_queue.task_done()
+    if server is not None:
+        _close_quietly(server)
+
+
+def start_email_workers():
+    """Start the delivery workers once per process."""
+    with _workers_lock:
+        if _workers:
+            return
+        _stop_event.clear()
+        for i in range(SMTP_POOL_SIZE):
+            worker = threading.Thread(target=_delivery_worker, name=f"smtp-worker-{i}", daemon=True)
+            worker.start()
+            _workers.append(worker)
+
+
+def stop_email_workers(timeout: float = 30.0):
+    """Flush the queue, then close the SMTP connections."""
+    with _workers_lock:
+        _stop_event.set()
+        for worker in _workers:
+            worker.join(timeout)
+        _workers.clear()
+
+
+def email_queue_stats() -> dict:
+    """Return delivery counters and the current queue depth."""
+    with _stats_lock:
+        result = dict(stats)
+    result["queued"] = _email_queue.qsize()
+    result["workers"] = len(_workers)
+    return result
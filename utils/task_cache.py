@@ -0,0 +1,252 @@
+import os
+import json
+import uuid
+import asyncio
+import hashlib
+import logging
+import redis
+import redis.asyncio as aioredis
+from utils.metrics import TASK_CACHE_EVENTS
+
+redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+TASK_CACHE_ENABLED = os.getenv("TASK_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+TASK_CACHE_TTL_SECONDS = int(os.getenv("TASK_CACHE_TTL_SECONDS", "300"))
+TASK_LIST_CACHE_TTL_SECONDS = int(os.getenv("TASK_LIST_CACHE_TTL_SECONDS", "30"))
+# Only the first pages of a listing are cached; deeper pages are rarely repeated
+TASK_LIST_CACHE_MAX_PAGE = int(os.getenv("TASK_LIST_CACHE_MAX_PAGE", "3"))
+# Stampede protection: one request rebuilds a missing entry, the others wait this long for it
+TASK_CACHE_LOCK_SECONDS = float(os.getenv("TASK_CACHE_LOCK_SECONDS", "5"))
+TASK_CACHE_WAIT_SECONDS = float(os.getenv("TASK_CACHE_WAIT_SECONDS", "0.5"))
+TASK_CACHE_KEY_PREFIX = "taskcache:v1:"
+
+# Session.info key holding the changes to invalidate after the next commit
+PENDING_KEY = "task_cache_changes"
+
+_redis_client = None
+_async_redis_client = None
+
+
+def _get_redis():
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(redis_url, socket_timeout=0.2)
+    return _redis_client
+
+
+def _get_async_redis():
+    global _async_redis_client
+    if _async_redis_client is None:
+        _async_redis_client = aioredis.Redis.from_url(redis_url, socket_timeout=0.2)
+    return _async_redis_client
+
+
+def _canonical_id(task_id) -> str:
+    # Path parameters may spell a UUID differently from the one a writer holds
+    try:
+        return str(uuid.UUID(str(task_id)))
+    except ValueError:
+        return str(task_id)
+
+
+def task_key(task_id) -> str:
+    return f"{TASK_CACHE_KEY_PREFIX}task:{_canonical_id(task_id)}"
+
+
+def task_generation_key(task_id) -> str:
+    return f"{TASK_CACHE_KEY_PREFIX}gen:task:{_canonical_id(task_id)}"
+
+
+def list_key(params: dict) -> str:
+    digest = hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    return f"{TASK_CACHE_KEY_PREFIX}list:{digest}"
+
+
+def list_generation_key(status: str = None, priority: int = None) -> str:
+    """
+    Generation key for the list pages filtered by (status, priority).
+
+    Every listing depends on exactly one of these; a change to a task bumps
+    the four that can include it (its status or any, its priority or any).
+    """
+    return f"{TASK_CACHE_KEY_PREFIX}gen:list:{status or '*'}:{'*' if priority is None else priority}"
+
+
+def _changed_generation_keys(changes: list) -> set:
+    keys = set()
+    for task_id, fields in changes:
+        if task_id is not None:
+            keys.add(task_generation_key(task_id))
+        for status, priority in fields:
+            for s in (status, None):
+                for p in (priority, None):
+                    keys.add(list_generation_key(s, p))
+    return keys
+
+
+def record_task_change(db, task, previous: dict = None):
+    """
+    Remember that a task changed, to invalidate its cache entries after commit.
+
+    Called by the change feed's notify functions, which every write path
+    already goes through.
+
+    Args:
+        db: Sync or async session the change is part of.
+        task: Task row or insert dict.
+        previous (dict): Filterable fields before the change, if it was an update.
+    """
+    get = task.get if isinstance(task, dict) else lambda key: getattr(task, key, None)
+    current = (get("status"), get("priority"))
+    fields = {current}
+    if previous:
+        fields.add((previous.get("status", current[0]), previous.get("priority", current[1])))
+    db.info.setdefault(PENDING_KEY, []).append((get("id"), fields))
+
+
+def record_bulk_change(db, fields: set):
+    """
+    Remember a bulk insert of new tasks, described only by their (status, priority) pairs.
+
+    New ids cannot have single-task entries yet, so only listings are invalidated.
+    """
+    db.info.setdefault(PENDING_KEY, []).append((None, fields))
+
+
+def new_generation() -> str:
+    """
+    A generation value that never repeats.
+
+    A counter would restart at 1 once its key expired, making entries stored
+    under an earlier "1" valid again. Random values let generation keys
+    expire safely: a missing key reads as "0", which no write ever sets.
+    """
+    return uuid.uuid4().hex
+
+
+def _pop_pending(db) -> set:
+    return _changed_generation_keys(db.info.pop(PENDING_KEY, []))
+
+
+async def commit_and_invalidate(db):
+    """Commit an async session, then invalidate the cache entries its changes affect."""
+    try:
+        await db.commit()
+    except Exception:
+        db.info.pop(PENDING_KEY, None)
+        raise
+    keys = _pop_pending(db)
+    if not keys or not TASK_CACHE_ENABLED:
+        return
+    try:
+        async with _get_async_redis().pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.set(key, new_generation(), ex=TASK_CACHE_TTL_SECONDS * 2)
+            await pipe.execute()
+        TASK_CACHE_EVENTS.labels("invalidate").inc(len(keys))
+    except redis.RedisError as e:
+        logging.warning(f"Task cache invalidation failed; entries expire within their TTL: {e}")
+        TASK_CACHE_EVENTS.labels("error").inc()
+
+
+def commit_and_invalidate_sync(session):
+    """Sync counterpart of commit_and_invalidate (Celery workers)."""
+    try:
+        session.commit()
+    except Exception:
+        session.info.pop(PENDING_KEY, None)
+        raise
+    keys = _pop_pending(session)
+    if not keys or not TASK_CACHE_ENABLED:
+        return
+    try:
+        with _get_redis().pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.set(key, new_generation(), ex=TASK_CACHE_TTL_SECONDS * 2)
+            pipe.execute()
+        TASK_CACHE_EVENTS.labels("invalidate").inc(len(keys))
+    except redis.RedisError as e:
+        logging.warning(f"Task cache invalidation failed; entries expire within their TTL: {e}")
+        TASK_CACHE_EVENTS.labels("error").inc()
+
+
+def _unpack(raw, generation):
+    """Return the payload of a cached value if it was stored under the current generation."""
+    if raw is None:
+        return None
+    stored_generation, _, payload = raw.decode("utf-8").partition("\n")
+    if stored_generation != (generation or b"0").decode("utf-8"):
+        return None
+    return payload
+
+
+async def read_through(key: str, generation_key: str, ttl: int, load):
+    """
+    Serve a JSON payload from Redis, loading and storing it on a miss.
+
+    Entries are stored with the generation they were read under, so a value
+    loaded while a write was committing is never served after that write's
+    invalidation. On a miss only one caller loads (a short Redis lock); the
+    others wait up to TASK_CACHE_WAIT_SECONDS for its result before loading
+    themselves. Redis errors fall back to loading.
+
+    Args:
+        key (str): Cache key for the payload.
+        generation_key (str): Generation key the payload depends on.
+        ttl (int): Seconds to keep the payload.
+        load: Async callable returning a JSON-serializable payload, or None for
+            "not found" (never cached).
+
+    Returns:
+        str: The payload as JSON, or None if load returned None.
+    """
+    if not TASK_CACHE_ENABLED:
+        payload = await load()
+        return None if payload is None else json.dumps(payload)
+
+    client = _get_async_redis()
+    lock_key = f"{key}:lock"
+    token = uuid.uuid4().hex
+    try:
+        raw, generation = await client.mget(key, generation_key)
+        cached = _unpack(raw, generation)
+        if cached is not None:
+            TASK_CACHE_EVENTS.labels("hit").inc()
+            return cached
+        locked = await client.set(lock_key, token, nx=True, px=int(TASK_CACHE_LOCK_SECONDS * 1000))
+        if not locked:
+            deadline = asyncio.get_running_loop().time() + TASK_CACHE_WAIT_SECONDS
+            while asyncio.get_running_loop().time() < deadline:
+                await asyncio.sleep(0.02)
+                raw, current = await client.mget(key, generation_key)
+                cached = _unpack(raw, current)
+                if cached is not None:
+                    TASK_CACHE_EVENTS.labels("wait_hit").inc()
+                    return cached
+    except redis.RedisError as e:
+        logging.warning(f"Task cache lookup failed: {e}")
+        TASK_CACHE_EVENTS.labels("error").inc()
+        payload = await load()
+        return None if payload is None else json.dumps(payload)
+
+    TASK_CACHE_EVENTS.labels("miss").inc()
+    try:
+        payload = await load()
+        if payload is None:
+            return None
+        serialized = json.dumps(payload)
+        if locked:
+            try:
+                value = f"{(generation or b'0').decode('utf-8')}\n{serialized}"
+                await client.set(key, value, ex=ttl)
+            except redis.RedisError as e:
+                logging.warning(f"Task cache store failed: {e}")
+                TASK_CACHE_EVENTS.labels("error").inc()
+        return serialized
+    finally:
+        if locked:
+            try:
+                if await client.get(lock_key) == token.encode("utf-8"):
+                    await client.delete(lock_key)
+            except redis.RedisError:
+                pass  # the lock expires on its own
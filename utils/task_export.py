@@ -0,0 +1,93 @@
+import io
+import os
+import csv
+import json
+import heapq
+from uuid import UUID
+from datetime import datetime
+from database_tools.models import Task
+from database_tools.schemas import TaskResponse
+
+# Rows fetched per round trip from the server-side cursor (one chunk of output)
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+# Same fields as TaskResponse, selected as plain columns instead of ORM objects
+EXPORT_FIELDS = list(TaskResponse.model_fields)
+EXPORT_COLUMNS = [getattr(Task, field) for field in EXPORT_FIELDS]
+
+
+def export_value(value):
+    """Turn a column value into its JSON/CSV form."""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    return value
+
+
+def format_ndjson(rows) -> str:
+    """One JSON object per row, newline terminated."""
+    return "".join(
+        json.dumps({field: export_value(row[field]) for field in EXPORT_FIELDS}) + "\n"
+        for row in rows
+    )
+
+
+def csv_header() -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(EXPORT_FIELDS)
+    return buffer.getvalue()
+
+
+def format_csv(rows) -> str:
+    """CSV lines for rows (mappings keyed by field name); None becomes an empty cell."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(["" if row[field] is None else export_value(row[field]) for field in EXPORT_FIELDS])
+    return buffer.getvalue()
+
+
+def format_rows(rows, export_format: str) -> str:
+    return format_ndjson(rows) if export_format == "ndjson" else format_csv(rows)
+
+
+async def merge_batches(batches, extra, key, reverse: bool = False):
+    """
+    Merge sorted batches of rows with a sorted iterator of extra rows.
+
+    Extra rows are only pulled up to the last row of the current batch, so
+    a lazy iterator is consumed no faster than the stream.
+
+    Args:
+        batches: Async iterable of row lists, sorted by key.
+        extra: Iterator of rows sorted the same way.
+        key: Sort key for both kinds of row.
+        reverse (bool): Whether the order is descending.
+
+    Yields:
+        list: Merged rows, in order.
+    """
+    extra = iter(extra)
+    pending = next(extra, None)
+    async for batch in batches:
+        last = key(batch[-1])
+        taken = []
+        while pending is not None and (key(pending) > last if reverse else key(pending) < last):
+            taken.append(pending)
+            pending = next(extra, None)
+        yield list(heapq.merge(batch, taken, key=key, reverse=reverse))
+    rest = []
+    while pending is not None:
+        rest.append(pending)
+        pending = next(extra, None)
+        if len(rest) == EXPORT_BATCH_SIZE:
+            yield rest
+            rest = []
+    if rest:
+        yield rest
@@ -0,0 +1,34 @@
+from sqlalchemy import Float, and_, or_, cast, func, literal, literal_column
+from database_tools.models import Task
+
+# Must match the text search configuration of tasks.search_vector (migration 8)
+SEARCH_CONFIG = literal_column("'english'::regconfig")
+# Generated column maintained by Postgres; not mapped on Task so task queries never load it
+search_vector = literal_column("tasks.search_vector")
+
+
+def search_query(q: str):
+    return func.websearch_to_tsquery(SEARCH_CONFIG, q)
+
+
+def search_clause(q: str):
+    """
+    Tasks matching a search: full-text on the stemmed description, or a
+    trigram word match so typos ("groceris") still find "groceries".
+
+    Both sides are served by GIN indexes (migration 9).
+    """
+    return or_(
+        search_vector.op("@@")(search_query(q)),
+        literal(q).op("<%")(Task.description),
+    )
+
+
+def search_rank(q: str):
+    """Relevance: full-text cover density plus trigram word similarity."""
+    return cast(func.ts_rank_cd(search_vector, search_query(q)) + func.word_similarity(q, Task.description), Float)
+
+
+def search_seek_clause(rank, value: float, task_id):
+    """Rows after (value, task_id) in (rank desc, id desc) order."""
+    return or_(rank < value, and_(rank == value, Task.id < task_id))
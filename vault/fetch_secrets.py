@@ -1,9 +1,18 @@
 import os
+import time
+import logging
+import threading
 import hvac
 
-VAULT_URL = "http://127.0.0.1:8200"
+VAULT_URL = os.getenv("VAULT_ADDR", "http://127.0.0.1:8200")
 TOKEN_FILE = os.path.join("config", "root_token.txt")
 
+# How long a secret is trusted when Vault does not return a lease, and how
+# early before expiry it is refreshed in the background
+SECRET_TTL_SECONDS = float(os.getenv("SECRET_TTL_SECONDS", "3600"))
+SECRET_REFRESH_MARGIN_SECONDS = float(os.getenv("SECRET_REFRESH_MARGIN_SECONDS", "300"))
+SECRET_RETRY_SECONDS = float(os.getenv("SECRET_RETRY_SECONDS", "30"))
+
 
 def get_root_token():  # sourcery skip: raise-from-previous-error
     """Retrieve the root token from the file."""
@@ -14,17 +23,103 @@ def get_root_token():  # sourcery skip: raise-from-previous-error
         raise FileNotFoundException(f"Root token file not found at {TOKEN_FILE}. Start the Vault server first.")
 
 
-def fetch_openai_key():  # sourcery skip: inline-immediately-returned-variable
-    """Fetch the OpenAI API key from Vault."""
+def read_openai_key_from_vault() -> tuple:
+    """
+    Read the OpenAI API key from Vault.
+
+    Returns:
+        tuple: (api key, lease duration in seconds or 0 if Vault gave none).
+    """
     vault_token = get_root_token()
-    client = hvac.Client(url=VAULT_URL, token=vault_token)
+    client = hvac.Client(url=VAULT_URL, token=vault_token, timeout=5)
     if not client.is_authenticated():
         raise FetchOpenAIKeyException("Vault authentication failed!")
 
     # Fetch the OpenAI API key
     secret = client.secrets.kv.read_secret_version(path="openai")
-    api_key = secret["data"]["data"]["api_key"]
-    return api_key
+    return secret["data"]["data"]["api_key"], secret.get("lease_duration") or 0
+
+
+class SecretProvider:
+    """
+    Load a secret on first use and keep it fresh.
+
+    The value is cached for its Vault lease (or SECRET_TTL_SECONDS) and
+    refreshed by a background timer shortly before it expires, so callers
+    never wait on Vault after the first load. If Vault cannot be reached the
+    environment variable is used instead, and a stale value is kept rather
+    than failing while a refresh is retried.
+    """
+
+    def __init__(self, name: str, loader, env_var: str = None):
+        self.name = name
+        self.loader = loader
+        self.env_var = env_var
+        self.value = None
+        self.expires_at = 0.0
+        self.lock = threading.Lock()
+        self.timer = None
+
+    def cached(self):
+        """The current value if it has not expired, without any I/O."""
+        if self.value is not None and time.monotonic() < self.expires_at:
+            return self.value
+        return None
+
+    def get(self):
+        """Return the secret, loading it if needed (blocks on the first call)."""
+        value = self.cached()
+        if value is not None:
+            return value
+        with self.lock:
+            value = self.cached()
+            if value is not None:
+                return value
+            return self._load()
+
+    def _load(self):
+        try:
+            value, lease_seconds = self.loader()
+            ttl = lease_seconds or SECRET_TTL_SECONDS
+            source = "vault"
+        except Exception as e:
+            value = os.getenv(self.env_var) if self.env_var else None
+            if value:
+                logging.warning(f"Could not load secret '{self.name}' from Vault ({e}); using ${self.env_var}")
+                ttl, source = SECRET_RETRY_SECONDS, "env"
+            elif self.value is not None:
+                logging.error(f"Could not refresh secret '{self.name}' ({e}); keeping the previous value")
+                value, ttl, source = self.value, SECRET_RETRY_SECONDS, "stale"
+            else:
+                raise
+        self.value = value
+        self.expires_at = time.monotonic() + ttl
+        logging.debug(f"Loaded secret '{self.name}' from {source}, valid for {ttl:.0f}s")
+        self._schedule_refresh(ttl)
+        return value
+
+    def _schedule_refresh(self, ttl: float):
+        if self.timer is not None:
+            self.timer.cancel()
+        self.timer = threading.Timer(max(ttl - SECRET_REFRESH_MARGIN_SECONDS, ttl / 2), self._refresh)
+        self.timer.daemon = True
+        self.timer.start()
+
+    def _refresh(self):
+        with self.lock:
+            try:
+                self._load()
+            except Exception as e:
+                logging.error(f"Background refresh of secret '{self.name}' failed: {e}")
+                self._schedule_refresh(SECRET_RETRY_SECONDS)
+
+
+openai_key_provider = SecretProvider("openai", read_openai_key_from_vault, env_var="OPENAI_API_KEY")
+
+
+def fetch_openai_key():
+    """Fetch the OpenAI API key (cached; Vault first, then $OPENAI_API_KEY)."""
+    return openai_key_provider.get()
 
 class FileNotFoundException(Exception):
     pass